@@ -0,0 +1,189 @@
+"""
+Compares code emission through CodeEmitter against writing every piece of
+code straight to the output file or to a StringIO, as the generators used to.
+
+A synthetic register map is run through HeaderGenerator and the CSR access
+test renderer while recording every emitted piece of code. The recorded
+stream is then replayed through both emission strategies, so that only the
+cost of emitting code is measured.
+
+Usage:
+    python benchmarks/bench_code_emitter.py [--blocks N] [--regs N] [--fields N]
+"""
+from typing import Any, List, Tuple, Callable, TextIO
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+from systemrdl import RDLCompiler
+
+from synth_rdl import SynthConfig, generate_rdl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# pylint: disable=wrong-import-position
+from etched_peakrdl_cheader import header_generator, csr_access_renderer
+from etched_peakrdl_cheader.code_emitter import CodeEmitter
+from etched_peakrdl_cheader.csr_access_generator import CsrAccessGenerator
+from etched_peakrdl_cheader.design_scanner import DesignScanner
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.header_generator import HeaderGenerator
+from etched_peakrdl_cheader.output_files import OutputFiles
+
+
+Op = Tuple[str, str]
+
+
+class RecordingEmitter(CodeEmitter):
+    """
+    CodeEmitter that also records every operation done on it
+    """
+    recorded = [] # type: List[List[Op]]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.write = self.record_write
+        self.ops = [] # type: List[Op]
+        RecordingEmitter.recorded.append(self.ops)
+
+    def push_indent(self) -> None:
+        self.ops.append(("push", ""))
+        super().push_indent()
+
+    def pop_indent(self) -> None:
+        self.ops.append(("pop", ""))
+        super().pop_indent()
+
+    def emit(self, s: str) -> None:
+        self.ops.append(("emit", s))
+        super().emit(s)
+
+    def record_write(self, s: str) -> None:
+        self.ops.append(("write", s))
+        self.chunks.append(s)
+
+
+class DirectWriter:
+    """
+    Previous behavior: every piece is written to the file as it is emitted,
+    with the indent prefix rebuilt each time
+    """
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.indent_level = 0
+
+    def push_indent(self) -> None:
+        self.indent_level += 1
+
+    def pop_indent(self) -> None:
+        self.indent_level -= 1
+
+    def emit(self, s: str) -> None:
+        if self.indent_level:
+            self.f.write("    " * self.indent_level)
+        self.f.write(s)
+
+
+def replay(out: Any, ops: List[Op]) -> None:
+    for op, s in ops:
+        if op == "emit":
+            out.emit(s)
+        elif op == "write":
+            out.write(s)
+        elif op == "push":
+            out.push_indent()
+        else:
+            out.pop_indent()
+
+
+def replay_direct(ops: List[Op], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        out = DirectWriter(f)
+        out.write = f.write # type: ignore
+        replay(out, ops)
+
+
+def replay_stringio(ops: List[Op], path: str) -> None:
+    # Previous behavior of the CSR access test renderer
+    buf = io.StringIO()
+    out = DirectWriter(buf)
+    out.write = buf.write # type: ignore
+    replay(out, ops)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+
+
+def replay_emitter(ops: List[Op], path: str) -> None:
+    out = CodeEmitter()
+    replay(out, ops)
+    with open(path, "w", encoding="utf-8") as f:
+        out.flush_to(f)
+
+
+def record(top_node, tmp_dir: str) -> List[List[Op]]:
+    ds = DesignState(top_node)
+    DesignScanner(ds).run()
+
+    saved = (header_generator.CodeEmitter, csr_access_renderer.CodeEmitter)
+    header_generator.CodeEmitter = RecordingEmitter # type: ignore
+    csr_access_renderer.CodeEmitter = RecordingEmitter # type: ignore
+    try:
+        RecordingEmitter.recorded = []
+        HeaderGenerator(ds).run(os.path.join(tmp_dir, "top"), [top_node])
+        CsrAccessGenerator(ds).run(OutputFiles(tmp_dir), top_node)
+    finally:
+        header_generator.CodeEmitter, csr_access_renderer.CodeEmitter = saved
+    return RecordingEmitter.recorded
+
+
+def best_of(n: int, fn: Callable[[], None]) -> float:
+    best = float("inf")
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--blocks", type=int, default=50)
+    parser.add_argument("--regs", type=int, default=100)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rdl_path = os.path.join(tmp_dir, "top.rdl")
+        with open(rdl_path, "w", encoding="utf-8") as f:
+            f.write(generate_rdl(SynthConfig(
+                blocks=options.blocks, depth=1, regs=options.regs,
+                fields=options.fields, array_size=0, dup_ratio=0.0,
+            )))
+        rdlc = RDLCompiler()
+        rdlc.compile_file(rdl_path)
+        top_node = rdlc.elaborate().top
+
+        streams = record(top_node, tmp_dir)
+        n_ops = sum(len(ops) for ops in streams)
+        print(f"{len(streams)} files, {n_ops} emitted pieces")
+
+        def run_all(replay: Callable[[List[Op], str], None]) -> Callable[[], None]:
+            def fn() -> None:
+                for i, ops in enumerate(streams):
+                    replay(ops, os.path.join(tmp_dir, f"out{i}"))
+            return fn
+
+        t_direct = best_of(options.repeat, run_all(replay_direct))
+        t_stringio = best_of(options.repeat, run_all(replay_stringio))
+        t_emitter = best_of(options.repeat, run_all(replay_emitter))
+        print(f"direct writes: {t_direct * 1000:8.1f} ms")
+        print(f"StringIO:      {t_stringio * 1000:8.1f} ms")
+        print(f"CodeEmitter:   {t_emitter * 1000:8.1f} ms ({t_direct / t_emitter:.2f}x vs direct writes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmarks the exporter on a synthetic register map.
+
+Times every stage of the export, and measures its peak traced memory, using
+the exporter's own instrumentation. The results are then compared against a
+saved baseline. Exits with a non-zero status if any stage regressed beyond
+the tolerance.
+
+Usage:
+    python benchmarks/bench_export.py [--preset NAME] [--blocks N] [--depth N]
+        [--regs N] [--fields N] [--array-size N] [--dup-ratio R]
+        [--save-baseline] [--tolerance R]
+
+Baselines are stored in benchmarks/baselines/ and are specific to the machine
+they were recorded on.
+"""
+from typing import Dict, List, Optional
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from systemrdl import RDLCompiler
+
+from synth_rdl import PRESETS, SynthConfig, generate_rdl, generate_directives
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# pylint: disable=wrong-import-position
+from etched_peakrdl_cheader.exporter import CHeaderExporter
+from etched_peakrdl_cheader.export_options import ExportOptions
+from etched_peakrdl_cheader.instrumentation import Instrumentation, StageStats
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Stage time differences below this are considered noise
+MIN_TIME_DELTA = 0.005
+
+
+def run_export(
+    rdl_path: str, directives_path: str, out_dir: str, trace_memory: bool,
+    options: argparse.Namespace
+) -> Instrumentation:
+    # Compiling the RDL is not part of the export, but is worth keeping an
+    # eye on as well
+    stage = StageStats("compile")
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        rdlc = RDLCompiler()
+        rdlc.compile_file(rdl_path)
+        top_node = rdlc.elaborate().top
+        stage.wall_time = time.perf_counter() - start
+        if trace_memory:
+            stage.peak_memory = tracemalloc.get_traced_memory()[1]
+
+        export_options = ExportOptions()
+        export_options.gen_jobs = options.gen_jobs
+        export_options.trace_memory = trace_memory
+        instr = CHeaderExporter().export(
+            top_node, directives_path, out_dir, export_options, fused=options.fused,
+        )
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    instr.stages = dict([("compile", stage)] + list(instr.stages.items()))
+    return instr
+
+
+def run_benchmark(cfg: SynthConfig, options: argparse.Namespace) -> Dict:
+    results = {
+        "config": cfg.to_dict(),
+        "fused": options.fused,
+        "python": platform.python_version(),
+        "times": {},
+        "peak_memory": {},
+    } # type: Dict
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rdl_path = os.path.join(tmp_dir, "top.rdl")
+        with open(rdl_path, "w", encoding="utf-8") as f:
+            f.write(generate_rdl(cfg))
+        directives_path = os.path.join(tmp_dir, "directives.yaml")
+        with open(directives_path, "w", encoding="utf-8") as f:
+            f.write(generate_directives(cfg))
+
+        def run(trace_memory: bool) -> Instrumentation:
+            out_dir = tempfile.mkdtemp(dir=tmp_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                return run_export(rdl_path, directives_path, out_dir, trace_memory, options)
+
+        # Timing runs. Keep the best time of every stage
+        for _ in range(options.repeat):
+            instr = run(trace_memory=False)
+            for name, stage in instr.stages.items():
+                t = stage.wall_time
+                results["times"][name] = min(t, results["times"].get(name, t))
+        results["counters"] = instr.counters
+        results["nodes_visited"] = instr.nodes_visited
+
+        # Memory is traced in a separate run as tracing distorts timing
+        instr = run(trace_memory=True)
+        results["peak_memory"] = {
+            name: stage.peak_memory or 0 for name, stage in instr.stages.items()
+        }
+    return results
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def report(results: Dict, baseline: Optional[Dict], tolerance: float) -> List[str]:
+    """
+    Prints the results, and returns the list of regressions found
+    """
+    regressions = [] # type: List[str]
+    if baseline is not None and (
+        baseline["config"] != results["config"] or baseline["fused"] != results["fused"]
+    ):
+        print("Baseline was recorded with a different configuration. Not comparing")
+        baseline = None
+
+    print(f"{'stage':<12} {'time (ms)':>10} {'peak (MiB)':>11}   baseline")
+    for name, t in results["times"].items():
+        peak = results["peak_memory"][name]
+        line = f"{name:<12} {t * 1000:10.1f} {peak / 2**20:11.1f}"
+        if baseline is not None and name in baseline["times"]:
+            base_t = baseline["times"][name]
+            base_peak = baseline["peak_memory"][name]
+            line += f"   {base_t * 1000:8.1f} ms {base_peak / 2**20:8.1f} MiB"
+            if t > base_t * (1 + tolerance) and t - base_t > MIN_TIME_DELTA:
+                regressions.append(f"{name}: time {base_t * 1000:.1f} -> {t * 1000:.1f} ms")
+                line += "  <-- slower"
+            if peak > base_peak * (1 + tolerance):
+                regressions.append(
+                    f"{name}: peak memory {base_peak / 2**20:.1f} -> {peak / 2**20:.1f} MiB"
+                )
+                line += "  <-- more memory"
+        print(line)
+    total = sum(results["times"].values())
+    print(f"{'total':<12} {total * 1000:10.1f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--preset", choices=list(PRESETS), default="medium")
+    parser.add_argument("--blocks", type=int)
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--regs", type=int)
+    parser.add_argument("--fields", type=int)
+    parser.add_argument("--array-size", type=int)
+    parser.add_argument("--dup-ratio", type=float)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--gen-jobs", type=int, default=1)
+    parser.add_argument("--fused", action="store_true", help="Use the fused analysis walk")
+    parser.add_argument("--baseline", help="Baseline file. Defaults to baselines/<preset>.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth relative to the baseline")
+    options = parser.parse_args()
+
+    cfg = SynthConfig(**PRESETS[options.preset].to_dict())
+    customized = False
+    for name in ("blocks", "depth", "regs", "fields", "array_size", "dup_ratio"):
+        value = getattr(options, name)
+        if value is not None:
+            setattr(cfg, name, value)
+            customized = True
+    # Re-validate
+    cfg = SynthConfig(**cfg.to_dict())
+
+    baseline_path = options.baseline or os.path.join(
+        BASELINE_DIR, ("custom" if customized else options.preset) + ".json"
+    )
+
+    print(f"Synthetic map: {cfg}")
+    if shutil.which("clang-format") is None:
+        sys.exit("clang-format is required to run the export")
+    results = run_benchmark(cfg, options)
+    print(f"{results['counters']['files_generated']} files generated")
+
+    if options.save_baseline:
+        report(results, None, options.tolerance)
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"Saved baseline to {baseline_path}")
+        return
+
+    baseline = load_baseline(baseline_path)
+    if baseline is None:
+        print(f"No baseline at {baseline_path}. Save one with --save-baseline")
+    regressions = report(results, baseline, options.tolerance)
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
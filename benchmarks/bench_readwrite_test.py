@@ -0,0 +1,76 @@
+"""
+Measures the per-field cost of rendering the write-read test snippet
+(rw_readwrite_test.c) through jinja and through its equivalent format string.
+
+Usage:
+    python benchmarks/bench_readwrite_test.py [--fields N]
+"""
+from typing import Callable, Dict
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# pylint: disable=wrong-import-position
+from etched_peakrdl_cheader.code_emitter import CodeEmitter
+from etched_peakrdl_cheader.template_env import get_jj_env, get_format_template
+
+
+def get_context(i: int) -> Dict[str, str]:
+    field_prefix = f"BLK_REG__FIELD{i}"
+    return {
+        "reg_ptr": "reinterpret_cast<volatile uint32_t*>(reg_addr)",
+        "function_name": "BitFieldWriteReadTest32",
+        "field": f"BLK_REG::FIELD{i}",
+        "field_bp": f"{field_prefix}_bp",
+        "field_bw": f"{field_prefix}_bw",
+        "test_idx": f"{hex(i + 1)}",
+    }
+
+
+def best_of(n: int, fn: Callable[[], str]) -> float:
+    best = float("inf")
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fields", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    jj_env = get_jj_env()
+    template = jj_env.get_template("rw_readwrite_test.c")
+    pattern = get_format_template(jj_env, "rw_readwrite_test.c")
+    if pattern is None:
+        sys.exit("rw_readwrite_test.c is not eligible for the fast path")
+
+    def render_jinja() -> str:
+        out = CodeEmitter()
+        for i in range(options.fields):
+            template.stream(get_context(i)).dump(out)
+        return out.getvalue()
+
+    def render_format() -> str:
+        out = CodeEmitter()
+        for i in range(options.fields):
+            out.write(pattern.format_map(get_context(i)))
+        return out.getvalue()
+
+    if render_jinja() != render_format():
+        sys.exit("Fast path output differs from jinja output")
+
+    t_jinja = best_of(options.repeat, render_jinja) / options.fields
+    t_format = best_of(options.repeat, render_format) / options.fields
+    print(f"jinja:         {t_jinja * 1e6:6.2f} us/field")
+    print(f"format string: {t_format * 1e6:6.2f} us/field ({t_jinja / t_format:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
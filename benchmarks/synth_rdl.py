@@ -0,0 +1,126 @@
+"""
+Generates synthetic SystemRDL register maps, and matching directives, of
+configurable scale for benchmarking.
+
+The generated design is a top-level addrmap made of IP block instances.
+A share of the instances (dup_ratio) reuse the type of an earlier instance,
+like repeated IPs in a SoC do. Every IP type holds registers, an array of
+registers and an array of regfiles, plus a chain of nested sub-blocks down
+to the requested depth.
+"""
+from typing import Any, Dict, List
+
+
+class SynthConfig:
+    def __init__(
+        self,
+        blocks: int = 16,
+        depth: int = 2,
+        regs: int = 16,
+        fields: int = 8,
+        array_size: int = 4,
+        dup_ratio: float = 0.5,
+    ) -> None:
+        if not 1 <= fields <= 32:
+            raise ValueError(f"Fields per register must be in 1..32, got {fields}")
+        if not 0.0 <= dup_ratio < 1.0:
+            raise ValueError(f"Duplicate-type ratio must be in [0, 1), got {dup_ratio}")
+
+        # Number of IP block instances in the top-level addrmap
+        self.blocks = blocks
+        # Levels of addrmap hierarchy within each IP block
+        self.depth = max(depth, 1)
+        # Registers directly within every addrmap
+        self.regs = regs
+        # Fields per register
+        self.fields = fields
+        # Size of reg and regfile arrays. 0 disables arrays
+        self.array_size = array_size
+        # Share of IP instances that reuse an existing IP type
+        self.dup_ratio = dup_ratio
+
+    @property
+    def n_types(self) -> int:
+        return max(1, round(self.blocks * (1.0 - self.dup_ratio)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def __str__(self) -> str:
+        return ", ".join(f"{k}={v}" for k, v in self.to_dict().items())
+
+
+PRESETS = {
+    "small": SynthConfig(blocks=8, depth=1, regs=8, fields=4, array_size=2, dup_ratio=0.5),
+    "medium": SynthConfig(blocks=32, depth=2, regs=32, fields=8, array_size=4, dup_ratio=0.5),
+    "soc": SynthConfig(blocks=128, depth=3, regs=64, fields=16, array_size=8, dup_ratio=0.75),
+}
+
+
+def write_reg_type(lines: List[str], name: str, cfg: SynthConfig) -> None:
+    field_width = 32 // cfg.fields
+    lines.append(f"reg {name} {{")
+    for f in range(cfg.fields):
+        # Mix of read-write, read-only and write-only fields
+        if f % 4 == 2:
+            access = "sw=r; hw=w;"
+        elif f % 4 == 3:
+            access = "sw=w; hw=r;"
+        else:
+            access = "sw=rw; hw=r;"
+        lines.append(f"    field {{{access}}} f{f}[{field_width}] = 0;")
+    lines.append("};")
+
+
+def write_block_type(lines: List[str], t: int, level: int, cfg: SynthConfig) -> None:
+    if level + 1 < cfg.depth:
+        write_block_type(lines, t, level + 1, cfg)
+
+    lines.append(f"addrmap ip{t}_l{level}_t {{")
+    for r in range(cfg.regs):
+        lines.append(f"    ip{t}_reg_t r{r};")
+    if cfg.array_size:
+        lines.append(f"    ip{t}_reg_t tbl[{cfg.array_size}];")
+        lines.append(f"    ip{t}_rf_t rf[{cfg.array_size}];")
+    if level + 1 < cfg.depth:
+        lines.append(f"    ip{t}_l{level + 1}_t sub;")
+    lines.append("};")
+
+
+def generate_rdl(cfg: SynthConfig) -> str:
+    lines = [] # type: List[str]
+    for t in range(cfg.n_types):
+        write_reg_type(lines, f"ip{t}_reg_t", cfg)
+        lines.append(f"regfile ip{t}_rf_t {{")
+        lines.append(f"    ip{t}_reg_t a;")
+        lines.append(f"    ip{t}_reg_t b;")
+        lines.append("};")
+        write_block_type(lines, t, 0, cfg)
+
+    lines.append("addrmap top {")
+    for i in range(cfg.blocks):
+        lines.append(f"    ip{i % cfg.n_types}_l0_t ip{i};")
+    lines.append("};")
+    return "\n".join(lines) + "\n"
+
+
+def generate_directives(cfg: SynthConfig) -> str:
+    """
+    Directives that ignore a field in every 4th IP instance, some regfile
+    array elements in every 6th, and the nested sub-block of every 8th.
+    """
+    lines = ["synth:"]
+    for i in range(cfg.blocks):
+        entries = [] # type: List[str]
+        if i % 4 == 1 and cfg.regs:
+            entries += ["    r0:", "      f0:"]
+        if i % 6 == 2 and cfg.array_size > 1:
+            entries += ["    rf:", '      arrayignores: ["1"]']
+        if i % 8 == 3 and cfg.depth > 1:
+            entries += ["    sub:"]
+        if entries:
+            lines.append(f"  ip{i}:")
+            lines += entries
+    if len(lines) == 1:
+        return ""
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,9 @@
 from typing import TYPE_CHECKING
 
 from peakrdl.plugins.exporter import ExporterSubcommandPlugin #pylint: disable=import-error
-from peakrdl.config import schema #pylint: disable=import-error
 
 from .exporter import CHeaderExporter
-from .c_standards import CStandard
+from .export_options import ExportOptions
 
 if TYPE_CHECKING:
     import argparse
@@ -13,130 +12,121 @@ if TYPE_CHECKING:
 class Exporter(ExporterSubcommandPlugin):
     short_desc = "Generate a C header definition of an address space"
 
-    cfg_schema = {
-        "std": schema.Choice(list(CStandard.__members__.keys())),
-        "type_style": schema.Choice(['lexical', 'hier']),
-        "subword_size": schema.Integer(),
-        "bitfields": schema.Choice(["ltoh", "htol", "none"]),
-    }
-
     def add_exporter_arguments(self, arg_group: 'argparse._ActionsContainer') -> None:
         arg_group.add_argument(
-            "--std",
-            choices=list(CStandard.__members__.keys()),
-            default=None,
-            help=f"""
-            Select the C standard that generated output will conform to. [{CStandard.latest.name}]
+            "--directives",
+            default="",
+            help="""
+            YAML file of directives that exclude parts of the design from the
+            generated tests
             """
         )
 
         arg_group.add_argument(
-            "-b", "--bitfields",
-            choices=["ltoh", "htol", "none"],
-            default=None,
+            "--address-table",
+            action="store_true",
+            default=False,
             help="""
-            Enable generation of register bitfield structs to provide bit-level access
-            to fields.
-
-            Since the packing order of C struct bitfields is implementation defined, the
-            packing order must be explicitly specified. [none]
+            Also generate a reverse address lookup table of the design, as a
+            binary file and as a C header, that maps any address to the
+            register and fields it belongs to
             """
         )
 
         arg_group.add_argument(
-            "-x", "--explode-top",
+            "--array-loops",
             action="store_true",
             default=False,
-            help=""""
-            If set, the top-level hiearchy is skipped. Instead, definitions for
-            all the direct children are generated.
-
-            Note that only block-like definitons are generated.
-            i.e: children that are registers are skipped.
+            help="""
+            Test the elements of register, regfile and addrmap arrays with a
+            single loop in the generated read/write tests, rather than with
+            one call per element. Ignored elements are skipped using a
+            constant bitmap
             """
         )
 
         arg_group.add_argument(
-            "-i", "--instantiate",
+            "--table-tests",
             action="store_true",
             default=False,
-            help=""""
-            If set, header will also include a macro that instantiates each top-level
-            block at a defined hardware address, allowing for direct access.
+            help="""
+            Generate table-driven read/write tests. Each test library
+            describes its registers and fields with constant tables, which
+            are run by a shared generic runner, rather than with a test
+            function per register
             """
         )
 
-        # Wrap constructor to allow hex strings
-        def integer(n):
-            return int(n, 0)
-
         arg_group.add_argument(
-            "--inst-offset",
-            type=integer,
-            default=0,
+            "--global-test-idx",
+            action="store_true",
+            default=False,
             help="""
-            Apply an additional address offset to instance definitions.
+            Give every test a globally unique test index, made of the id of
+            the addrmap, regfile or array element it runs in and its index
+            in its test library. Also writes a binary test index map that
+            decodes failure codes to the field they tested
             """
         )
 
         arg_group.add_argument(
-            "--type-style",
-            dest="type_style",
-            choices=['lexical', 'hier'],
-            default=None,
-            help="""Choose how typedef names are generated.
-            The 'lexical' style will use RDL lexical scope & type names where
-            possible and attempt to re-use equivalent type definitions.
-            The 'hier' style uses component's hierarchy as the struct type name. [lexical]
+            "--save-snapshot",
+            default="",
+            help="""
+            Save the analyzed design, with directives applied, to this IR
+            snapshot file. Output can later be regenerated from the snapshot
+            without compiling the RDL again, with:
+            python -m etched_peakrdl_cheader.snapshot_export SNAPSHOT -o OUTPUT
             """
         )
 
         arg_group.add_argument(
-            "--subword-size",
-            type=int,
-            default=None,
+            "--stats",
+            default="",
             help="""
-            C's <stdint.h> types only extend up to 64-bit types.
+            Write export statistics (per-stage time, nodes visited, files and
+            bytes generated, template renders) as JSON to this file. Also
+            printed when running with --verbose
+            """
+        )
 
-            If a register is encountered that is larger than this, the generated
-            header will represent it using an array of smaller sub-words.
-            Set the desired sub-word size of 8, 16, 32 or 64. [32]
+        arg_group.add_argument(
+            "--profile",
+            action="store_true",
+            default=False,
+            help="""
+            Profile the export with cProfile and include the most expensive
+            functions in the export statistics
             """
         )
 
         arg_group.add_argument(
-            "--testcase",
+            "--trace-memory",
             action="store_true",
             default=False,
             help="""
-            Create a testcase C file that validates the header
+            Trace memory allocations during the export and include per-stage
+            peak memory and the largest allocation sites in the export
+            statistics
             """
         )
 
     def do_export(self, top_node: 'AddrmapNode', options: 'argparse.Namespace') -> None:
-        std_name = options.std or self.cfg['std'] or "latest"
-        std = CStandard[std_name]
-
-        bitfields = options.bitfields or self.cfg['bitfields'] or "none"
-        generate_bitfields = bitfields != "none"
-        bitfield_order_ltoh = bitfields == "ltoh"
-
-        type_style = options.type_style or self.cfg['type_style'] or "lexical"
-        reuse_typedefs = type_style == "lexical"
-
-        subword_size = options.subword_size or self.cfg['subword_size'] or 32
+        export_options = ExportOptions()
+        export_options.address_table = options.address_table
+        export_options.array_loops = options.array_loops
+        export_options.table_tests = options.table_tests
+        export_options.global_test_idx = options.global_test_idx
+        export_options.stats_path = options.stats
+        export_options.profile = options.profile
+        export_options.trace_memory = options.trace_memory
+        export_options.verbose = getattr(options, "verbose", False)
 
         x = CHeaderExporter()
         x.export(
             top_node,
-            path=options.output,
-            std=std,
-            generate_bitfields=generate_bitfields,
-            bitfield_order_ltoh=bitfield_order_ltoh,
-            reuse_typedefs=reuse_typedefs,
-            wide_reg_subword_size=subword_size,
-            explode_top=options.explode_top,
-            instantiate=options.instantiate,
-            inst_offset=options.inst_offset,
-            testcase=options.testcase,
+            directives_path=options.directives,
+            out_dir=options.output,
+            options=export_options,
+            snapshot_path=options.save_snapshot,
         )
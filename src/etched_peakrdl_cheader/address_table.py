@@ -0,0 +1,413 @@
+from typing import List, Optional, Tuple
+from array import array
+import bisect
+import struct
+import sys
+
+from .binary_table import BinaryTable
+from .code_emitter import CodeEmitter
+from .design_ir import DesignIR, KIND_REG, KIND_NAMES
+
+
+class AddressMatch:
+    """
+    Result of an address lookup
+    """
+    def __init__(self, path: str, kind: str, offset: int, fields: List[str]) -> None:
+        # Path of the deepest node that contains the address
+        self.path = path
+        # Type of that node: addrmap, regfile, mem or reg
+        self.kind = kind
+        # Byte offset of the address within the node
+        self.offset = offset
+        # Register fields that have bits in the addressed byte
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        s = f"{self.path} ({self.kind}) +{self.offset:#x}"
+        if self.fields:
+            s += " " + ", ".join(self.fields)
+        return s
+
+
+class AddressTable(BinaryTable):
+    """
+    Reverse address lookup table of a design.
+
+    The table holds one entry per non-unrolled node. Arrays are described by
+    their dimensions and stride rather than expanded, so the table stays
+    small however many register instances the design unrolls to, and no
+    names are built until a lookup asks for one.
+
+    Nodes are stored breadth-first, in parallel arrays, so that the children
+    of every node are contiguous and sorted by offset. A lookup binary
+    searches the children of one level at a time, and works out the array
+    element it lands in arithmetically. The children of a register are its
+    fields, sorted by low bit.
+
+    The same arrays are written out as a binary file and as a C header.
+    """
+    NAME = "Address table"
+    MAGIC = b"RDLADDR\0"
+    VERSION = 1
+
+    # magic, version, reserved, nodes, dims, fields, string table size, base address
+    HEADER = struct.Struct("<8sHHIIIIQ")
+
+    # Node and field arrays, in file order: (attribute, C struct member)
+    NODE_ARRAYS = (
+        ("parents", "parent"),
+        ("names", "name"),
+        ("kinds", "kind"),
+        ("ndims", "ndims"),
+        ("dims_starts", "dims_start"),
+        ("first_children", "first_child"),
+        ("n_children", "n_children"),
+        ("offsets", "offset"),
+        ("sizes", "size"),
+        ("strides", "stride"),
+        ("counts", "count"),
+    )
+    FIELD_ARRAYS = (
+        ("field_lsbs", "lsb"),
+        ("field_widths", "width"),
+        ("field_names", "name"),
+    )
+
+    def __init__(self, base_address: int = 0) -> None:
+        super().__init__()
+        # Absolute address of the top node
+        self.base_address = base_address
+
+        # Per node. Index of the parent node, -1 for the top node
+        self.parents = array("i")
+        # Offset of the name in the string table
+        self.names = array("I")
+        self.kinds = array("B")
+        # Array dimensions, as a range of dims
+        self.ndims = array("B")
+        self.dims_starts = array("I")
+        # Children, as a range of nodes. For registers, a range of fields
+        self.first_children = array("I")
+        self.n_children = array("I")
+        # Offset of the first element within the parent's element
+        self.offsets = array("Q")
+        # Size and stride of one element, and number of elements
+        self.sizes = array("Q")
+        self.strides = array("Q")
+        self.counts = array("Q")
+
+        # Array dimensions of all nodes
+        self.dims = array("I")
+
+        # Per field
+        self.field_lsbs = array("H")
+        self.field_widths = array("H")
+        self.field_names = array("I")
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    @classmethod
+    def from_ir(cls, ir: DesignIR) -> 'AddressTable':
+        table = cls(ir.base_address)
+        table.add_node(ir, 0, -1)
+
+        i = 0
+        nodes = [0] # IR node of every table node
+        while i < len(nodes):
+            node = nodes[i]
+            if ir.kinds[node] == KIND_REG:
+                table.first_children.append(len(table.field_lsbs))
+                fields = sorted(ir.fields(node), key=lambda f: ir.field_lsbs[f])
+                for f in fields:
+                    table.field_lsbs.append(ir.field_lsbs[f])
+                    table.field_widths.append(ir.field_widths[f])
+                    table.field_names.append(table.intern(ir.strings[ir.field_names[f]]))
+                table.n_children.append(len(fields))
+            else:
+                table.first_children.append(len(nodes))
+                # Stable, so co-located children keep their order in the block
+                children = sorted(ir.children(node), key=lambda c: ir.offsets[c])
+                for child in children:
+                    table.add_node(ir, child, i)
+                nodes += children
+                table.n_children.append(len(children))
+            i += 1
+        return table
+
+    def add_node(self, ir: DesignIR, node: int, parent: int) -> None:
+        dims = ir.get_array_dimensions(node) if parent >= 0 else []
+        count = 1
+        for dim in dims:
+            count *= dim
+
+        self.parents.append(parent)
+        self.names.append(self.intern(ir.get_name(node)))
+        self.kinds.append(ir.kinds[node])
+        self.ndims.append(len(dims))
+        self.dims_starts.append(len(self.dims))
+        self.dims.extend(dims)
+        self.offsets.append(ir.offsets[node] if parent >= 0 else 0)
+        self.sizes.append(ir.sizes[node])
+        self.strides.append(ir.strides[node] if dims else ir.sizes[node])
+        self.counts.append(count)
+
+    #---------------------------------------------------------------------------
+    # Queries
+    #---------------------------------------------------------------------------
+    def walk(self, addr: int) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Descends to the deepest node that contains addr.
+
+        Returns the (node, array element) steps taken, and the offset of addr
+        within the last node's element. Returns no steps if addr is outside
+        the design.
+        """
+        rel = addr - self.base_address
+        if not 0 <= rel < self.sizes[0]:
+            return [], 0
+
+        offsets = self.offsets
+        steps = [(0, 0)]
+        node = 0
+        while self.kinds[node] != KIND_REG:
+            first = self.first_children[node]
+            last = first + self.n_children[node]
+            i = bisect.bisect_right(offsets, rel, first, last) - 1
+            if i < first:
+                break
+            # Co-located registers share an offset. Report the first of them
+            while i > first and offsets[i - 1] == offsets[i]:
+                i -= 1
+            child_rel = rel - offsets[i]
+            if child_rel >= self.counts[i] * self.strides[i]:
+                break
+
+            element, rel = divmod(child_rel, self.strides[i])
+            steps.append((i, element))
+            node = i
+            if rel >= self.sizes[node]:
+                # Padding between array elements
+                break
+        return steps, rel
+
+    def lookup(self, addr: int) -> Optional[AddressMatch]:
+        """
+        Returns what the absolute address addr maps to, or None if it is
+        outside the design
+        """
+        steps, rel = self.walk(addr)
+        if not steps:
+            return None
+
+        node = steps[-1][0]
+        fields = []
+        if self.kinds[node] == KIND_REG and rel < self.sizes[node]:
+            lo = rel * 8
+            hi = lo + 7
+            first = self.first_children[node]
+            for i in range(first, first + self.n_children[node]):
+                lsb = self.field_lsbs[i]
+                if lsb > hi:
+                    break
+                if lsb + self.field_widths[i] > lo:
+                    fields.append(self.get_string(self.field_names[i]))
+
+        return AddressMatch(
+            self.get_path(steps), KIND_NAMES[self.kinds[node]], rel, fields
+        )
+
+    def get_path(self, steps: List[Tuple[int, int]]) -> str:
+        segments = []
+        for node, element in steps:
+            segment = self.get_string(self.names[node])
+            start = self.dims_starts[node]
+            dims = self.dims[start:start + self.ndims[node]]
+            idxs = []
+            for dim in reversed(dims):
+                element, idx = divmod(element, dim)
+                idxs.append(idx)
+            for idx in reversed(idxs):
+                segment += f"[{idx}]"
+            segments.append(segment)
+        return ".".join(segments)
+
+    #---------------------------------------------------------------------------
+    # Serialization
+    #---------------------------------------------------------------------------
+    def get_arrays(self) -> List[array]:
+        names = [name for name, _ in self.NODE_ARRAYS]
+        names.append("dims")
+        names += [name for name, _ in self.FIELD_ARRAYS]
+        return [getattr(self, name) for name in names]
+
+    def pack_header(self) -> bytes:
+        return self.HEADER.pack(
+            self.MAGIC, self.VERSION, 0, len(self), len(self.dims),
+            len(self.field_lsbs), len(self.strings), self.base_address
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'AddressTable':
+        if len(data) < cls.HEADER.size:
+            raise ValueError(f"{cls.NAME} is truncated")
+        (
+            magic, version, _, n_nodes, n_dims, n_fields, strings_size, base_address
+        ) = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("Not an address table")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported address table version {version}")
+
+        table = cls(base_address)
+        lengths = [n_nodes] * len(cls.NODE_ARRAYS) + [n_dims] + [n_fields] * len(cls.FIELD_ARRAYS)
+        table.read_arrays(data, cls.HEADER.size, lengths, strings_size)
+        return table
+
+    #---------------------------------------------------------------------------
+    # C output
+    #---------------------------------------------------------------------------
+    def write_c_header(self, f: CodeEmitter, prefix: str) -> None:
+        guard = f"{prefix.upper()}_ADDR_TABLE_H"
+        f.write(f"#ifndef {guard}\n#define {guard}\n\n")
+        f.write("#include <stdint.h>\n\n")
+
+        f.write(f"#define {prefix.upper()}_ADDR_BASE {self.base_address:#x}ULL\n\n")
+        f.write("typedef struct {\n")
+        f.push_indent()
+        for name, member in self.NODE_ARRAYS:
+            f.emit(f"{C_TYPES[getattr(self, name).typecode]} {member};\n")
+        f.pop_indent()
+        f.write(f"}} {prefix}_addr_node_t;\n\n")
+        f.write("typedef struct {\n")
+        f.push_indent()
+        for name, member in self.FIELD_ARRAYS:
+            f.emit(f"{C_TYPES[getattr(self, name).typecode]} {member};\n")
+        f.pop_indent()
+        f.write(f"}} {prefix}_addr_field_t;\n\n")
+
+        node_arrays = [getattr(self, name) for name, _ in self.NODE_ARRAYS]
+        f.write(f"static const {prefix}_addr_node_t {prefix}_addr_nodes[] = {{\n")
+        for values in zip(*node_arrays):
+            f.write("    {" + ", ".join(str(v) for v in values) + "},\n")
+        f.write("};\n\n")
+
+        # Empty array initializers are not valid C
+        f.write(f"static const uint32_t {prefix}_addr_dims[] = {{")
+        f.write(", ".join(str(v) for v in self.dims) if self.dims else "0")
+        f.write("};\n\n")
+
+        field_arrays = [getattr(self, name) for name, _ in self.FIELD_ARRAYS]
+        f.write(f"static const {prefix}_addr_field_t {prefix}_addr_fields[] = {{\n")
+        for values in zip(*field_arrays):
+            f.write("    {" + ", ".join(str(v) for v in values) + "},\n")
+        if not self.field_lsbs:
+            f.write("    {0, 0, 0},\n")
+        f.write("};\n\n")
+
+        # One literal per name, so that no NUL escape runs into the next name
+        f.write(f"static const char {prefix}_addr_strings[] =\n")
+        for name in self.string_offsets:
+            f.write(f'    "{name}\\0"\n')
+        f.write("    \"\";\n\n")
+
+        f.write(LOOKUP_C_TEMPLATE.format(
+            prefix=prefix, PREFIX=prefix.upper(), kind_reg=KIND_REG
+        ))
+        f.write(f"\n#endif /* {guard} */\n")
+
+
+C_TYPES = {
+    "B": "uint8_t",
+    "H": "uint16_t",
+    "i": "int32_t",
+    "I": "uint32_t",
+    "Q": "uint64_t",
+}
+
+LOOKUP_C_TEMPLATE = """\
+typedef struct {{
+    int32_t node;
+    uint64_t element;
+}} {prefix}_addr_step_t;
+
+/*
+ * Descends to the deepest node that contains the absolute address addr.
+ * The (node, array element) steps taken are stored in steps, and the offset of
+ * addr within the last node's element in offset.
+ * Returns the number of steps, or 0 if addr is outside the design.
+ */
+static inline int {prefix}_addr_lookup(
+    uint64_t addr, {prefix}_addr_step_t *steps, int max_steps, uint64_t *offset
+) {{
+    const {prefix}_addr_node_t *n;
+    uint64_t rel = addr - {PREFIX}_ADDR_BASE;
+    uint64_t child_rel;
+    uint32_t lo, hi, mid;
+    int32_t node = 0;
+    int n_steps = 0;
+
+    /* Addresses below the base wrap around past the end of the design */
+    if (rel >= {prefix}_addr_nodes[0].size || max_steps < 1) {{
+        return 0;
+    }}
+    steps[n_steps].node = 0;
+    steps[n_steps].element = 0;
+    n_steps++;
+
+    while ({prefix}_addr_nodes[node].kind != {kind_reg} && n_steps < max_steps) {{
+        /* Find the last child with an offset <= rel */
+        lo = {prefix}_addr_nodes[node].first_child;
+        hi = lo + {prefix}_addr_nodes[node].n_children;
+        while (lo < hi) {{
+            mid = lo + (hi - lo) / 2;
+            if ({prefix}_addr_nodes[mid].offset <= rel) {{
+                lo = mid + 1;
+            }} else {{
+                hi = mid;
+            }}
+        }}
+        if (lo == {prefix}_addr_nodes[node].first_child) {{
+            break;
+        }}
+        lo--;
+        /* Co-located registers share an offset. Report the first of them */
+        while (lo > {prefix}_addr_nodes[node].first_child
+               && {prefix}_addr_nodes[lo - 1].offset == {prefix}_addr_nodes[lo].offset) {{
+            lo--;
+        }}
+        n = &{prefix}_addr_nodes[lo];
+        child_rel = rel - n->offset;
+        if (child_rel >= n->count * n->stride) {{
+            break;
+        }}
+
+        node = (int32_t)lo;
+        steps[n_steps].node = node;
+        steps[n_steps].element = child_rel / n->stride;
+        n_steps++;
+        rel = child_rel % n->stride;
+        if (rel >= n->size) {{
+            /* Padding between array elements */
+            break;
+        }}
+    }}
+    *offset = rel;
+    return n_steps;
+}}
+"""
+
+
+def main(argv: List[str]) -> None:
+    if len(argv) < 2:
+        sys.exit(f"Usage: {argv[0]} ADDR_TABLE.bin ADDRESS...")
+    table = AddressTable.load(argv[1])
+    for arg in argv[2:]:
+        addr = int(arg, 0)
+        match = table.lookup(addr)
+        print(f"{addr:#x}: {match if match is not None else 'not mapped'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
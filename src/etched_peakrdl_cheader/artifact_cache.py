@@ -0,0 +1,95 @@
+from typing import Dict, Optional, Any
+import json
+import os
+import tempfile
+
+
+class ArtifactCache:
+    """
+    Persistent, content-addressed store of generated per-addrmap artifacts.
+
+    Each entry is a small JSON file named after its key, which is a
+    structural hash of everything the artifacts were generated from.
+    Entries are kept in least-recently-used order using their modification
+    time: a hit refreshes it, and prune() evicts the oldest entries until
+    the cache fits in its size limits.
+    """
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                artifacts = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        # Mark as recently used
+        os.utime(path)
+        self.hits += 1
+        return artifacts
+
+    def put(self, key: str, artifacts: Dict[str, Any]) -> None:
+        # Write to a temporary file first so that concurrent readers never
+        # see a partially written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(artifacts, f)
+        os.replace(tmp_path, self.entry_path(key))
+        self.stores += 1
+
+    def prune(self) -> None:
+        """
+        Evict least recently used entries until the cache is within its limits
+        """
+        entries = [] # (mtime, size, path)
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        total_bytes = sum(size for _, size, _ in entries)
+        n_entries = len(entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes and (
+                self.max_entries is None or n_entries <= self.max_entries
+            ):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            n_entries -= 1
+            self.evictions += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"{self.hits}/{lookups} blocks served from cache ({rate:.1%}), "
+            f"{self.stores} stored, {self.evictions} evicted"
+        )
@@ -0,0 +1,90 @@
+from typing import Dict, List, Type, TypeVar
+from array import array
+import sys
+
+
+T = TypeVar("T", bound="BinaryTable")
+
+
+class BinaryTable:
+    """
+    Base of the lookup tables that are written out as binary files.
+
+    A table is a set of parallel arrays and a string table of NUL-separated
+    names. Its binary is a header, followed by every array in little-endian
+    order and aligned to 8 bytes, followed by the string table, so that it
+    can be mapped and used in place. Subclasses define the header and the
+    arrays it holds.
+    """
+    # Name of the table in error messages
+    NAME = "Table"
+
+    def __init__(self) -> None:
+        # NUL-separated names. Every distinct name is stored once
+        self.strings = bytearray()
+        self.string_offsets = {} # type: Dict[str, int]
+
+    def intern(self, name: str) -> int:
+        offset = self.string_offsets.get(name)
+        if offset is None:
+            offset = len(self.strings)
+            self.strings += name.encode("utf-8") + b"\0"
+            self.string_offsets[name] = offset
+        return offset
+
+    def get_string(self, offset: int) -> str:
+        end = self.strings.index(b"\0", offset)
+        return self.strings[offset:end].decode("utf-8")
+
+    #---------------------------------------------------------------------------
+    # Serialization
+    #---------------------------------------------------------------------------
+    def get_arrays(self) -> List[array]:
+        """
+        Returns the arrays of the table, in file order
+        """
+        raise NotImplementedError
+
+    def pack_header(self) -> bytes:
+        raise NotImplementedError
+
+    def to_bytes(self) -> bytes:
+        chunks = [self.pack_header()]
+        for a in self.get_arrays():
+            if sys.byteorder != "little":
+                a = array(a.typecode, a)
+                a.byteswap()
+            data = a.tobytes()
+            chunks.append(data + bytes(-len(data) % 8))
+        chunks.append(bytes(self.strings))
+        return b"".join(chunks)
+
+    def read_arrays(self, data: bytes, pos: int, lengths: List[int], strings_size: int) -> None:
+        """
+        Reads the arrays and string table of a binary, from the end of its
+        header at pos. lengths holds the number of items of every array
+        """
+        for a, length in zip(self.get_arrays(), lengths):
+            size = length * a.itemsize
+            a.frombytes(data[pos:pos + size])
+            if len(a) != length:
+                raise ValueError(f"{self.NAME} is truncated")
+            if sys.byteorder != "little":
+                a.byteswap()
+            pos += size + (-size % 8)
+        self.strings = bytearray(data[pos:pos + strings_size])
+        if len(self.strings) != strings_size:
+            raise ValueError(f"{self.NAME} is truncated")
+
+    @classmethod
+    def from_bytes(cls: Type[T], data: bytes) -> T:
+        raise NotImplementedError
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls: Type[T], path: str) -> T:
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
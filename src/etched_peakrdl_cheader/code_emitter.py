@@ -0,0 +1,58 @@
+from typing import Callable, Iterable, List, TextIO
+
+
+class CodeEmitter:
+    """
+    In-memory buffer for generated code.
+
+    Text is accumulated as a list of chunks and only joined once, when the
+    content is requested, so that the generators can emit code in many small
+    pieces without paying for each one.
+    Behaves like a writable text file, so it can also be used as the target
+    of a streamed jinja template.
+    """
+    def __init__(self, indent: str = "    ") -> None:
+        self.chunks: List[str]
+        self.chunks = []
+
+        # Unindented writes go straight to the buffer
+        self.write: Callable[[str], None]
+        self.write = self.chunks.append
+
+        self.indent_level = 0
+
+        # Indent prefix of every indent level seen so far
+        self.indent_unit = indent
+        self.indents: List[str]
+        self.indents = [""]
+
+    def push_indent(self) -> None:
+        self.indent_level += 1
+        if self.indent_level == len(self.indents):
+            self.indents.append(self.indents[-1] + self.indent_unit)
+
+    def pop_indent(self) -> None:
+        self.indent_level -= 1
+
+    def emit(self, s: str) -> None:
+        """
+        Write s at the current indent level
+        """
+        if self.indent_level:
+            self.chunks.append(self.indents[self.indent_level])
+        self.chunks.append(s)
+
+    def writelines(self, lines: Iterable[str]) -> None:
+        self.chunks.extend(lines)
+
+    def getvalue(self) -> str:
+        if len(self.chunks) > 1:
+            # Collapse so that repeated calls do not re-join everything
+            self.chunks[:] = ["".join(self.chunks)]
+        return self.chunks[0] if self.chunks else ""
+
+    def flush_to(self, f: TextIO) -> None:
+        """
+        Write the accumulated content out to f in one go
+        """
+        f.write(self.getvalue())
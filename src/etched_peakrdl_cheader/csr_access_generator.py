@@ -1,460 +1,367 @@
-from typing import TextIO, Set, Optional, List
+from typing import Set, Optional, List, Tuple, Any, Dict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import os
-
-from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
-from systemrdl.node import (
-    AddrmapNode,
-    AddressableNode,
-    RegNode,
-    RegfileNode,
-    SignalNode,
-    FieldNode,
-    Node,
-    MemNode,
-)
+import pickle
 
 from .design_state import DesignState
+from .design_ir import (
+    DesignIR,
+    KIND_ADDRMAP,
+    KIND_REGFILE,
+    KIND_MEM,
+    KIND_REG,
+    NODE_IGNORE,
+    FIELD_IGNORE,
+    FIELD_SW_READABLE,
+    FIELD_SW_WRITABLE,
+    FIELD_SINGLEPULSE,
+)
+from .code_emitter import CodeEmitter
+from .output_files import OutputFiles
+from .artifact_cache import ArtifactCache
+from .range_set import RangeSet
+from .test_idx_map import TestIdxMap
+from .__about__ import __version__
 from .identifier_filter import kw_filter as kwf
-from . import utils
+from . import csr_access_renderer
+from . import range_set
+from . import template_env
+from .csr_access_renderer import (
+    BlockItem,
+    ChildItem,
+    RegItem,
+    RegfileItem,
+    MemItem,
+    AddrmapRefItem,
+    FieldItem,
+    BlockTemplates,
+    render_block,
+    TABLE_RUNNER,
+    LOCAL_IDX_BITS,
+    INSTANCE_IDX_BITS,
+)
 
 
-class CsrAccessGenerator(RDLListener):
-    def __init__(self, ds: DesignState) -> None:
-        self.ds = ds
-        self.indent_level = 0
-        self.rootdir: str
-        self.fbuild: TextIO
-        self.f_test_idx_map: TextIO
-        self.traversed = set()
-        self.test_idx = 0
-        self.array_nest_lvl = 0
-
-        self.root_node: AddrmapNode
-        self.root_node = None
-        self.stack = []
-
-        self.f: TextIO
-        self.f = None  # type: ignore
-
-    def run(self, rootdir: str, top_node: AddrmapNode) -> None:
-        self.rootdir = rootdir
-        self.fbuild = open(rootdir + "BUILD", "w")
-        self.fbuild.write('load("@rules_cc//cc:defs.bzl", "cc_library")\n\n')
-        self.f_test_idx_map = open(
-            rootdir + f".{top_node.inst_name}_text_idx_map.txt", "w"
-        )
-        self.root_node = top_node
-        RDLWalker().walk(top_node, self)
-        self.fbuild.close()
-        self.f_test_idx_map.close()
+# Templates whose content ends up in the per-addrmap artifacts
+ARTIFACT_TEMPLATES = (
+    "BUILD_TEMPLATE",
+    "rw_readwrite_test.c",
+    "rw_test_lib_header.h",
+    "rw_test_registers_header.c",
+)
 
-    def get_node_prefix(self, node: AddressableNode) -> str:
-        return utils.get_node_prefix(self.ds, self.root_node, node)
 
-    def get_struct_name(self, node: AddressableNode) -> str:
-        return utils.get_struct_name(self.ds, self.root_node, node)
+def get_generator_fingerprint() -> bytes:
+    """
+    Hash of everything besides the design itself that affects generated
+    artifacts. Any change to the generator invalidates cached artifacts.
+    """
+    h = hashlib.sha256(__version__.encode("utf-8"))
+    template_dir = os.path.join(os.path.dirname(__file__), "templates")
+    sources = [__file__, csr_access_renderer.__file__, range_set.__file__, template_env.__file__]
+    sources += [os.path.join(template_dir, t) for t in ARTIFACT_TEMPLATES]
+    for path in sources:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.digest()
+
+
+class CsrAccessGenerator:
+    """
+    Generates a read/write test library for every unique addrmap.
+
+    Generation happens in two steps. The design IR is first walked to
+    build a work list with one BlockItem per unique addrmap, which holds
+    everything needed to render its files. The work items are then rendered,
+    either serially or across a process pool. Either way, output is assembled
+    in work list order so it is identical regardless of how it was rendered.
+    """
+    def __init__(
+        self,
+        ds: DesignState,
+        *,
+        cache: Optional[ArtifactCache] = None,
+        jobs: int = 1,
+        array_loops: bool = False,
+        table_tests: bool = False,
+        global_test_idx: bool = False,
+    ) -> None:
+        self.ds = ds
+        self.cache = cache
+        self.jobs = jobs
+        self.array_loops = array_loops
+        self.table_tests = table_tests
+        self.global_test_idx = global_test_idx
+        self.fingerprint = get_generator_fingerprint() if cache is not None else b""
+        self.traversed = set() # type: Set[str]
+
+        # Compiled once, on first use
+        self._templates = None # type: Optional[BlockTemplates]
+
+        # Work list, in pre-order, along with the path of the addrmap each item
+        # was planned from
+        self.work_list = [] # type: List[Tuple[str, BlockItem]]
+
+        # Number of blocks rendered in this run, and of template renders done
+        # for them. Blocks served from the artifact cache are not counted
+        self.blocks_rendered = 0
+        self.render_counts = {} # type: Dict[str, int]
+
+    def run(self, outputs: OutputFiles, ir: DesignIR) -> None:
+        self.plan(ir)
+        if self.global_test_idx:
+            self.assign_instance_ids()
+
+        artifacts = self.render_work_list()
+
+        fbuild = outputs.open("BUILD")
+        fbuild.write('load("@rules_cc//cc:defs.bzl", "cc_library")\n\n')
+        if self.table_tests:
+            self.write_table_runner(outputs, fbuild)
+        f_test_idx_map = outputs.open(f".{ir.get_name(0)}_text_idx_map.txt")
+        for (block_path, block), block_artifacts in zip(self.work_list, artifacts):
+            outputs.open(block.file_prefix + ".h").write(block_artifacts["h"])
+            outputs.open(block.file_prefix + ".cc").write(block_artifacts["cc"])
+            fbuild.write(block_artifacts["build"])
+            for idx, rel_path in block_artifacts["idx_map"]:
+                f_test_idx_map.write(f"{idx} {block_path}.{rel_path}\n")
+
+        if self.global_test_idx:
+            idx_maps = [a["idx_map"] for a in artifacts]
+            for (block_path, _), idx_map in zip(self.work_list, idx_maps):
+                if len(idx_map) >= 1 << LOCAL_IDX_BITS:
+                    raise ValueError(
+                        f"{block_path} has {len(idx_map)} tests, more than global test indexes allow"
+                    )
+            outputs.add_binary(
+                f"{ir.get_name(0)}_test_idx_map.bin",
+                TestIdxMap.from_work_list(self.work_list, idx_maps).to_bytes()
+            )
 
-    def get_friendly_name(self, node: Node) -> str:
-        return utils.get_friendly_name(self.ds, self.root_node, node)
+        if self.cache is not None:
+            self.cache.prune()
 
-    def get_addrmap_relative_name(self, node: Node) -> str:
-        stk = []
-        curr = node
-        while type(curr) is not AddrmapNode:
-            stk.append(curr.inst_name)
-            curr = curr.parent
-        return ("_".join(stk)).title().replace("_", "")
-
-    def get_prefix(self, node: Node) -> str:
-        # Returns node prefix while maintaining lack of collisions if
-        # file is custom rebuilt based on directives and therefore
-        # differs from base version
-        # Note: Changed from using rebuild as flag for rebuild to !unique,
-        # ensuring no repeats unless in array
-        if node.rebuild:
-            root = node
-            while root.rebuild:
-                root = root.parent
-            return (
-                self.get_node_prefix(root)
-                + "_"
-                + node.get_rel_path(
-                    root, hier_separator="_", array_suffix="", empty_array_suffix=""
-                )
-            )
+    def write_table_runner(self, outputs: OutputFiles, fbuild: CodeEmitter) -> None:
+        # Shared by the test libraries of all blocks
+        jj_env = self.ds.jj_env
+        outputs.open(f"{TABLE_RUNNER}.h").write(
+            jj_env.get_template(f"{TABLE_RUNNER}.h").render()
+        )
+        context = {"name": TABLE_RUNNER, "hdrs": f"{TABLE_RUNNER}.h"}
+        fbuild.write(jj_env.get_template("RUNNER_BUILD_TEMPLATE").render(context))
+
+    def render_work_list(self) -> List[Dict[str, Any]]:
+        artifacts = [None] * len(self.work_list) # type: List[Any]
+
+        # Serve whatever is available from the artifact cache. Keys are kept,
+        # by work list index, to store what gets rendered
+        keys = {} # type: Dict[int, str]
+        if self.cache is not None:
+            for i, (_, block) in enumerate(self.work_list):
+                key = self.get_cache_key(block)
+                keys[i] = key
+                artifacts[i] = self.cache.get(key)
+
+        todo = [i for i, a in enumerate(artifacts) if a is None]
+        blocks = [self.work_list[i][1] for i in todo]
+        if self.jobs > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=csr_access_renderer.init_worker,
+                initargs=(self.ds.precompiled_templates,),
+            ) as pool:
+                chunksize = max(1, len(blocks) // (self.jobs * 4))
+                rendered = list(pool.map(
+                    csr_access_renderer.render_block_in_worker, blocks,
+                    chunksize=chunksize
+                ))
         else:
-            return utils.get_node_prefix(self.ds, node, node)
+            rendered = [render_block(block, self.templates) for block in blocks]
+
+        for i, block_artifacts in zip(todo, rendered):
+            artifacts[i] = block_artifacts
+            self.blocks_rendered += 1
+            for name, n in block_artifacts["renders"].items():
+                self.render_counts[name] = self.render_counts.get(name, 0) + n
+            if self.cache is not None:
+                self.cache.put(keys[i], block_artifacts)
+        return artifacts
+
+    @property
+    def templates(self) -> BlockTemplates:
+        if self._templates is None:
+            self._templates = BlockTemplates(self.ds.jj_env)
+        return self._templates
+
+    def get_cache_key(self, block: BlockItem) -> str:
+        # The work item holds everything that the addrmap's artifacts are
+        # rendered from, so it doubles as the structural description
+        h = hashlib.sha256(self.fingerprint)
+        h.update(pickle.dumps(block, protocol=4))
+        return h.hexdigest()
+
+    # --------------------------------------------------------------------------
+    # Global test indexes
+    # --------------------------------------------------------------------------
+    def assign_instance_ids(self) -> None:
+        # Instance ids are numbered in pre-order. Every child is assigned the
+        # offset of its first element's id from its parent's, and the number
+        # of ids each element takes. Ignored elements keep their ids so that
+        # ignoring an element does not renumber the others
+        blocks = {block.namespace: block for _, block in self.work_list}
+        sizes = {} # type: Dict[str, int]
+        top_path, top = self.work_list[0]
+        if self.get_block_size(top.namespace, blocks, sizes) > 1 << INSTANCE_IDX_BITS:
+            raise ValueError(f"{top_path} has more instances than global test indexes allow")
+
+    def get_block_size(
+        self, namespace: str, blocks: Dict[str, BlockItem], sizes: Dict[str, int]
+    ) -> int:
+        # Libraries are shared by all instances of an addrmap, so their ids
+        # are only assigned once
+        if namespace not in sizes:
+            sizes[namespace] = self.assign_children_ids(blocks[namespace].children, blocks, sizes)
+        return sizes[namespace]
+
+    def assign_children_ids(
+        self, children: List[ChildItem], blocks: Dict[str, BlockItem], sizes: Dict[str, int]
+    ) -> int:
+        # Returns the number of ids taken by the parent of children
+        size = 1
+        for child in children:
+            if isinstance(child, MemItem):
+                continue
+            if isinstance(child, AddrmapRefItem):
+                stride = self.get_block_size(child.namespace, blocks, sizes)
+            elif isinstance(child, RegfileItem):
+                stride = self.assign_children_ids(child.children, blocks, sizes)
+            else:
+                # Only the elements of register arrays are instances
+                stride = 1 if child.is_array else 0
+            child.idx_offset = size
+            child.idx_stride = stride
+            size += child.dim * stride
+        return size
+
+    # --------------------------------------------------------------------------
+    # Work item planning
+    # --------------------------------------------------------------------------
+    def plan(self, ir: DesignIR) -> None:
+        # Pre-order walk of the addrmaps. Ignored addrmaps and repeats of an
+        # already planned library are skipped along with their descendants
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            prefix = ir.strings[ir.lib_prefixes[i]]
+            if (prefix in self.traversed) or ir.flags[i] & NODE_IGNORE:
+                continue
+            self.traversed.add(prefix)
+            self.work_list.append((ir.get_path(i), self.plan_block(ir, i)))
+            stack.extend(
+                c for c in reversed(ir.children(i)) if ir.kinds[c] == KIND_ADDRMAP
+            )
 
-    def get_file_prefix(self, node: Node) -> str:
+    def get_file_prefix(self, ir: DesignIR, i: int) -> str:
         # Returns name of node for .cc and .h files
-        return self.get_prefix(node) + "_rw_test_lib"
+        return ir.strings[ir.lib_prefixes[i]] + "_rw_test_lib"
 
-    def get_namespace_name(self, node: Node) -> str:
+    def get_namespace_name(self, ir: DesignIR, i: int) -> str:
         # Returns namespace name of node
-        return self.get_prefix(node).title().replace("_", "") + "RwTestLib"
+        return ir.strings[ir.lib_prefixes[i]].title().replace("_", "") + "RwTestLib"
 
-    def get_reg_test_name(self, node: Node) -> str:
+    def get_reg_test_name(self, ir: DesignIR, i: int) -> str:
         # Returns test name for function that tests one register
-        return self.get_addrmap_relative_name(node) + "RwTest"
-
-    def get_test_function_name(self, node: RegNode) -> str:
-        # Returns test name for a specific field, which varies based on
-        # the width of the register
-        if node.size == 32:  # 32 bytes = 256 bits
-            return "BitFieldWriteReadTest256"
-        elif node.size == 4:  # 4 bytes = 32 bits
-            return "BitFieldWriteReadTest32"
-        else:
-            raise ValueError(
-                f"Unexpected regwidth of {node.size} for node {node.inst_name} | {self.get_struct_name(node)}"
-            )
-
-    def get_full_mask_init(self, node: RegNode, var_name: str) -> str:
-        if node.size == 32:  # 32 bytes = 256 bits
-            return f"  fw::utils::Csr256BitValue {var_name}{{0,0}};\n"
-        elif node.size == 4:  # 4 bytes = 32 bits
-            return f"  uint32_t {var_name} = 0;\n"
-        else:
-            raise ValueError(
-                f"Unexpected regwidth of {node.size} for node {node.inst_name} | {self.get_struct_name(node)}"
-            )
-
-    def get_function_bit_postfix(self, node: RegNode) -> str:
-        if node.size == 32:  # 32 bytes = 256 bits
-            return "256"
-        elif node.size == 4:  # 4 bytes = 32 bits
-            return "32"
-        else:
-            raise ValueError(
-                f"Unexpected regwidth of {node.size} for node {node.inst_name} | {self.get_struct_name(node)}"
-            )
-
-    def get_proper_size_from_128(self, node: RegNode, addr: str) -> str:
-        if node.size == 32:  # 32 bytes = 256 bits
-            return addr
-        elif node.size == 4:  # 4 bytes = 32 bits
-            return f"reinterpret_cast<volatile uint32_t*>({addr})"
-        else:
-            raise ValueError(
-                f"Unexpected regwidth of {node.size} for node {node.inst_name} | {self.get_struct_name(node)}"
-            )
-
-    def enter_Addrmap(self, node: AddrmapNode) -> Optional[WalkerAction]:
-        if (self.get_prefix(node) in self.traversed) or node.ignore:
-            return WalkerAction.SkipDescendants
-        if node.is_array:
-            self.array_nest_lvl += 1
-        self.test_idx = 1
-        path = self.rootdir + self.get_file_prefix(node) + ".cc"
-        self.generateHeader(node)  # Creates .h file for addrmapnode
-        fp = open(path, "w")
-
-        # Test if has AddrmapNodes
-        addrmapnodes = dict()
+        stk = []
+        while ir.kinds[i] != KIND_ADDRMAP:
+            stk.append(ir.get_name(i))
+            i = ir.parents[i]
+        return ("_".join(stk)).title().replace("_", "") + "RwTest"
+
+    def plan_block(self, ir: DesignIR, i: int) -> BlockItem:
+        # Distinct child addrmaps, in child order
+        child_file_prefixes = {} # type: Dict[str, None]
         hasRegOrRegFile = False
-        for child in node.children():
-            if child.ignore:
+        for c in ir.children(i):
+            if ir.flags[c] & NODE_IGNORE:
                 continue
-            if type(child) is AddrmapNode:
-                addrmapnodes[self.get_prefix(child)] = child
-            if (type(child) is RegNode) or (type(child) is RegfileNode):
+            if ir.kinds[c] == KIND_ADDRMAP:
+                child_file_prefixes[self.get_file_prefix(ir, c)] = None
+            if ir.kinds[c] in (KIND_REG, KIND_REGFILE):
                 hasRegOrRegFile = True
 
-        self.stack.append((fp, hasRegOrRegFile))
-
-        self.writeBUILD(node)
-
-        fp.write(f'#include "{self.get_file_prefix(node)}.h"\n')  # Include self
-        deplist = [
-            f'#include "{self.get_file_prefix(child)}.h"'
-            for child in addrmapnodes.values()
-        ]
-        context = {"hasRegOrRegFile": hasRegOrRegFile, "deps": deplist}
-        template = self.ds.jj_env.get_template("rw_test_registers_header.c")
-        template.stream(context).dump(fp)
-        fp.write("\n")
-        fp.write(f"namespace {self.get_namespace_name(node)} {{\n")
-        return WalkerAction.Continue
-
-    def exit_Addrmap(self, node: AddrmapNode) -> Optional[WalkerAction]:
-        if (self.get_prefix(node) in self.traversed) or node.ignore:
-            return WalkerAction.Continue
-        if node.is_array:
-            self.array_nest_lvl -= 1
-        self.traversed.add(self.get_prefix(node))
-
-        (fp, _) = self.stack.pop()
-        addr_ptr = self.get_node_prefix(node) + "_addr"
-        fp.write(
-            f"bool RwTest(volatile {self.get_struct_name(node)} &{addr_ptr}, uint64_t test_idx) {{\n"
+        return BlockItem(
+            file_prefix=self.get_file_prefix(ir, i),
+            namespace=self.get_namespace_name(ir, i),
+            node_prefix=ir.strings[ir.node_prefixes[i]],
+            struct_name=ir.strings[ir.struct_names[i]],
+            has_reg_or_regfile=hasRegOrRegFile,
+            child_file_prefixes=list(child_file_prefixes),
+            children=self.plan_children(ir, i, i),
+            array_loops=self.array_loops,
+            table_tests=self.table_tests,
         )
-        fp.write("  bool passed = true;\n")
 
-        for child in node.children():
-            if child.ignore:
+    def plan_children(self, ir: DesignIR, block: int, i: int) -> List[ChildItem]:
+        children = [] # type: List[ChildItem]
+        for c in ir.children(i):
+            kind = ir.kinds[c]
+            if kind == KIND_MEM:
+                # Virtual registers are tested like any other register
+                regs = [] # type: List[RegItem]
+                for vreg in ir.children(c):
+                    if ir.kinds[vreg] == KIND_REG and not ir.flags[vreg] & NODE_IGNORE:
+                        regs.append(self.plan_reg(ir, block, vreg))
+                children.append(MemItem(regs))
                 continue
-            if type(child) is SignalNode:
+            if ir.flags[c] & NODE_IGNORE:
                 continue
-            if type(child) is AddrmapNode:
-                structmember = kwf(child.inst_name)
-                if child.is_array:
-                    for i in range(child.array_dimensions[0]):
-                        if i in child.ignore_idxes:
-                            continue
-                        fp.write("  if (passed) {\n")
-                        fp.write(
-                            # f"    passed = {self.get_namespace_name(child)}::RwTest({addr_ptr}.{structmember}[{i}], test_idx | (uint64_t){hex(i)} << {(5 - (self.array_nest_lvl)) * 8});\n"
-                            f"    passed = {self.get_namespace_name(child)}::RwTest({addr_ptr}.{structmember}[{i}], test_idx);\n"
-                        )
-                        fp.write("  }\n")
-                else:
-                    fp.write("  if (passed) {\n")
-                    fp.write(
-                        f"    {self.get_namespace_name(child)}::RwTest({addr_ptr}.{structmember}, test_idx);\n"
-                    )
-                    fp.write("  }\n")
-            if (type(child) is RegNode) or (type(child) is RegfileNode):
-                addrptr = ""
-                if type(child) is RegNode:
-                    addrptr = f"reinterpret_cast<volatile __uint128_t*>(&{addr_ptr}.{child.inst_name}"
-                else:
-                    addrptr = f"({addr_ptr}.{child.inst_name}"
-                if child.is_array:
-                    for i in range(child.array_dimensions[0]):
-                        if i in child.ignore_idxes:
-                            continue
-
-                        fp.write("  if (passed) {\n")
-                        fp.write(
-                            # f"    passed &= {self.get_reg_test_name(child)}({addrptr}[{i}]), test_idx | (uint64_t){hex(i)} << {(5 - (self.array_nest_lvl)) * 8});\n"
-                            f"    passed &= {self.get_reg_test_name(child)}({addrptr}[{i}]), test_idx);\n"
-                        )
-                        fp.write("  }\n")
-                else:
-                    fp.write("  if (passed) {\n")
-                    fp.write(
-                        f"    passed &= {self.get_reg_test_name(child)}({addrptr}), test_idx);\n"
-                    )
-                    fp.write("  }\n")
-        fp.write("  return passed;\n")
-        fp.write("}\n")  # bool RwTest
-
-        fp.write(f"}} // end {self.get_namespace_name(node)} namespace\n")
-        fp.close()
-        return WalkerAction.Continue
-
-    def enter_Regfile(self, node: RegfileNode) -> Optional[WalkerAction]:
-        if node.ignore:
-            return WalkerAction.SkipDescendants
-
-        if node.is_array:
-            self.array_nest_lvl += 1
-        return WalkerAction.Continue
-
-    def exit_Regfile(self, node: RegfileNode) -> Optional[WalkerAction]:
-        if node.ignore:
-            return WalkerAction.Continue
-
-        (curr_fp, _) = self.stack[-1]
-        addr_ptr = self.get_node_prefix(node) + "_addr"
-        if node.is_array:
-            self.array_nest_lvl -= 1
-        curr_fp.write(
-            f"bool {self.get_reg_test_name(node)}(volatile {self.get_struct_name(node)} &{addr_ptr}, uint64_t test_idx) {{\n"
-        )
-        curr_fp.write("  bool passed = true;\n")
-        for child in node.children():
-            if child.ignore:
-                continue
-            if type(child) is SignalNode:
-                continue
-            addrptr = ""
-            if type(child) is RegNode:
-                addrptr = f"reinterpret_cast<volatile __uint128_t*>(&{addr_ptr}.{child.inst_name}"
-            else:
-                addrptr = f"({addr_ptr}.{child.inst_name}"
-            if child.is_array:
-                for i in range(child.array_dimensions[0]):
-                    if i in child.ignore_idxes:
-                        continue
-
-                    curr_fp.write("  if (passed) {\n")
-                    curr_fp.write(
-                        # f"    passed &= {self.get_reg_test_name(child)}({addrptr}[{i}]), test_idx | (uint64_t){hex(i)} << {(5 - (self.array_nest_lvl)) * 8});\n"
-                        f"    passed &= {self.get_reg_test_name(child)}({addrptr}[{i}]), test_idx);\n"
-                    )
-                    curr_fp.write("  }\n")
-            else:
-                curr_fp.write("  if (passed) {\n")
-                curr_fp.write(
-                    f"    passed &= {self.get_reg_test_name(child)}({addrptr}), test_idx);\n"
-                )
-                curr_fp.write("  }\n")
-        curr_fp.write("  return passed;\n")
-        curr_fp.write("}\n")
-        return WalkerAction.Continue
-
-    def enter_Reg(self, node: RegNode) -> Optional[WalkerAction]:
-        if node.ignore:
-            return WalkerAction.SkipDescendants
-        prefix = self.get_node_prefix(node).upper()
-        addr = node.inst_name + "_addr"
-        (curr_fp, _) = self.stack[-1]
-
-        curr_fp.write(f"// {self.get_friendly_name(node)}\n")
-        curr_fp.write(
-            f"bool {self.get_reg_test_name(node)}(volatile __uint128_t* {addr}, uint64_t test_idx) {{\n"
+            if kind == KIND_ADDRMAP:
+                children.append(AddrmapRefItem(
+                    kwf(ir.get_name(c)), *self.get_array_info(ir, c),
+                    namespace=self.get_namespace_name(ir, c),
+                ))
+            elif kind == KIND_REGFILE:
+                children.append(RegfileItem(
+                    ir.get_name(c), *self.get_array_info(ir, c),
+                    test_name=self.get_reg_test_name(ir, c),
+                    node_prefix=ir.strings[ir.node_prefixes[c]],
+                    struct_name=ir.strings[ir.struct_names[c]],
+                    children=self.plan_children(ir, block, c),
+                ))
+            elif kind == KIND_REG:
+                children.append(self.plan_reg(ir, block, c))
+        return children
+
+    def plan_reg(self, ir: DesignIR, block: int, i: int) -> RegItem:
+        fields = []
+        for f in ir.fields(i):
+            flags = ir.field_flags[f]
+            ignore = bool(flags & FIELD_IGNORE)
+            is_sw_readable = bool(flags & FIELD_SW_READABLE)
+            is_sw_writable = bool(flags & FIELD_SW_WRITABLE)
+            singlepulse = bool(flags & FIELD_SINGLEPULSE)
+            is_tested = not ignore and is_sw_readable and is_sw_writable and not singlepulse
+            fields.append(FieldItem(
+                ir.strings[ir.field_names[f]],
+                ignore=ignore,
+                is_sw_readable=is_sw_readable,
+                is_sw_writable=is_sw_writable,
+                singlepulse=singlepulse,
+                rel_path=ir.get_field_rel_path(f, block) if is_tested else "",
+            ))
+
+        return RegItem(
+            ir.get_name(i), *self.get_array_info(ir, i),
+            test_name=self.get_reg_test_name(ir, i),
+            friendly_name=ir.strings[ir.friendly_names[i]],
+            prefix=ir.strings[ir.node_prefixes[i]].upper(),
+            struct_name=ir.strings[ir.struct_names[i]],
+            size=ir.sizes[i],
+            fields=fields,
         )
-        curr_fp.write("  bool passed = true;\n\n")
-
-        mask_checks = []
-        needs_check = False
-        needs_readonly = False
-        needs_writeonly = False
-        needs_singlepulse = False
-        for field in node.fields():
-            if field.ignore or (not field.is_sw_readable and not field.is_sw_writable):
-                continue
-            if field.is_sw_readable and not field.is_sw_writable:
-                needs_readonly = True
-            elif field.is_sw_writable and not field.is_sw_readable:
-                needs_writeonly = True
-            elif field.is_sw_writable and field.is_sw_readable:
-                if field.get_property("singlepulse"):
-                    needs_singlepulse = True
-                else:
-                    needs_check = True
-
-        if needs_check:
-            curr_fp.write("  uint64_t curr_test_idx;\n")
-            curr_fp.write(
-                "  fw::app::csr_access_test::CsrTestIgnorer* ignorer = fw::app::csr_access_test::CsrTestIgnorer::GetCsrTestIgnorer();\n"
-            )
-        if needs_readonly:
-            curr_fp.write(self.get_full_mask_init(node, "read_only_mask"))
-            mask_checks.append(
-                f"fw::testing::ReadCsrMasked{self.get_function_bit_postfix(node)}({self.get_proper_size_from_128(node, addr)}, read_only_mask);\n"
-            )
-        if needs_writeonly:
-            curr_fp.write(self.get_full_mask_init(node, "write_only_mask"))
-            mask_checks.append(
-                f"fw::testing::WriteCsrMasked{self.get_function_bit_postfix(node)}({self.get_proper_size_from_128(node, addr)}, write_only_mask);\n"
-            )
-        if needs_singlepulse:
-            curr_fp.write(self.get_full_mask_init(node, "singlepulse_mask"))
-            mask_checks.append(
-                f"fw::testing::WriteReadCsrMasked{self.get_function_bit_postfix(node)}({self.get_proper_size_from_128(node, addr)}, singlepulse_mask);\n"
-            )
 
-        casted_addr = addr
-        # Checks for register width and applies proper size cast
-        if node.size != 32:
-            if node.size == 4:
-                pointer_type = "uint32_t"
-            else:
-                raise ValueError(
-                    f"Unexpected value of {node.size} in {node.inst_name}\n"
-                )
-            casted_addr = f"reinterpret_cast<volatile {pointer_type}*>({addr})"
-
-        for field in node.fields():
-            field_prefix = prefix + "__" + field.inst_name.upper()
-
-            if field.ignore:
-                curr_fp.write(
-                    f"  // {field_prefix} has been ignored via injected directives\n\n"
-                )
-                continue
-
-            if not field.is_sw_writable and not field.is_sw_readable:
-                print(f"Field is not sw writeable or sw readable: {field_prefix}")
-                continue
-
-            if not field.is_sw_writable:
-                curr_fp.write(f"  // {field_prefix} is software read-only\n")
-                curr_fp.write(
-                    f"  fw::testing::AddBitsToMask{self.get_function_bit_postfix(node)}(&read_only_mask, {field_prefix}_bp, {field_prefix}_bw);\n\n"
-                )
-                continue
-
-            if not field.is_sw_readable:
-                curr_fp.write(f"  // {field_prefix} is software write-only\n")
-                curr_fp.write(
-                    f"  fw::testing::AddBitsToMask{self.get_function_bit_postfix(node)}(&write_only_mask, {field_prefix}_bp, {field_prefix}_bw);\n\n"
-                )
-                continue
-
-            if field.get_property("singlepulse"):
-                curr_fp.write(f"  // {field_prefix} is singlepulse\n")
-                curr_fp.write(
-                    f"  fw::testing::AddBitsToMask{self.get_function_bit_postfix(node)}(&singlepulse_mask, {field_prefix}_bp, {field_prefix}_bw);\n\n"
-                )
-                continue
-
-            context = {
-                "reg_ptr": f"{casted_addr}",
-                "function_name": f"{self.get_test_function_name(node)}",
-                "field": f"{prefix}::{field.inst_name.upper()}",
-                "field_bp": f"{field_prefix}_bp",
-                "field_bw": f"{field_prefix}_bw",
-                "test_idx": f"{hex(self.test_idx)}",
-            }
-            self.writeTestIdxMap(hex(self.test_idx), field)
-
-            self.test_idx += 1
-            template = self.ds.jj_env.get_template("rw_readwrite_test.c")
-            template.stream(context).dump(curr_fp)
-            curr_fp.write("\n\n")
-        for mask_check in mask_checks:
-            curr_fp.write(mask_check)
-        curr_fp.write("  return passed;\n")
-        curr_fp.write("}\n\n")  # RwTest
-        return WalkerAction.SkipDescendants
-
-    def generateHeader(self, node: AddrmapNode) -> None:
-        header_path = self.rootdir + self.get_file_prefix(node) + ".h"
-        header_fp = open(header_path, "w")
-
-        context = {
-            "namespace": self.get_namespace_name(node),
-            "struct_type_name": self.get_struct_name(node),
-        }
-        template = self.ds.jj_env.get_template("rw_test_lib_header.h")
-        template.stream(context).dump(header_fp)
-        childstk = list(node.children())
-        while childstk:
-            child = childstk.pop(0)
-            if child.ignore:
-                continue
-            if type(child) is RegfileNode:
-                childstk = list(child.children()) + childstk
-                header_fp.write(
-                    f"  bool {self.get_reg_test_name(child)}(volatile {self.get_struct_name(child)}&, uint64_t);\n"
-                )
-                continue
-            if type(child) is RegNode:
-                header_fp.write(
-                    f"  bool {self.get_reg_test_name(child)}(volatile __uint128_t*, uint64_t);\n"
-                )
-        header_fp.write("}\n")
-        header_fp.close()
-
-    def writeBUILD(self, node: AddrmapNode) -> None:
-        filename = self.get_file_prefix(node)
-        impl_deps = set()
-        for child in node.children():
-            if child.ignore:
-                continue
-            if isinstance(child, AddrmapNode):
-                impl_deps.add(f":{self.get_file_prefix(child)}")
-        context = {
-            "name": filename,
-            "srcs": filename + ".cc",
-            "hdrs": filename + ".h",
-            "impl_deps": list(impl_deps),
-        }
-        template = self.ds.jj_env.get_template("BUILD_TEMPLATE")
-        template.stream(context).dump(self.fbuild)
-
-    def writeTestIdxMap(self, idx: int, node: AddrmapNode) -> None:
-        self.f_test_idx_map.write(f"{idx} {node.get_path()}\n")
+    def get_array_info(self, ir: DesignIR, i: int) -> Tuple[bool, int, RangeSet]:
+        if ir.is_array(i):
+            return True, ir.dims[ir.dims_starts[i]], ir.get_ignore_idxes(i)
+        return False, 1, RangeSet()
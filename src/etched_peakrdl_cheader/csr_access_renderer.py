@@ -0,0 +1,688 @@
+from typing import List, Tuple, Dict, Any, Union, Optional, Sequence
+
+import jinja2 as jj
+
+from .template_env import get_jj_env, get_format_template
+from .code_emitter import CodeEmitter
+from .range_set import RangeSet
+
+
+# ------------------------------------------------------------------------------
+# Work items
+#
+# Lightweight, picklable description of one addrmap test library. Holds
+# everything needed to render its files so that rendering does not need
+# access to the register model.
+# ------------------------------------------------------------------------------
+class FieldItem:
+    def __init__(
+        self,
+        inst_name: str,
+        *,
+        ignore: bool,
+        is_sw_readable: bool,
+        is_sw_writable: bool,
+        singlepulse: bool,
+        rel_path: str,
+    ) -> None:
+        self.inst_name = inst_name
+        self.ignore = ignore
+        self.is_sw_readable = is_sw_readable
+        self.is_sw_writable = is_sw_writable
+        self.singlepulse = singlepulse
+
+        # Path relative to the enclosing addrmap, for the test index map.
+        # Only set for fields that get a write-read test
+        self.rel_path = rel_path
+
+
+class ArrayableItem:
+    def __init__(self, inst_name: str, is_array: bool, dim: int, ignore_idxes: RangeSet) -> None:
+        self.inst_name = inst_name
+        self.is_array = is_array
+        # Only the first dimension of arrays is tested
+        self.dim = dim
+        self.ignore_idxes = ignore_idxes
+
+        # Global test indexes: instance id of the first element relative to
+        # the parent instance, and number of instance ids each element takes.
+        # A stride of 0 means the child is not an instance and is passed its
+        # parent's test index
+        self.idx_offset = 0
+        self.idx_stride = 0
+
+
+class RegItem(ArrayableItem):
+    def __init__(
+        self,
+        inst_name: str,
+        is_array: bool,
+        dim: int,
+        ignore_idxes: RangeSet,
+        *,
+        test_name: str,
+        friendly_name: str,
+        prefix: str,
+        struct_name: str,
+        size: int,
+        fields: List[FieldItem],
+    ) -> None:
+        super().__init__(inst_name, is_array, dim, ignore_idxes)
+        self.test_name = test_name
+        self.friendly_name = friendly_name
+        self.prefix = prefix
+        self.struct_name = struct_name
+        self.size = size
+        self.fields = fields
+
+
+class RegfileItem(ArrayableItem):
+    def __init__(
+        self,
+        inst_name: str,
+        is_array: bool,
+        dim: int,
+        ignore_idxes: RangeSet,
+        *,
+        test_name: str,
+        node_prefix: str,
+        struct_name: str,
+        children: List['ChildItem'],
+    ) -> None:
+        super().__init__(inst_name, is_array, dim, ignore_idxes)
+        self.test_name = test_name
+        self.node_prefix = node_prefix
+        self.struct_name = struct_name
+        self.children = children
+
+
+class MemItem:
+    # Only virtual registers of a mem are rendered. Mems are not tested as a whole
+    def __init__(self, children: List[RegItem]) -> None:
+        self.children = children
+
+
+class AddrmapRefItem(ArrayableItem):
+    # Child addrmap. Its own files are rendered from a separate BlockItem
+    def __init__(
+        self,
+        inst_name: str,
+        is_array: bool,
+        dim: int,
+        ignore_idxes: RangeSet,
+        *,
+        namespace: str,
+    ) -> None:
+        super().__init__(inst_name, is_array, dim, ignore_idxes)
+        self.namespace = namespace
+
+
+ChildItem = Union[RegItem, RegfileItem, MemItem, AddrmapRefItem]
+
+
+class BlockItem:
+    def __init__(
+        self,
+        file_prefix: str,
+        *,
+        namespace: str,
+        node_prefix: str,
+        struct_name: str,
+        has_reg_or_regfile: bool,
+        child_file_prefixes: List[str],
+        children: List[ChildItem],
+        array_loops: bool = False,
+        table_tests: bool = False,
+    ) -> None:
+        self.file_prefix = file_prefix
+        self.namespace = namespace
+        self.node_prefix = node_prefix
+        self.struct_name = struct_name
+        self.has_reg_or_regfile = has_reg_or_regfile
+        # File prefixes of distinct child addrmaps, in child order
+        self.child_file_prefixes = child_file_prefixes
+        self.children = children
+        # Test the elements of arrays in a loop rather than one call each
+        self.array_loops = array_loops
+        # Describe registers with constant tables, run by the shared table
+        # test runner, rather than generating a test function per register
+        self.table_tests = table_tests
+
+
+# ------------------------------------------------------------------------------
+# Rendering
+# ------------------------------------------------------------------------------
+# Header-only library that runs the tests of table-driven test libraries
+TABLE_RUNNER = "rw_table_test_runner"
+
+# Global test indexes are an instance id followed by LOCAL_IDX_BITS bits of
+# test index within the instance's test library. The 16 bits above them hold
+# the failure marker
+LOCAL_IDX_BITS = 20
+INSTANCE_IDX_BITS = 28
+
+def get_test_function_name(reg: RegItem) -> str:
+    # Returns test name for a specific field, which varies based on
+    # the width of the register
+    if reg.size == 32:  # 32 bytes = 256 bits
+        return "BitFieldWriteReadTest256"
+    elif reg.size == 4:  # 4 bytes = 32 bits
+        return "BitFieldWriteReadTest32"
+    else:
+        raise ValueError(
+            f"Unexpected regwidth of {reg.size} for node {reg.inst_name} | {reg.struct_name}"
+        )
+
+
+def get_full_mask_init(reg: RegItem, var_name: str) -> str:
+    if reg.size == 32:  # 32 bytes = 256 bits
+        return f"  fw::utils::Csr256BitValue {var_name}{{0,0}};\n"
+    elif reg.size == 4:  # 4 bytes = 32 bits
+        return f"  uint32_t {var_name} = 0;\n"
+    else:
+        raise ValueError(
+            f"Unexpected regwidth of {reg.size} for node {reg.inst_name} | {reg.struct_name}"
+        )
+
+
+def get_function_bit_postfix(reg: RegItem) -> str:
+    if reg.size == 32:  # 32 bytes = 256 bits
+        return "256"
+    elif reg.size == 4:  # 4 bytes = 32 bits
+        return "32"
+    else:
+        raise ValueError(
+            f"Unexpected regwidth of {reg.size} for node {reg.inst_name} | {reg.struct_name}"
+        )
+
+
+def get_proper_size_from_128(reg: RegItem, addr: str) -> str:
+    if reg.size == 32:  # 32 bytes = 256 bits
+        return addr
+    elif reg.size == 4:  # 4 bytes = 32 bits
+        return f"reinterpret_cast<volatile uint32_t*>({addr})"
+    else:
+        raise ValueError(
+            f"Unexpected regwidth of {reg.size} for node {reg.inst_name} | {reg.struct_name}"
+        )
+
+
+def get_child_test_idx(child: ArrayableItem, i: Union[int, str] = 0) -> str:
+    """
+    Returns the test index expression passed to element i of child, which is
+    either an element number or the name of a loop variable
+    """
+    if not child.idx_stride:
+        return "test_idx"
+    if isinstance(i, str):
+        offset = child.idx_offset << LOCAL_IDX_BITS
+        stride = child.idx_stride << LOCAL_IDX_BITS
+        return f"test_idx + 0x{offset:x}ULL + {i} * 0x{stride:x}ULL"
+    offset = (child.idx_offset + i * child.idx_stride) << LOCAL_IDX_BITS
+    return f"test_idx + 0x{offset:x}ULL"
+
+
+def get_skip_bitmap(child: ArrayableItem) -> List[int]:
+    """
+    Returns 64-bit words with a bit set for every ignored element of the
+    tested array dimension
+    """
+    bits = 0
+    for start, end in child.ignore_idxes.ranges():
+        end = min(end, child.dim)
+        if start < end:
+            bits |= ((1 << (end - start)) - 1) << start
+    return [(bits >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range((child.dim + 63) // 64)]
+
+
+class BlockTemplates:
+    """
+    Compiled templates used to render test libraries. Looked up once and
+    shared by all blocks rendered with the same jinja environment.
+    """
+    def __init__(self, jj_env: jj.Environment) -> None:
+        self.build = jj_env.get_template("BUILD_TEMPLATE")
+        self.lib_header = jj_env.get_template("rw_test_lib_header.h")
+        self.registers_header = jj_env.get_template("rw_test_registers_header.c")
+        self.readwrite_test = jj_env.get_template("rw_readwrite_test.c")
+
+        # The write-read test is rendered for every field. It is a plain
+        # substitution template, so use an equivalent format string if possible
+        self.readwrite_test_format = get_format_template(jj_env, "rw_readwrite_test.c")
+
+
+class BlockRenderer:
+    """
+    Renders the test library files of a single addrmap from its BlockItem
+    """
+    def __init__(self, block: BlockItem, templates: BlockTemplates) -> None:
+        self.block = block
+        self.templates = templates
+        self.test_idx = 1
+
+        # Test index map entries as (idx, field path relative to the addrmap)
+        self.idx_map = [] # type: List[Tuple[str, str]]
+
+        # Table tests: range of the field table of every register, and number
+        # of register table rows of every child of the block
+        self.table_fields = {} # type: Dict[int, Tuple[int, int]]
+        self.n_table_regs = {} # type: Dict[int, int]
+
+    def render(self) -> Dict[str, Any]:
+        artifacts = {
+            "h": self.render_header(),
+            "cc": self.render_source(),
+            "build": self.render_build(),
+            "idx_map": self.idx_map,
+        } # type: Dict[str, Any]
+        # Number of times each template was rendered
+        artifacts["renders"] = {
+            "BUILD_TEMPLATE": 1,
+            "rw_test_lib_header.h": 1,
+            "rw_test_registers_header.c": 1,
+            "rw_readwrite_test.c": 0 if self.block.table_tests else self.test_idx - 1,
+        }
+        return artifacts
+
+    def render_build(self) -> str:
+        fp = CodeEmitter()
+        impl_deps = [f":{dep}" for dep in self.block.child_file_prefixes]
+        if self.block.table_tests and self.block.has_reg_or_regfile:
+            impl_deps.append(f":{TABLE_RUNNER}")
+        context = {
+            "name": self.block.file_prefix,
+            "srcs": self.block.file_prefix + ".cc",
+            "hdrs": self.block.file_prefix + ".h",
+            "impl_deps": impl_deps,
+        }
+        fp.writelines(self.templates.build.stream(context))
+        return fp.getvalue()
+
+    def render_header(self) -> str:
+        header_fp = CodeEmitter()
+        context = {
+            "namespace": self.block.namespace,
+            "struct_type_name": self.block.struct_name,
+        }
+        header_fp.writelines(self.templates.lib_header.stream(context))
+        if not self.block.table_tests:
+            self.write_declarations(header_fp, self.block.children)
+        header_fp.write("}\n")
+        return header_fp.getvalue()
+
+    def write_declarations(self, header_fp: CodeEmitter, children: List[ChildItem]) -> None:
+        for child in children:
+            if isinstance(child, RegfileItem):
+                header_fp.write(
+                    f"  bool {child.test_name}(volatile {child.struct_name}&, uint64_t);\n"
+                )
+                self.write_declarations(header_fp, child.children)
+            elif isinstance(child, RegItem):
+                header_fp.write(
+                    f"  bool {child.test_name}(volatile __uint128_t*, uint64_t);\n"
+                )
+
+    def render_source(self) -> str:
+        fp = CodeEmitter()
+        fp.write(f'#include "{self.block.file_prefix}.h"\n')  # Include self
+        deplist = [
+            f'#include "{dep}.h"'
+            for dep in self.block.child_file_prefixes
+        ]
+        if self.block.table_tests and self.block.has_reg_or_regfile:
+            deplist.append(f'#include "{TABLE_RUNNER}.h"')
+        context = {"hasRegOrRegFile": self.block.has_reg_or_regfile, "deps": deplist}
+        fp.writelines(self.templates.registers_header.stream(context))
+        fp.write("\n")
+        fp.write(f"namespace {self.block.namespace} {{\n")
+
+        if self.block.table_tests:
+            self.write_tables(fp)
+        else:
+            self.write_definitions(fp, self.block.children)
+        self.write_block_test(fp)
+
+        fp.write(f"}} // end {self.block.namespace} namespace\n")
+        return fp.getvalue()
+
+    def write_definitions(self, fp: CodeEmitter, children: Sequence[ChildItem]) -> None:
+        # Test functions are defined in the order the register model is walked:
+        # registers as they are entered, regfiles after their contents
+        for child in children:
+            if isinstance(child, RegItem):
+                self.write_reg_test(fp, child)
+            elif isinstance(child, RegfileItem):
+                self.write_definitions(fp, child.children)
+                self.write_regfile_test(fp, child)
+            elif isinstance(child, MemItem):
+                self.write_definitions(fp, child.children)
+
+    def write_block_test(self, fp: CodeEmitter) -> None:
+        addr_ptr = self.block.node_prefix + "_addr"
+        fp.write(
+            f"bool RwTest(volatile {self.block.struct_name} &{addr_ptr}, uint64_t test_idx) {{\n"
+        )
+        fp.write("  bool passed = true;\n")
+
+        # Consecutive registers and regfiles are run from the table together
+        run_start = run_end = 0
+        for child in self.block.children:
+            if self.block.table_tests and isinstance(child, (RegItem, RegfileItem)):
+                run_end += self.n_table_regs[id(child)]
+                continue
+
+            if isinstance(child, AddrmapRefItem):
+                self.write_table_run(fp, addr_ptr, run_start, run_end)
+                run_start = run_end
+                structmember = child.inst_name
+                if child.is_array and self.block.array_loops:
+                    self.write_array_loop(
+                        fp, child,
+                        f"passed = {child.namespace}::RwTest({addr_ptr}.{structmember}[i], "
+                        f"{get_child_test_idx(child, 'i')});"
+                    )
+                elif child.is_array:
+                    for i in child.ignore_idxes.iter_complement(0, child.dim):
+                        fp.write("  if (passed) {\n")
+                        fp.write(
+                            f"    passed = {child.namespace}::RwTest({addr_ptr}.{structmember}[{i}], "
+                            f"{get_child_test_idx(child, i)});\n"
+                        )
+                        fp.write("  }\n")
+                else:
+                    fp.write("  if (passed) {\n")
+                    fp.write(
+                        f"    {child.namespace}::RwTest({addr_ptr}.{structmember}, "
+                        f"{get_child_test_idx(child)});\n"
+                    )
+                    fp.write("  }\n")
+            elif isinstance(child, (RegItem, RegfileItem)):
+                self.write_child_test_calls(fp, addr_ptr, child)
+        self.write_table_run(fp, addr_ptr, run_start, run_end)
+        fp.write("  return passed;\n")
+        fp.write("}\n")  # bool RwTest
+
+    def write_child_test_calls(self, fp: CodeEmitter, addr_ptr: str, child: Union[RegItem, RegfileItem]) -> None:
+        if isinstance(child, RegItem):
+            addrptr = f"reinterpret_cast<volatile __uint128_t*>(&{addr_ptr}.{child.inst_name}"
+        else:
+            addrptr = f"({addr_ptr}.{child.inst_name}"
+        if child.is_array and self.block.array_loops:
+            self.write_array_loop(
+                fp, child,
+                f"passed &= {child.test_name}({addrptr}[i]), {get_child_test_idx(child, 'i')});"
+            )
+        elif child.is_array:
+            for i in child.ignore_idxes.iter_complement(0, child.dim):
+                fp.write("  if (passed) {\n")
+                fp.write(
+                    f"    passed &= {child.test_name}({addrptr}[{i}]), {get_child_test_idx(child, i)});\n"
+                )
+                fp.write("  }\n")
+        else:
+            fp.write("  if (passed) {\n")
+            fp.write(
+                f"    passed &= {child.test_name}({addrptr}), {get_child_test_idx(child)});\n"
+            )
+            fp.write("  }\n")
+
+    def write_tables(self, fp: CodeEmitter) -> None:
+        # Fields are listed once per register, in the order test functions
+        # are defined in, so that test indexes match. Registers are listed
+        # once per tested element, in the order they are tested in
+        field_rows = [] # type: List[str]
+        self.add_table_fields(self.block.children, field_rows)
+        reg_rows = [] # type: List[str]
+        for child in self.block.children:
+            if isinstance(child, (RegItem, RegfileItem)):
+                self.n_table_regs[id(child)] = self.add_table_regs(child, "", 0, reg_rows)
+        if not reg_rows:
+            return
+
+        fp.write("namespace {\n")
+        fp.write("const rw_table_test::Field kFields[] = {\n")
+        for row in field_rows:
+            fp.write(f"  {row},\n")
+        fp.write("};\n")
+        fp.write("const rw_table_test::Reg kRegs[] = {\n")
+        for row in reg_rows:
+            fp.write(f"  {row},\n")
+        fp.write("};\n")
+        fp.write("}  // namespace\n\n")
+
+    def add_table_fields(self, children: Sequence[ChildItem], rows: List[str]) -> None:
+        for child in children:
+            if isinstance(child, (RegfileItem, MemItem)):
+                self.add_table_fields(child.children, rows)
+                continue
+            if not isinstance(child, RegItem):
+                continue
+
+            first = len(rows)
+            for field in child.fields:
+                field_prefix = child.prefix + "__" + field.inst_name.upper()
+                # Ignored fields and fields without software access are not tested
+                if field.ignore or (not field.is_sw_writable and not field.is_sw_readable):
+                    continue
+
+                test_idx = "0x0"
+                if not field.is_sw_writable:
+                    kind = "kReadOnly"
+                elif not field.is_sw_readable:
+                    kind = "kWriteOnly"
+                elif field.singlepulse:
+                    kind = "kSinglePulse"
+                else:
+                    kind = "kWriteRead"
+                    test_idx = hex(self.test_idx)
+                    self.idx_map.append((test_idx, field.rel_path))
+                    self.test_idx += 1
+                rows.append(
+                    f"{{{test_idx}, {field_prefix}_bw, {field_prefix}_bp, rw_table_test::{kind}}}"
+                )
+            self.table_fields[id(child)] = (first, len(rows) - first)
+
+    def add_table_regs(
+        self, child: Union[RegItem, RegfileItem], member_prefix: str, inst: int, rows: List[str]
+    ) -> int:
+        # Adds a row for every tested element of child, whose parent is
+        # instance inst of the block. Returns the number of rows added
+        if child.is_array:
+            members = [
+                (f"{member_prefix}{child.inst_name}[{i}]", i)
+                for i in child.ignore_idxes.iter_complement(0, child.dim)
+            ]
+        else:
+            members = [(member_prefix + child.inst_name, 0)]
+
+        n = 0
+        for member, i in members:
+            member_inst = inst
+            if child.idx_stride:
+                member_inst += child.idx_offset + i * child.idx_stride
+            if isinstance(child, RegfileItem):
+                for c in child.children:
+                    if isinstance(c, (RegItem, RegfileItem)):
+                        n += self.add_table_regs(c, member + ".", member_inst, rows)
+                continue
+            first, n_fields = self.table_fields[id(child)]
+            # Registers without tested fields are not accessed
+            if n_fields:
+                rows.append(
+                    f"{{offsetof({self.block.struct_name}, {member}), "
+                    f"0x{member_inst << LOCAL_IDX_BITS:x}, {first}, {n_fields}, "
+                    f"{get_function_bit_postfix(child)}}}"
+                )
+                n += 1
+        return n
+
+    def write_table_run(self, fp: CodeEmitter, addr_ptr: str, start: int, end: int) -> None:
+        if start == end:
+            return
+        fp.write("  if (passed) {\n")
+        fp.write(
+            f"    passed = rw_table_test::RunRegs(&{addr_ptr}, kRegs + {start}, {end - start}, kFields, test_idx);\n"
+        )
+        fp.write("  }\n")
+
+    def write_array_loop(self, fp: CodeEmitter, child: ArrayableItem, call: str) -> None:
+        # Tests every element i of the array with call. Ignored elements are
+        # skipped with a constant bitmap, so the code does not grow with the
+        # number of elements
+        if not any(child.ignore_idxes.complement(0, child.dim)):
+            return
+        skip = ""
+        if any(start < child.dim for start, _ in child.ignore_idxes.ranges()):
+            skip_name = f"{child.inst_name}_skip"
+            words = ", ".join(f"0x{w:x}ULL" for w in get_skip_bitmap(child))
+            fp.write(f"  static constexpr uint64_t {skip_name}[] = {{{words}}};\n")
+            skip = f"    if (({skip_name}[i / 64] >> (i % 64)) & 1) continue;\n"
+        fp.write(f"  for (uint32_t i = 0; passed && i < {child.dim}; i++) {{\n")
+        fp.write(skip)
+        fp.write(f"    {call}\n")
+        fp.write("  }\n")
+
+    def write_regfile_test(self, fp: CodeEmitter, regfile: RegfileItem) -> None:
+        addr_ptr = regfile.node_prefix + "_addr"
+        fp.write(
+            f"bool {regfile.test_name}(volatile {regfile.struct_name} &{addr_ptr}, uint64_t test_idx) {{\n"
+        )
+        fp.write("  bool passed = true;\n")
+        for child in regfile.children:
+            if isinstance(child, (RegItem, RegfileItem)):
+                self.write_child_test_calls(fp, addr_ptr, child)
+        fp.write("  return passed;\n")
+        fp.write("}\n")
+
+    def write_reg_test(self, fp: CodeEmitter, reg: RegItem) -> None:
+        prefix = reg.prefix
+        addr = reg.inst_name + "_addr"
+
+        fp.write(f"// {reg.friendly_name}\n")
+        fp.write(
+            f"bool {reg.test_name}(volatile __uint128_t* {addr}, uint64_t test_idx) {{\n"
+        )
+        fp.write("  bool passed = true;\n\n")
+
+        mask_checks = []
+        needs_check = False
+        needs_readonly = False
+        needs_writeonly = False
+        needs_singlepulse = False
+        for field in reg.fields:
+            if field.ignore or (not field.is_sw_readable and not field.is_sw_writable):
+                continue
+            if field.is_sw_readable and not field.is_sw_writable:
+                needs_readonly = True
+            elif field.is_sw_writable and not field.is_sw_readable:
+                needs_writeonly = True
+            elif field.is_sw_writable and field.is_sw_readable:
+                if field.singlepulse:
+                    needs_singlepulse = True
+                else:
+                    needs_check = True
+
+        if needs_check:
+            fp.write("  uint64_t curr_test_idx;\n")
+            fp.write(
+                "  fw::app::csr_access_test::CsrTestIgnorer* ignorer = fw::app::csr_access_test::CsrTestIgnorer::GetCsrTestIgnorer();\n"
+            )
+        if needs_readonly:
+            fp.write(get_full_mask_init(reg, "read_only_mask"))
+            mask_checks.append(
+                f"fw::testing::ReadCsrMasked{get_function_bit_postfix(reg)}({get_proper_size_from_128(reg, addr)}, read_only_mask);\n"
+            )
+        if needs_writeonly:
+            fp.write(get_full_mask_init(reg, "write_only_mask"))
+            mask_checks.append(
+                f"fw::testing::WriteCsrMasked{get_function_bit_postfix(reg)}({get_proper_size_from_128(reg, addr)}, write_only_mask);\n"
+            )
+        if needs_singlepulse:
+            fp.write(get_full_mask_init(reg, "singlepulse_mask"))
+            mask_checks.append(
+                f"fw::testing::WriteReadCsrMasked{get_function_bit_postfix(reg)}({get_proper_size_from_128(reg, addr)}, singlepulse_mask);\n"
+            )
+
+        casted_addr = addr
+        # Checks for register width and applies proper size cast
+        if reg.size != 32:
+            if reg.size == 4:
+                pointer_type = "uint32_t"
+            else:
+                raise ValueError(
+                    f"Unexpected value of {reg.size} in {reg.inst_name}\n"
+                )
+            casted_addr = f"reinterpret_cast<volatile {pointer_type}*>({addr})"
+
+        for field in reg.fields:
+            field_prefix = prefix + "__" + field.inst_name.upper()
+
+            if field.ignore:
+                fp.write(
+                    f"  // {field_prefix} has been ignored via injected directives\n\n"
+                )
+                continue
+
+            if not field.is_sw_writable and not field.is_sw_readable:
+                print(f"Field is not sw writeable or sw readable: {field_prefix}")
+                continue
+
+            if not field.is_sw_writable:
+                fp.write(f"  // {field_prefix} is software read-only\n")
+                fp.write(
+                    f"  fw::testing::AddBitsToMask{get_function_bit_postfix(reg)}(&read_only_mask, {field_prefix}_bp, {field_prefix}_bw);\n\n"
+                )
+                continue
+
+            if not field.is_sw_readable:
+                fp.write(f"  // {field_prefix} is software write-only\n")
+                fp.write(
+                    f"  fw::testing::AddBitsToMask{get_function_bit_postfix(reg)}(&write_only_mask, {field_prefix}_bp, {field_prefix}_bw);\n\n"
+                )
+                continue
+
+            if field.singlepulse:
+                fp.write(f"  // {field_prefix} is singlepulse\n")
+                fp.write(
+                    f"  fw::testing::AddBitsToMask{get_function_bit_postfix(reg)}(&singlepulse_mask, {field_prefix}_bp, {field_prefix}_bw);\n\n"
+                )
+                continue
+
+            context = {
+                "reg_ptr": f"{casted_addr}",
+                "function_name": f"{get_test_function_name(reg)}",
+                "field": f"{prefix}::{field.inst_name.upper()}",
+                "field_bp": f"{field_prefix}_bp",
+                "field_bw": f"{field_prefix}_bw",
+                "test_idx": f"{hex(self.test_idx)}",
+            }
+            self.idx_map.append((hex(self.test_idx), field.rel_path))
+
+            self.test_idx += 1
+            if self.templates.readwrite_test_format is not None:
+                fp.write(self.templates.readwrite_test_format.format_map(context))
+            else:
+                fp.writelines(self.templates.readwrite_test.stream(context))
+            fp.write("\n\n")
+        for mask_check in mask_checks:
+            fp.write(mask_check)
+        fp.write("  return passed;\n")
+        fp.write("}\n\n")  # RwTest
+
+
+def render_block(block: BlockItem, templates: BlockTemplates) -> Dict[str, Any]:
+    return BlockRenderer(block, templates).render()
+
+
+# ------------------------------------------------------------------------------
+# Process pool entry points
+# ------------------------------------------------------------------------------
+_worker_templates = None # type: Optional[BlockTemplates]
+
+def init_worker(precompiled_templates: str = "") -> None:
+    global _worker_templates # pylint: disable=global-statement
+    _worker_templates = BlockTemplates(get_jj_env(precompiled_templates))
+
+def render_block_in_worker(block: BlockItem) -> Dict[str, Any]:
+    assert _worker_templates is not None
+    return render_block(block, _worker_templates)
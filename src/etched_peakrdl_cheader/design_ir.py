@@ -0,0 +1,348 @@
+from typing import Dict, List, Iterator, Set
+from array import array
+import os
+
+from systemrdl.node import (
+    AddressableNode,
+    AddrmapNode,
+    RegfileNode,
+    MemNode,
+    RegNode,
+    FieldNode,
+    Node,
+)
+
+from systemrdl.rdltypes import AccessType
+
+from .design_state import DesignState
+from .range_set import RangeSet
+from . import utils
+
+
+# Node kinds
+KIND_ADDRMAP = 0
+KIND_REGFILE = 1
+KIND_MEM = 2
+KIND_REG = 3
+
+KIND_NAMES = ("addrmap", "regfile", "mem", "reg")
+
+# Node flags
+NODE_IGNORE = 0x1
+NODE_REBUILD = 0x2
+NODE_UNIQUE = 0x4
+
+# Field flags
+FIELD_IGNORE = 0x1
+FIELD_SW_READABLE = 0x2
+FIELD_SW_WRITABLE = 0x4
+FIELD_HW_READABLE = 0x8
+FIELD_HW_WRITABLE = 0x10
+FIELD_SINGLEPULSE = 0x20
+
+# Same definitions as FieldNode.is_sw_readable() and friends
+READABLE_ACCESS = (AccessType.rw, AccessType.rw1, AccessType.r)
+WRITABLE_ACCESS = (AccessType.rw, AccessType.rw1, AccessType.w, AccessType.w1)
+
+# Field flags implied by the sw and hw properties
+SW_ACCESS_FLAGS = {
+    access: (FIELD_SW_READABLE if access in READABLE_ACCESS else 0)
+    | (FIELD_SW_WRITABLE if access in WRITABLE_ACCESS else 0)
+    for access in AccessType
+}
+HW_ACCESS_FLAGS = {
+    access: (FIELD_HW_READABLE if access in READABLE_ACCESS else 0)
+    | (FIELD_HW_WRITABLE if access in WRITABLE_ACCESS else 0)
+    for access in AccessType
+}
+
+
+def get_kind(node: AddressableNode) -> int:
+    if isinstance(node, RegNode):
+        return KIND_REG
+    if isinstance(node, MemNode):
+        return KIND_MEM
+    if isinstance(node, RegfileNode):
+        return KIND_REGFILE
+    return KIND_ADDRMAP
+
+
+def get_sources(node: Node, sources: Set[str], seen_defs: Set[int]) -> None:
+    """
+    Adds the file that defines node's component to sources
+    """
+    src_ref = node.inst.def_src_ref
+    if src_ref is None or id(src_ref) in seen_defs:
+        return
+    seen_defs.add(id(src_ref))
+    path = src_ref.path
+    if path:
+        sources.add(os.path.abspath(path))
+
+
+class DesignIR:
+    """
+    Compact, array-backed representation of the register model.
+
+    Built once, after directives are applied and names are settled, so that
+    generators can work from plain arrays instead of walking systemrdl nodes,
+    which allocate on every children()/fields() call. Only non-unrolled nodes
+    are stored. Arrays are described by their dimensions and stride.
+
+    Addressable nodes are numbered breadth-first, so that the children of
+    every node are a contiguous range, in model order. Node 0 is the top
+    node. Fields are numbered so that the fields of every register are a
+    contiguous range as well.
+
+    All strings (instance names, path segments, generated names) are
+    interned in a single table and referred to by index. The IR holds no
+    references to the register model, so it pickles cheaply.
+    """
+    def __init__(self) -> None:
+        # Absolute address of the top node
+        self.base_address = 0
+
+        # RDL files the design was compiled from
+        self.sources = [] # type: List[str]
+
+        # Interned strings. Index 0 is the empty string, used for names that
+        # do not apply to a node
+        self.strings = [""] # type: List[str]
+        self.string_ids = {"": 0} # type: Dict[str, int]
+
+        # ------------------------
+        # Per node
+        # ------------------------
+        # Index of the parent node, -1 for the top node
+        self.parents = array("i")
+        self.kinds = array("B")
+        # NODE_* flags
+        self.flags = array("B")
+        self.names = array("I")
+        # Path segment, with an empty suffix per array dimension. The top
+        # node's segment is its full path
+        self.segments = array("I")
+        # Offset within the parent, of the first element for arrays
+        self.offsets = array("Q")
+        # Size and stride of one element
+        self.sizes = array("Q")
+        self.strides = array("Q")
+        # Register width in bits, 0 for other nodes
+        self.regwidths = array("I")
+        # Array dimensions, as a range of dims
+        self.ndims = array("B")
+        self.dims_starts = array("I")
+        # Array indexes excluded by directives, as a range of ignore ranges
+        self.n_ignore_ranges = array("I")
+        self.ignore_ranges_starts = array("I")
+        # Addressable children, as a range of nodes
+        self.first_children = array("I")
+        self.n_children = array("I")
+        # Fields, as a range of fields
+        self.first_fields = array("I")
+        self.n_fields = array("I")
+
+        # Generated names, relative to the top node
+        self.node_prefixes = array("I")
+        self.struct_names = array("I")
+        self.friendly_names = array("I")
+        # Test library prefix, for addrmaps
+        self.lib_prefixes = array("I")
+
+        self.dims = array("I")
+        # Ignored indexes, as sorted [start, end) ranges
+        self.ignore_starts = array("Q")
+        self.ignore_ends = array("Q")
+
+        # ------------------------
+        # Per field
+        # ------------------------
+        self.field_parents = array("I")
+        self.field_names = array("I")
+        self.field_lsbs = array("I")
+        self.field_widths = array("I")
+        # FIELD_* flags
+        self.field_flags = array("B")
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def intern(self, s: str) -> int:
+        i = self.string_ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self.string_ids[s] = i
+        return i
+
+    #---------------------------------------------------------------------------
+    # Building
+    #---------------------------------------------------------------------------
+    @classmethod
+    def build(cls, ds: DesignState, top_node: AddrmapNode) -> 'DesignIR':
+        ir = cls()
+        ir.base_address = top_node.absolute_address
+        ir.add_node(ds, top_node, top_node, -1)
+        ir.segments[0] = ir.intern(top_node.get_path())
+
+        # Definitions are shared by all instances of a type, so only look up
+        # the source of each one once
+        sources = set() # type: Set[str]
+        seen_defs = set() # type: Set[int]
+
+        i = 0
+        nodes = [top_node] # type: List[AddressableNode]
+        while i < len(nodes):
+            node = nodes[i]
+            get_sources(node, sources, seen_defs)
+            ir.first_children.append(len(nodes))
+            ir.first_fields.append(len(ir.field_parents))
+            if isinstance(node, RegNode):
+                ir.n_children.append(0)
+                n_fields = 0
+                for field in node.fields():
+                    get_sources(field, sources, seen_defs)
+                    ir.add_field(field, i)
+                    n_fields += 1
+                ir.n_fields.append(n_fields)
+            else:
+                children = [c for c in node.children() if isinstance(c, AddressableNode)]
+                for child in children:
+                    ir.add_node(ds, top_node, child, i)
+                nodes += children
+                ir.n_children.append(len(children))
+                ir.n_fields.append(0)
+            i += 1
+        ir.sources = sorted(sources)
+        return ir
+
+    def add_node(
+        self, ds: DesignState, top_node: AddrmapNode, node: AddressableNode, parent: int
+    ) -> None:
+        kind = get_kind(node)
+        flags = 0
+        if node.ignore:
+            flags |= NODE_IGNORE
+        if node.rebuild:
+            flags |= NODE_REBUILD
+        if node.unique:
+            flags |= NODE_UNIQUE
+
+        self.parents.append(parent)
+        self.kinds.append(kind)
+        self.flags.append(flags)
+        self.names.append(self.intern(node.inst_name))
+        self.segments.append(self.intern(node.get_path_segment()))
+        self.offsets.append(node.raw_address_offset)
+        self.sizes.append(node.size)
+        self.regwidths.append(node.get_property("regwidth") if kind == KIND_REG else 0)
+
+        if node.is_array:
+            self.strides.append(node.array_stride)
+            self.ndims.append(len(node.array_dimensions))
+            self.dims_starts.append(len(self.dims))
+            self.dims.extend(node.array_dimensions)
+            ignored = ds.array_ignores.get(id(node.inst), RangeSet())
+        else:
+            self.strides.append(node.size)
+            self.ndims.append(0)
+            self.dims_starts.append(len(self.dims))
+            ignored = RangeSet()
+        self.ignore_ranges_starts.append(len(self.ignore_starts))
+        self.n_ignore_ranges.append(len(ignored.starts))
+        self.ignore_starts.extend(ignored.starts)
+        self.ignore_ends.extend(ignored.ends)
+
+        # Names are built for the nodes the generators name
+        if kind == KIND_MEM:
+            self.node_prefixes.append(0)
+            self.struct_names.append(0)
+        else:
+            self.node_prefixes.append(self.intern(utils.get_node_prefix(ds, top_node, node)))
+            self.struct_names.append(self.intern(utils.get_struct_name(ds, top_node, node)))
+        if kind == KIND_REG:
+            self.friendly_names.append(self.intern(utils.get_friendly_name(ds, top_node, node)))
+        else:
+            self.friendly_names.append(0)
+        if kind == KIND_ADDRMAP:
+            self.lib_prefixes.append(self.intern(utils.get_lib_prefix(ds, top_node, node)))
+        else:
+            self.lib_prefixes.append(0)
+
+    def add_field(self, field: FieldNode, parent: int) -> None:
+        # Looking up each property once is noticeably faster than the
+        # FieldNode.is_*_readable/writable properties
+        flags = SW_ACCESS_FLAGS[field.get_property("sw")]
+        flags |= HW_ACCESS_FLAGS[field.get_property("hw")]
+        if field.ignore:
+            flags |= FIELD_IGNORE
+        if field.get_property("singlepulse"):
+            flags |= FIELD_SINGLEPULSE
+
+        self.field_parents.append(parent)
+        self.field_names.append(self.intern(field.inst_name))
+        self.field_lsbs.append(field.low)
+        self.field_widths.append(field.width)
+        self.field_flags.append(flags)
+
+    #---------------------------------------------------------------------------
+    # Queries
+    #---------------------------------------------------------------------------
+    def children(self, i: int) -> range:
+        first = self.first_children[i]
+        return range(first, first + self.n_children[i])
+
+    def fields(self, i: int) -> range:
+        first = self.first_fields[i]
+        return range(first, first + self.n_fields[i])
+
+    def ancestors(self, i: int) -> Iterator[int]:
+        """
+        Yields i and its ancestors, up to the top node
+        """
+        while i >= 0:
+            yield i
+            i = self.parents[i]
+
+    def is_array(self, i: int) -> bool:
+        return self.ndims[i] > 0
+
+    def get_array_dimensions(self, i: int) -> List[int]:
+        start = self.dims_starts[i]
+        return list(self.dims[start:start + self.ndims[i]])
+
+    def get_ignore_idxes(self, i: int) -> RangeSet:
+        start = self.ignore_ranges_starts[i]
+        end = start + self.n_ignore_ranges[i]
+        return RangeSet(zip(self.ignore_starts[start:end], self.ignore_ends[start:end]))
+
+    def get_name(self, i: int) -> str:
+        return self.strings[self.names[i]]
+
+    def get_path(self, i: int) -> str:
+        """
+        Path of node i, like Node.get_path() of a non-unrolled node
+        """
+        return self.get_rel_path(i, -1)
+
+    def get_rel_path(self, i: int, ref: int) -> str:
+        """
+        Path of node i relative to its ancestor ref
+        """
+        segments = []
+        for j in self.ancestors(i):
+            if j == ref:
+                break
+            segments.append(self.strings[self.segments[j]])
+        segments.reverse()
+        return ".".join(segments)
+
+    def get_field_rel_path(self, f: int, ref: int) -> str:
+        """
+        Path of field f relative to the ancestor node ref
+        """
+        reg_path = self.get_rel_path(self.field_parents[f], ref)
+        field_name = self.strings[self.field_names[f]]
+        if reg_path:
+            return reg_path + "." + field_name
+        return field_name
@@ -1,24 +1,50 @@
-from typing import Optional, List
+from typing import Optional, List, Sequence
 
 from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
-from systemrdl.node import AddrmapNode, RegNode, AddressableNode
+from systemrdl.node import AddrmapNode, RegNode, AddressableNode, FieldNode
 
 from .design_state import DesignState
+from .interval_index import IntervalIndex
+
+
+def get_overlapping_fields(fields: Sequence[FieldNode]) -> List[str]:
+    """
+    Returns the names of all fields that share at least one bit with another
+    field, in field order.
+
+    Fields are swept in order of their low bit while tracking the field that
+    reaches the highest bit so far. Any field that overlaps an earlier one
+    starts at or below that bit, and therefore also overlaps the tracked
+    field, so all overlaps are found without comparing every pair of fields.
+    """
+    order = sorted(range(len(fields)), key=lambda i: (fields[i].low, fields[i].high))
+    overlapping = [False] * len(fields)
+    reach_idx = -1
+    reach = -1
+    for i in order:
+        field = fields[i]
+        if field.low <= reach:
+            overlapping[i] = True
+            overlapping[reach_idx] = True
+        if field.high > reach:
+            reach = field.high
+            reach_idx = i
+    return [field.inst_name for i, field in enumerate(fields) if overlapping[i]]
+
 
 class DesignScanner(RDLListener):
     def __init__(self, ds: DesignState) -> None:
+        # Scanning needs the register model, which snapshot exports do not have
+        assert ds.top_node is not None
         self.ds = ds
+        self.top_node = ds.top_node # type: AddrmapNode
         self.msg = ds.top_node.env.msg
 
-        self.prev_reg_stack: List[RegNode]
-        self.prev_reg_stack = []
-
-    @property
-    def top_node(self) -> AddrmapNode:
-        return self.ds.top_node
-
     def run(self) -> None:
         RDLWalker().walk(self.top_node, self)
+        self.check_errors()
+
+    def check_errors(self) -> None:
         if self.msg.had_error:
             self.msg.fatal(
                 "Unable to export due to previous errors"
@@ -27,60 +53,52 @@ class DesignScanner(RDLListener):
 
     def enter_AddressableComponent(self, node: AddressableNode) -> Optional[WalkerAction]:
         if not isinstance(node, RegNode):
-            self.prev_reg_stack.append(None)
-        return WalkerAction.Continue
-
-    def exit_AddressableComponent(self, node: AddressableNode) -> Optional[WalkerAction]:
-        if not isinstance(node, RegNode):
-            self.prev_reg_stack.pop()
+            index = IntervalIndex.from_node(node)
+            self.ds.block_indexes[node.get_path()] = index
+            self.check_reg_overlaps(node, index)
         return WalkerAction.Continue
 
-    def enter_Reg(self, node: RegNode) -> Optional[WalkerAction]:
-
-        # Collect information about overlapping fields, if any.
-        overlapping_fields = []
-        fields = list(node.fields())
-        reg_bitmask = 0
-        for i, field in enumerate(fields):
-            field_bitmask = ((1 << field.width) - 1) << field.low
-            if field_bitmask & reg_bitmask:
-                # this field overlaps with a prior one
-                # Determine which one
-                for prior_field in fields[0:i]:
-                    if prior_field.high >= field.low:
-                        if prior_field.inst_name not in overlapping_fields:
-                            overlapping_fields.append(prior_field.inst_name)
-
-                if field.inst_name not in overlapping_fields:
-                    overlapping_fields.append(field.inst_name)
-
-            reg_bitmask |= field_bitmask
-        if overlapping_fields:
-            # Save infor about this register for later.
-            self.ds.overlapping_fields[node.get_path()] = overlapping_fields
-
-
-        # Check previous adjacent register for overlap
-        prev_reg = self.prev_reg_stack[-1]
-        if prev_reg and ((prev_reg.raw_address_offset + prev_reg.total_size) > node.raw_address_offset):
+    def check_reg_overlaps(self, node: AddressableNode, index: IntervalIndex) -> None:
+        if len(index) < 2:
+            return
+        children = [child for child in node.children() if isinstance(child, AddressableNode)]
+        paired = set()
+        for i, j in index.overlaps():
+            first = children[index.positions[i]]
+            second = children[index.positions[j]]
+            if not (isinstance(first, RegNode) and isinstance(second, RegNode)):
+                continue
+            if j in paired:
+                # Only pair each register with the closest register before it
+                continue
+            paired.add(j)
             # registers overlap!
 
             # Registers shall be co-located.
             # This restriction guarantees that overlaps can only happen in pairs,
             # and avoids the more complex overlap scenarios that involve multiple registers.
             if (
-                prev_reg.raw_address_offset != node.raw_address_offset # Same offset
-                or prev_reg.size != node.size # Same size
-                or prev_reg.total_size != node.total_size # Same array footprint
+                first.raw_address_offset != second.raw_address_offset # Same offset
+                or first.size != second.size # Same size
+                or first.total_size != second.total_size # Same array footprint
             ):
                 self.msg.error(
                     "C header export currently only supports registers that are co-located. "
-                    f"See registers: '{prev_reg.inst_name}' and '{node.inst_name}.'",
-                    node.inst.inst_src_ref
+                    f"See registers: '{first.inst_name}' and '{second.inst_name}.'",
+                    second.inst.inst_src_ref
                 )
 
             # Save information about register overlap pair
-            self.ds.overlapping_reg_pairs[prev_reg.get_path()] = node.inst_name
+            self.ds.overlapping_reg_pairs[first.get_path()] = second.inst_name
+
+    def enter_Reg(self, node: RegNode) -> Optional[WalkerAction]:
+
+        # Collect information about overlapping fields, if any.
+        overlapping_fields = get_overlapping_fields(list(node.fields()))
+        if overlapping_fields:
+            # Save infor about this register for later.
+            self.ds.overlapping_fields[node.get_path()] = overlapping_fields
+
 
         # Check for sparse register arrays
         if node.is_array and node.array_stride > node.size:
@@ -91,6 +109,3 @@ class DesignScanner(RDLListener):
             )
 
         return WalkerAction.SkipDescendants
-
-    def exit_Reg(self, node: RegNode) -> None:
-        self.prev_reg_stack[-1] = node
@@ -1,21 +1,38 @@
-from typing import Any, Dict, List
-import os
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
-import jinja2 as jj
 from systemrdl.node import AddrmapNode
 
 from .c_standards import CStandard
+from .naming import NamingCache
+from .interval_index import IntervalIndex
+from .range_set import RangeSet
+from .template_env import get_jj_env
+
+if TYPE_CHECKING:
+    from .design_ir import DesignIR
+
+
+class AddrmapRecord:
+    """
+    Per-addrmap analysis result, collected once during the analysis walk and
+    shared by the later export stages so they do not have to re-walk the tree
+    """
+    def __init__(self, node: AddrmapNode, prefix: str) -> None:
+        self.node = node
+        self.prefix = prefix
 
 
 class DesignState:
-    def __init__(self, top_node: AddrmapNode) -> None:
-        loader = jj.FileSystemLoader(
-            os.path.join(os.path.dirname(__file__), "templates")
-        )
-        self.jj_env = jj.Environment(loader=loader, undefined=jj.StrictUndefined)
+    def __init__(self, top_node: Optional[AddrmapNode], precompiled_templates: str = "") -> None:
+        self.precompiled_templates = precompiled_templates
+        self.jj_env = get_jj_env(precompiled_templates)
 
+        # None when generating from an IR snapshot
         self.top_node = top_node
 
+        # Memoized node names shared by all export stages
+        self.naming = NamingCache()
+
         # ------------------------
         # Info about the design
         # ------------------------
@@ -27,6 +44,20 @@ class DesignState:
         #   first_reg_path : partner_register_name
         self.overlapping_reg_pairs = {}  # type: Dict[str, str]
 
+        # Address intervals of the children of every block (addrmap, regfile, mem)
+        #   block_path : IntervalIndex
+        self.block_indexes = {}  # type: Dict[str, IntervalIndex]
+
+        # Array elements ignored by directives, by instance
+        #   id(node.inst) : ignored indexes of the first dimension
+        self.array_ignores = {}  # type: Dict[int, RangeSet]
+
+        # Every addrmap in the design, in pre-order, along with its node prefix
+        self.addrmap_records = []  # type: List[AddrmapRecord]
+
+        # Compact representation of the design, built once directives are applied
+        self.ir = None  # type: Optional[DesignIR]
+
         # ------------------------
         # Extract compiler args
         # ------------------------
@@ -62,3 +93,24 @@ class DesignState:
 
         self.testcase: bool
         self.testcase = False
+
+        # Write a header per block type, included by a thin umbrella header,
+        # instead of a single header for the whole design
+        self.shard_headers: bool
+        self.shard_headers = False
+
+        # How the testcase checks the offsets of array elements:
+        # full, loop or sample. See OffsetTestsGenerator
+        self.offset_test_mode: str
+        self.offset_test_mode = "full"
+
+        # Check offsets with static_assert, at compile time, rather than with
+        # runtime asserts. Requires a C standard that has static_assert
+        self.static_offset_tests: bool
+        self.static_offset_tests = False
+
+        # Maximum number of static offset checks per testcase translation
+        # unit. Larger testcases are split into several files that can be
+        # compiled in parallel. 0 for a single file
+        self.testcase_chunk_size: int
+        self.testcase_chunk_size = 0
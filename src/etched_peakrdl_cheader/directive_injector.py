@@ -1,62 +1,239 @@
+import fnmatch
+import re
+import time
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
 import yaml
-from typing import Dict, Union
+from systemrdl.node import Node, AddrmapNode, FieldNode
 
 from .design_state import DesignState
-from systemrdl.node import Node, AddrmapNode, RegNode, FieldNode
+from .range_set import RangeSet
+
+# Directives are plain data. Use the libyaml loader if PyYAML was built with it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Path segment that selects elements of an array: name[3], name[0:4, 6]
+INDEXED_KEY_RE = re.compile(r"^(.+)\[([\d:,\s]+)\]$")
+
+
+def parse_indexes(entries: List[Any]) -> RangeSet:
+    """
+    Parses array indexes given as "n", or as "start:end" ranges that exclude
+    end. Ranges are kept as such, however many elements they span
+    """
+    idxes = RangeSet()
+    for entry in entries:
+        entry = str(entry).strip()
+        if ":" in entry:
+            start, end = map(int, entry.split(":"))
+            idxes.add_range(start, end)
+        else:
+            idxes.add(int(entry))
+    return idxes
+
+
+class PathSegment:
+    """
+    Matches the names of the children a directive applies to.
+
+    A segment is a plain name, a glob pattern using * and ?, or a regular
+    expression between slashes. Any of them can be followed by array indexes
+    in brackets, in which case those elements of the matched arrays are
+    ignored.
+    """
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+        self.idxes = RangeSet()
+        m = INDEXED_KEY_RE.match(key)
+        if m:
+            key = m.group(1)
+            self.idxes = parse_indexes(m.group(2).split(","))
+
+        # Plain names are looked up directly, without a pattern
+        self.name = ""
+        self.regex: Optional[Pattern[str]]
+        self.regex = None
+        if len(key) > 1 and key.startswith("/") and key.endswith("/"):
+            self.regex = re.compile(key[1:-1])
+        elif "*" in key or "?" in key:
+            self.regex = re.compile(fnmatch.translate(key))
+        else:
+            self.name = key
+
+    def matches(self, name: str) -> bool:
+        if self.regex is None:
+            return name == self.name
+        return self.regex.fullmatch(name) is not None
+
+
+class DirectiveTrie:
+    """
+    Directives of one path, and the paths below it.
+
+    Children with plain names are indexed by name, so matching a design node
+    against all of them is a single lookup. Pattern children are tried in
+    turn.
+    """
+    def __init__(self, path: str, segment: Optional[PathSegment] = None) -> None:
+        self.path = path
+        self.segment = segment
+
+        # Directives for the matched nodes
+        self.ignore = False
+        self.arrayignores = RangeSet()
+
+        # Children by key, in the order they first appear
+        self.children: Dict[str, 'DirectiveTrie']
+        self.children = {}
+        self.named_children: Dict[str, List['DirectiveTrie']]
+        self.named_children = {}
+        self.pattern_children: List['DirectiveTrie']
+        self.pattern_children = []
+
+        # Number of design nodes this matched
+        self.n_matches = 0
+
+    def get_child(self, key: str) -> 'DirectiveTrie':
+        child = self.children.get(key)
+        if child is None:
+            segment = PathSegment(key)
+            child = DirectiveTrie(f"{self.path}.{key}", segment)
+            self.children[key] = child
+            if segment.regex is None:
+                self.named_children.setdefault(segment.name, []).append(child)
+            else:
+                self.pattern_children.append(child)
+        return child
+
+    def add(self, directives: Optional[Dict[Any, Any]]) -> int:
+        """
+        Adds a table of directives below this path. Returns the number of
+        directives it holds
+        """
+        if not directives:
+            if self.segment is not None and self.segment.idxes:
+                self.arrayignores.update(self.segment.idxes)
+            else:
+                self.ignore = True
+            return 1
+
+        if self.segment is not None and self.segment.idxes:
+            raise ValueError(
+                f"Directives cannot apply to individual array elements: {self.path}"
+            )
+        if not isinstance(directives, dict):
+            raise ValueError(f"Expected a table of directives at {self.path}: {directives}")
+
+        n = 0
+        for k, v in directives.items():
+            if not isinstance(k, str):
+                raise ValueError(f"Directive key {k} at {self.path} not of type str")
+            if k == "arrayignores":
+                self.arrayignores.update(parse_indexes(v))
+                n += 1
+            else:
+                n += self.get_child(k).add(v)
+        return n
+
+    def match_child(self, name: str, matches: List['DirectiveTrie']) -> None:
+        matches.extend(self.named_children.get(name, ()))
+        for child in self.pattern_children:
+            if child.segment.matches(name): # type: ignore
+                matches.append(child)
+
+    def get_unmatched(self, unmatched: List[str]) -> None:
+        """
+        Collects the paths of child directives that matched nothing. Paths
+        below an unmatched one are not listed
+        """
+        for child in self.children.values():
+            if child.n_matches:
+                child.get_unmatched(unmatched)
+            else:
+                unmatched.append(child.path)
 
 
 class DirectiveInjector:
+    """
+    Applies the ignore directives of a YAML file to the design.
+
+    Every table in the file holds directives relative to the top node. All of
+    them are compiled into a single trie of paths first, which is then
+    matched against the design in one descent that only visits the nodes
+    that directives refer to.
+    """
     def __init__(self, ds: DesignState) -> None:
         self.ds = ds
-        self.path: str
 
-    def find_field_in_regnode(self, fieldstr: str, node: RegNode) -> FieldNode:
-        for field in node.fields():
-            if field.inst_name == fieldstr:
-                return field
-        raise NameError(f"Field could not be found: {fieldstr}")
+        # Number of directives in the file
+        self.n_directives = 0
 
-    def run(self, path: str, top_node: AddrmapNode) -> AddrmapNode:
+        # Paths of directives that did not match any node
+        self.unmatched: List[str]
+        self.unmatched = []
+
+    def run(self, path: str, top_node: AddrmapNode) -> None:
         try:
-            fp = open(path, "r")
-            directive_data = yaml.load_all(fp, Loader=yaml.FullLoader)
-            for dir_table in directive_data:
-                for k, v in dir_table.items():
-                    print(f"Injecting directives: {k}")
-                    self.ignore_inject_recursive(top_node, v)
-            fp.close()
+            start = time.perf_counter()
+            trie = self.load(path, top_node.inst_name)
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.apply(trie, top_node)
+            apply_time = time.perf_counter() - start
+            print(
+                f"Loaded {self.n_directives} directives in {load_time:.3f}s, "
+                f"applied in {apply_time:.3f}s"
+            )
+
+            trie.get_unmatched(self.unmatched)
+            if self.unmatched:
+                print(f"{len(self.unmatched)} directives did not match the design:")
+                for unmatched_path in self.unmatched:
+                    print(f"  {unmatched_path}")
         except FileNotFoundError:
             print(f"The file {path} was not found.")
         except Exception as e:
             print(f"An error occurred:\n{e}")
 
-    def ignore_inject_recursive(
-        self, node: Node, directives: Union[Dict, None]
-    ) -> None:
-        if not directives:
-            node.set_ignore(True)
-        else:
-            for k, v in directives.items():
-                if type(node) == RegNode:
-                    if type(k) != str:
-                        raise NameError(f"Regnode_insert_err: {k} not of type str")
-                    if v != None:
-                        raise NameError(f"field {k} cannot have children")
-                    field = self.find_field_in_regnode(k, node)
-                    field.set_ignore(True)
-
-                if k == "arrayignores":
-                    for basestr in v:
-                        if ":" in basestr:
-                            start, end = map(int, basestr.split(":"))
-                            node.append_ignore_idxes(list(range(start, end)))
-                        else:
-                            node.append_ignore_idxes([int(basestr)])
+    def load(self, path: str, top_name: str) -> DirectiveTrie:
+        trie = DirectiveTrie(top_name)
+        with open(path, "r", encoding="utf-8") as fp:
+            for dir_table in yaml.load_all(fp, Loader=YamlLoader):
+                if not dir_table:
                     continue
-                recurnode = node.get_child_by_name(k)
-                if not recurnode:
-                    raise NameError(
-                        f"Node could not be found: {k}\nAvailable: {directives.items()}"
-                    )
-                self.ignore_inject_recursive(recurnode, v)
-        return
+                for k, v in dir_table.items():
+                    print(f"Injecting directives: {k}")
+                    self.n_directives += trie.add(v)
+        return trie
+
+    def apply(self, trie: DirectiveTrie, top_node: AddrmapNode) -> None:
+        # Every node is visited with all of the trie entries that match it
+        stack = [(top_node, [trie])] # type: List[Tuple[Node, List[DirectiveTrie]]]
+        while stack:
+            node, entries = stack.pop()
+            parents = []
+            for entry in entries:
+                entry.n_matches += 1
+                if isinstance(node, FieldNode) and (entry.children or entry.arrayignores):
+                    raise ValueError(f"Field {entry.path} cannot have children")
+                if entry.ignore:
+                    node.set_ignore(True)
+                if entry.arrayignores:
+                    ignored = self.ds.array_ignores.setdefault(id(node.inst), RangeSet())
+                    ignored.update(entry.arrayignores)
+                if entry.children:
+                    parents.append(entry)
+            if not parents:
+                continue
+
+            children = []
+            for child in node.children():
+                matches = [] # type: List[DirectiveTrie]
+                for entry in parents:
+                    entry.match_child(child.inst_name, matches)
+                if matches:
+                    children.append((child, matches))
+            # Visit children in model order
+            stack.extend(reversed(children))
@@ -0,0 +1,62 @@
+from typing import Optional
+
+
+class ExportOptions:
+    """
+    Options of the generation stages, shared by exports from the register
+    model and from an IR snapshot. Built once by the caller and passed
+    through the export as a whole.
+    """
+    def __init__(self) -> None:
+        # ------------------------
+        # Rendering
+        # ------------------------
+        # Number of processes to render test libraries with
+        self.gen_jobs = 1
+
+        # Directory of templates precompiled ahead of time. Empty to compile
+        # them on first use
+        self.precompiled_templates = ""
+
+        # Reuse rendered test libraries across exports from this directory.
+        # Empty to disable
+        self.cache_dir = ""
+        self.cache_max_bytes = 256 * 1024 * 1024
+
+        # Only rewrite files whose content changed since the previous export
+        self.incremental = False
+
+        # ------------------------
+        # Generated tests
+        # ------------------------
+        # Also generate the reverse address lookup table
+        self.address_table = False
+
+        # Test the elements of arrays in a loop rather than one call each
+        self.array_loops = False
+
+        # Generate table-driven read/write tests
+        self.table_tests = False
+
+        # Give every test a globally unique test index, and write the binary
+        # test index map
+        self.global_test_idx = False
+
+        # ------------------------
+        # Formatting
+        # ------------------------
+        # clang-format style file. Empty for the default style
+        self.clang_format_path = ""
+        # Number of concurrent clang-format batches. None for one per CPU
+        self.format_jobs = None # type: Optional[int]
+        self.format_batch_size = 64
+
+        # ------------------------
+        # Instrumentation
+        # ------------------------
+        # Write export statistics as JSON to this file. Empty to disable
+        self.stats_path = ""
+        self.profile = False
+        self.trace_memory = False
+        # Print export statistics
+        self.verbose = False
@@ -1,10 +1,8 @@
-import os
-import subprocess
-import glob
 import pathlib
-from typing import Any, Union
+from typing import Any, Callable, Optional, Tuple, Union
 
 from systemrdl.node import RootNode, AddrmapNode
+from systemrdl.walker import RDLWalker
 
 from .design_state import DesignState
 from .design_scanner import DesignScanner
@@ -12,6 +10,15 @@ from .directive_injector import DirectiveInjector
 from .nodename_retriever import NodenameRetriever
 from .unique_rebuild_directive_injector import UniqueRebuildDirectiveInjector
 from .csr_access_generator import CsrAccessGenerator
+from .multi_listener import MultiListener
+from .formatter import ClangFormatter
+from .output_files import OutputFiles
+from .artifact_cache import ArtifactCache
+from .instrumentation import Instrumentation
+from .address_table import AddressTable
+from .design_ir import DesignIR
+from .ir_snapshot import save_snapshot, load_snapshot
+from .export_options import ExportOptions
 
 
 class CHeaderExporter:
@@ -20,47 +27,189 @@ class CHeaderExporter:
         node: Union[RootNode, AddrmapNode],
         directives_path: str,
         out_dir: str,
-        clang_format_path: str = "",
-    ) -> None:
+        options: Optional[ExportOptions] = None,
+        *,
+        fused: bool = False,
+        snapshot_path: str = "",
+    ) -> Instrumentation:
+        if options is None:
+            options = ExportOptions()
+
+        def run(instr: Instrumentation) -> None:
+            ds, ir = self.analyze(
+                instr, node, directives_path, fused, options.precompiled_templates
+            )
+            if snapshot_path:
+                with instr.stage("snapshot"):
+                    print(f"Saving IR snapshot to {snapshot_path}...")
+                    save_snapshot(snapshot_path, ir, [directives_path])
+            self.generate(instr, ds, out_dir, options)
+        return self.run_instrumented(run, options)
+
+    def export_snapshot(
+        self,
+        snapshot_path: str,
+        out_dir: str,
+        options: Optional[ExportOptions] = None,
+        *,
+        check_inputs: bool = True,
+    ) -> Instrumentation:
+        """
+        Generates output from an IR snapshot saved by a previous export,
+        without the register model. The snapshot holds the design with
+        directives already applied.
+        """
+        if options is None:
+            options = ExportOptions()
+
+        def run(instr: Instrumentation) -> None:
+            with instr.stage("snapshot"):
+                print(f"Loading IR snapshot from {snapshot_path}...")
+                ds = DesignState(None, options.precompiled_templates)
+                ds.ir = load_snapshot(snapshot_path, check_inputs)
+            self.generate(instr, ds, out_dir, options)
+        return self.run_instrumented(run, options)
+
+    def run_instrumented(
+        self, run: Callable[[Instrumentation], None], options: ExportOptions
+    ) -> Instrumentation:
+        instr = Instrumentation(options.profile, options.trace_memory)
+        instr.start()
+        try:
+            run(instr)
+        finally:
+            instr.stop()
+
+        if options.stats_path:
+            instr.write_json(options.stats_path)
+        if options.verbose:
+            print(instr.summary())
+        return instr
+
+    def analyze(
+        self,
+        instr: Instrumentation,
+        node: Union[RootNode, AddrmapNode],
+        directives_path: str,
+        fused: bool,
+        precompiled_templates: str,
+    ) -> Tuple[DesignState, DesignIR]:
         # If it is the root node, skip to top addrmap
         if isinstance(node, RootNode):
             top_node = node.top
         else:
             top_node = node
 
-        ds = DesignState(top_node)
+        ds = DesignState(top_node, precompiled_templates)
 
         # Validate and collect info for export
-        DesignScanner(ds).run()
-        print("Injecting directives...")
-        DirectiveInjector(ds).run(directives_path, top_node)
-        names = NodenameRetriever(ds).run(top_node)
-        UniqueRebuildDirectiveInjector(ds).run(top_node, names)
-        top_nodes = []
-        top_nodes.append(top_node)
+        if fused:
+            self.analyze_fused(instr, ds, directives_path, top_node)
+        else:
+            with instr.stage("scan"):
+                scanner = DesignScanner(ds)
+                instr.track_listener(scanner)
+                scanner.run()
+            with instr.stage("directives"):
+                print("Injecting directives...")
+                directives = DirectiveInjector(ds)
+                directives.run(directives_path, top_node)
+            self.count_directives(instr, directives)
+            with instr.stage("naming"):
+                retriever = NodenameRetriever(ds)
+                instr.track_listener(retriever)
+                names = retriever.run(top_node)
+                injector = UniqueRebuildDirectiveInjector(ds)
+                instr.track_listener(injector)
+                injector.run(top_node, names)
 
-        # Write output
+        with instr.stage("ir"):
+            ir = DesignIR.build(ds, top_node)
+            ds.ir = ir
+            print(f"Naming cache: {ds.naming.summary()}")
+        instr.count("ir_nodes", len(ir))
+        instr.count("ir_fields", len(ir.field_parents))
+        return ds, ir
 
-        print("Generating files...")
-        CsrAccessGenerator(ds).run(out_dir, top_node)
+    def count_directives(self, instr: Instrumentation, directives: DirectiveInjector) -> None:
+        instr.count("directives", directives.n_directives)
+        instr.count("directives_unmatched", len(directives.unmatched))
 
-        print("Clang-formatting files...")
-        files = glob.glob(os.path.join(out_dir, "*.cc"))
-        files += glob.glob(os.path.join(out_dir, "*.h"))
+    def generate(
+        self, instr: Instrumentation, ds: DesignState, out_dir: str, options: ExportOptions
+    ) -> None:
+        # Only works from the IR, so that it can also run from a snapshot
+        assert ds.ir is not None
+        top_name = ds.ir.get_name(0)
 
-        try:
-            for file_path in files:
-                cmd = ["clang-format", "-i", file_path]
-                if clang_format_path:
-                    cmd = [
-                        "clang-format",
-                        "-i",
-                        f"-style=file:{clang_format_path}",
-                        file_path,
-                    ]
-                subprocess.run(
-                    cmd,
-                    check=True,
-                )
-        except subprocess.CalledProcessError as e:
-            print(f"Error: Command failed with exit code {e.returncode}")
+        with instr.stage("generation"):
+            print("Generating files...")
+            outputs = OutputFiles(out_dir, options.incremental)
+            cache = None
+            if options.cache_dir:
+                cache = ArtifactCache(options.cache_dir, options.cache_max_bytes)
+            generator = CsrAccessGenerator(
+                ds,
+                cache=cache,
+                jobs=options.gen_jobs,
+                array_loops=options.array_loops,
+                table_tests=options.table_tests,
+                global_test_idx=options.global_test_idx,
+            )
+            generator.run(outputs, ds.ir)
+            if cache is not None:
+                print(f"Artifact cache: {cache.summary()}")
+        instr.count("blocks_rendered", generator.blocks_rendered)
+        for name, n in generator.render_counts.items():
+            instr.count(f"renders:{name}", n)
+
+        if options.address_table:
+            with instr.stage("address_table"):
+                print("Building address table...")
+                table = AddressTable.from_ir(ds.ir)
+                outputs.add_binary(f"{top_name}_addr_table.bin", table.to_bytes())
+                table.write_c_header(outputs.open(f"{top_name}_addr_table.h"), top_name)
+            instr.count("address_table_nodes", len(table))
+
+        with instr.stage("write"):
+            written = outputs.commit()
+            print(f"Wrote {len(written)} of {len(outputs.files)} files")
+        instr.count("files_generated", len(outputs.files))
+        instr.count("files_written", len(written))
+        instr.count("bytes_generated", outputs.rendered_bytes)
+        instr.count("bytes_written", outputs.written_bytes)
+
+        with instr.stage("formatting"):
+            print("Clang-formatting files...")
+            files = [path for path in written if path.endswith((".cc", ".h"))]
+            ClangFormatter(
+                options.clang_format_path, options.format_jobs, options.format_batch_size
+            ).run(files)
+            outputs.save_manifest()
+        instr.count("files_formatted", len(files))
+
+    def analyze_fused(
+        self, instr: Instrumentation, ds: DesignState, directives_path: str,
+        top_node: AddrmapNode
+    ) -> None:
+        # Node prefixes do not depend on directives, so design scanning and name
+        # retrieval share a single walk. Unique/rebuild injection then only
+        # needs the addrmaps recorded by that walk rather than a walk of its own.
+        with instr.stage("analysis"):
+            scanner = DesignScanner(ds)
+            retriever = NodenameRetriever(ds)
+            retriever.root_node = top_node
+            listener = MultiListener(scanner, retriever)
+            instr.track_listener(listener)
+            RDLWalker().walk(top_node, listener)
+            scanner.check_errors()
+
+        with instr.stage("directives"):
+            print("Injecting directives...")
+            directives = DirectiveInjector(ds)
+            directives.run(directives_path, top_node)
+        self.count_directives(instr, directives)
+        with instr.stage("naming"):
+            UniqueRebuildDirectiveInjector(ds).run_records(
+                ds.addrmap_records, retriever.uniquenames
+            )
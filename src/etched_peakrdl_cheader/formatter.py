@@ -0,0 +1,81 @@
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import os
+import subprocess
+import time
+
+
+class ClangFormatError(RuntimeError):
+    pass
+
+
+class BatchResult:
+    def __init__(self, files: List[str], returncode: int, output: str, elapsed: float) -> None:
+        self.files = files
+        self.returncode = returncode
+        self.output = output
+        self.elapsed = elapsed
+
+
+class ClangFormatter:
+    """
+    Formats files in place with clang-format.
+
+    Files are split into batches that are each handled by a single
+    clang-format invocation, and batches run concurrently on a bounded pool
+    of worker threads.
+    """
+    def __init__(
+        self,
+        style_path: str = "",
+        jobs: Optional[int] = None,
+        batch_size: int = 64,
+    ) -> None:
+        self.style_path = style_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_size = max(batch_size, 1)
+
+    def get_command(self, files: List[str]) -> List[str]:
+        cmd = ["clang-format", "-i"]
+        if self.style_path:
+            cmd.append(f"-style=file:{self.style_path}")
+        return cmd + files
+
+    def format_batch(self, files: List[str]) -> BatchResult:
+        start = time.perf_counter()
+        ret = subprocess.run(
+            self.get_command(files),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=False,
+        )
+        return BatchResult(
+            files,
+            ret.returncode,
+            ret.stdout.decode("utf-8", errors="replace"),
+            time.perf_counter() - start,
+        )
+
+    def run(self, files: List[str]) -> List[BatchResult]:
+        batches = [
+            files[i:i + self.batch_size]
+            for i in range(0, len(files), self.batch_size)
+        ]
+        if not batches:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.jobs, len(batches))) as pool:
+            results = list(pool.map(self.format_batch, batches))
+
+        for i, result in enumerate(results):
+            print(f"  batch {i}: {len(result.files)} files in {result.elapsed:.2f}s")
+
+        failed = [result for result in results if result.returncode]
+        if failed:
+            msg = "\n".join(
+                f"clang-format exited with code {result.returncode} for: "
+                f"{' '.join(result.files)}\n{result.output}"
+                for result in failed
+            )
+            raise ClangFormatError(msg)
+        return results
@@ -1,4 +1,4 @@
-from typing import TextIO, Set, Optional, List
+from typing import Dict, Set, Optional, List
 import os
 import re
 
@@ -6,79 +6,242 @@ from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
 from systemrdl.node import AddrmapNode, AddressableNode, RegNode, FieldNode, Node, MemNode
 
 from .design_state import DesignState
+from .code_emitter import CodeEmitter
+from .interval_index import IntervalIndex
 from .identifier_filter import kw_filter as kwf
 from . import utils
 
+
+class HeaderShard:
+    """
+    Header of a single block type, when writing sharded headers
+    """
+    def __init__(self, struct_name: str) -> None:
+        self.struct_name = struct_name
+
+        # Definitions that the block's struct and registers use, in the order
+        # they are first used
+        self.uses: List[str]
+        self.uses = []
+        self.used: Set[str]
+        self.used = set()
+
+    def use(self, name: str) -> None:
+        if name not in self.used:
+            self.used.add(name)
+            self.uses.append(name)
+
+
 class HeaderGenerator(RDLListener):
     def __init__(self, ds: DesignState) -> None:
         self.ds = ds
 
         self.defined_namespace: Set[str]
         self.defined_namespace = set()
-        self.indent_level = 0
+
+        # When writing sharded headers, every definition is collected on its
+        # own, and placed once all of its users are known
+        self.definitions: Dict[str, CodeEmitter]
+        self.definitions = {}
+
+        # Shard of every block type, by struct name
+        self.shards: Dict[str, HeaderShard]
+        self.shards = {}
+
+        # Shards of the blocks being walked
+        self.shard_stack: List[HeaderShard]
+        self.shard_stack = []
 
         self.root_node: AddrmapNode
         self.root_node = None
 
-        self.f: TextIO
+        self.f: CodeEmitter
         self.f = None # type: ignore
 
     def run(self, path: str, top_nodes: List[AddrmapNode]) -> None:
+        """
+        Writes the header to path.h.
+
+        If ds.shard_headers is set, path.h is only an umbrella header that
+        includes the header of each top node's block type. Every block type
+        gets its own header, which includes the headers of the block types it
+        instantiates. Register definitions go in the header of the only block
+        type that uses them, or in path_common.h if several do.
+        """
         header_path = path + ".h"
-        with open(header_path, "w", encoding='utf-8') as f:
-            self.f = f
+        header = CodeEmitter()
+        self.f = header
 
+        includes = [] # type: List[str]
+        if self.ds.shard_headers:
+            for node in top_nodes:
+                shard_path = self.get_shard_path(path, utils.get_struct_name(self.ds, node, node))
+                if os.path.basename(shard_path) not in includes:
+                    includes.append(os.path.basename(shard_path))
+
+        context = {
+            "ds": self.ds,
+            "header_guard_def": self.get_header_guard_def(header_path),
+            "top_nodes": top_nodes,
+            "get_struct_name": utils.get_struct_name,
+            "includes": includes,
+        }
+
+        # Stream header via jinja
+        template = self.ds.jj_env.get_template("header.h")
+        self.f.writelines(template.stream(context))
+        self.f.write("\n")
+
+        # Generate definitions
+        for node in top_nodes:
+            self.root_node = node
+            RDLWalker().walk(node, self)
+        self.f = header
+
+        if self.ds.shard_headers:
+            self.write_shards(path)
+
+        # Write direct instance definitions
+        if self.ds.instantiate:
+            self.f.write("\n// Instances\n")
+            for node in top_nodes:
+                addr = node.raw_absolute_address + self.ds.inst_offset
+                type_name = utils.get_struct_name(self.ds, node, node)
+                if node.is_array:
+                    if len(node.array_dimensions) > 1:
+                        node.env.msg.fatal(
+                            f"C header generator does not support instance defines for multi-dimensional arrays: {node.inst_name}{node.array_dimensions}",
+                            node.inst.inst_src_ref
+                        )
+                    self.f.write(f"#define {node.inst_name} ((volatile {type_name} *){addr:#x}UL)\n")
+                else:
+                    self.f.write(f"#define {node.inst_name} (*(volatile {type_name} *){addr:#x}UL)\n")
+
+        # Stream footer via jinja
+        template = self.ds.jj_env.get_template("footer.h")
+        self.f.writelines(template.stream(context))
+
+        # Ensure newline before EOF
+        self.f.write("\n")
+
+        # Write out the whole header at once
+        with open(header_path, "w", encoding='utf-8') as f:
+            self.f.flush_to(f)
+
+    def get_header_guard_def(self, header_path: str) -> str:
+        return re.sub(r"[^\w]", "_", os.path.basename(header_path)).upper()
+
+    def get_shard_path(self, path: str, struct_name: str) -> str:
+        # Struct names end in _t, so cannot clash with the common header
+        return f"{path}_{struct_name}.h"
+
+    def write_shards(self, path: str) -> None:
+        # Place every definition in the shard of the only block type that
+        # uses it. A block's own struct always goes in its shard
+        users = {} # type: Dict[str, List[str]]
+        for shard in self.shards.values():
+            for name in shard.uses:
+                users.setdefault(name, []).append(shard.struct_name)
+        common_path = f"{path}_common.h"
+        placement = {} # type: Dict[str, str]
+        for name in self.definitions:
+            if name in self.shards:
+                placement[name] = self.get_shard_path(path, name)
+            elif len(users[name]) == 1:
+                placement[name] = self.get_shard_path(path, users[name][0])
+            else:
+                placement[name] = common_path
+
+        # Only the struct hierarchy adds includes between block types, and
+        # the common header includes nothing, so there are no include cycles
+        shard_paths = [common_path]
+        shard_paths += [self.get_shard_path(path, name) for name in self.shards]
+        includes = {p: [] for p in shard_paths} # type: Dict[str, List[str]]
+        for shard in self.shards.values():
+            shard_path = self.get_shard_path(path, shard.struct_name)
+            for name in shard.uses:
+                include = os.path.basename(placement[name])
+                if placement[name] != shard_path and include not in includes[shard_path]:
+                    includes[shard_path].append(include)
+
+        contents = {p: CodeEmitter() for p in shard_paths}
+        for name, definition in self.definitions.items():
+            contents[placement[name]].writelines(definition.chunks)
+
+        header_template = self.ds.jj_env.get_template("header.h")
+        footer_template = self.ds.jj_env.get_template("footer.h")
+        for shard_path in shard_paths:
+            if shard_path == common_path and not contents[shard_path].chunks:
+                continue
             context = {
                 "ds": self.ds,
-                "header_guard_def": re.sub(r"[^\w]", "_", os.path.basename(header_path)).upper(),
-                "top_nodes": top_nodes,
+                "header_guard_def": self.get_header_guard_def(shard_path),
+                "top_nodes": [],
                 "get_struct_name": utils.get_struct_name,
+                "includes": includes[shard_path],
             }
-
-            # Stream header via jinja
-            template = self.ds.jj_env.get_template("header.h")
-            template.stream(context).dump(f)
+            f = CodeEmitter()
+            f.writelines(header_template.stream(context))
             f.write("\n")
-
-            # Generate definitions
-            for node in top_nodes:
-                self.root_node = node
-                RDLWalker().walk(node, self)
-
-            # Write direct instance definitions
-            if self.ds.instantiate:
-                f.write("\n// Instances\n")
-                for node in top_nodes:
-                    addr = node.raw_absolute_address + self.ds.inst_offset
-                    type_name = utils.get_struct_name(self.ds, node, node)
-                    if node.is_array:
-                        if len(node.array_dimensions) > 1:
-                            node.env.msg.fatal(
-                                f"C header generator does not support instance defines for multi-dimensional arrays: {node.inst_name}{node.array_dimensions}",
-                                node.inst.inst_src_ref
-                            )
-                        f.write(f"#define {node.inst_name} ((volatile {type_name} *){addr:#x}UL)\n")
-                    else:
-                        f.write(f"#define {node.inst_name} (*(volatile {type_name} *){addr:#x}UL)\n")
-
-            # Stream footer via jinja
-            template = self.ds.jj_env.get_template("footer.h")
-            template.stream(context).dump(f)
-
-            # Ensure newline before EOF
+            f.writelines(contents[shard_path].chunks)
+            f.writelines(footer_template.stream(context))
             f.write("\n")
+            with open(shard_path, "w", encoding='utf-8') as fp:
+                f.flush_to(fp)
+
+    def define(self, name: str) -> bool:
+        """
+        Claims name for a definition that is about to be written. Returns
+        False if it was already defined
+        """
+        self.use(name)
+        if name in self.defined_namespace:
+            return False
+        self.defined_namespace.add(name)
+        if self.ds.shard_headers:
+            self.f = CodeEmitter()
+            self.definitions[name] = self.f
+        return True
+
+    def use(self, name: str) -> None:
+        """
+        Records that the block being walked uses the definition of name
+        """
+        if self.shard_stack:
+            self.shard_stack[-1].use(name)
+
+    def is_block(self, node: AddressableNode) -> bool:
+        """
+        Whether node is written out as a struct of its children
+        """
+        if isinstance(node, RegNode):
+            return False
+        if isinstance(node, MemNode):
+            return self.has_vregs(node)
+        return True
+
+    def has_vregs(self, node: MemNode) -> bool:
+        for _ in node.registers():
+            return True
+        return False
 
     def push_indent(self) -> None:
-        self.indent_level += 1
+        self.f.push_indent()
 
     def pop_indent(self) -> None:
-        self.indent_level -= 1
+        self.f.pop_indent()
 
     def write(self, s: str) -> None:
-        if self.indent_level:
-            self.f.write("    " * self.indent_level)
-        self.f.write(s)
+        self.f.emit(s)
+
 
+    def get_block_index(self, node: AddressableNode) -> IntervalIndex:
+        # Normally built while scanning the design
+        index = self.ds.block_indexes.get(node.get_path())
+        if index is None:
+            index = IntervalIndex.from_node(node)
+            self.ds.block_indexes[node.get_path()] = index
+        return index
 
     def get_node_prefix(self, node: AddressableNode) -> str:
         return utils.get_node_prefix(self.ds, self.root_node, node)
@@ -134,9 +297,8 @@ class HeaderGenerator(RDLListener):
     def enter_Reg(self, node: RegNode) -> Optional[WalkerAction]:
         prefix = self.get_node_prefix(node).upper()
 
-        if prefix in self.defined_namespace:
+        if not self.define(prefix):
             return WalkerAction.SkipDescendants
-        self.defined_namespace.add(prefix)
 
         self.write(f"\n// {self.get_friendly_name(node)}\n")
 
@@ -161,10 +323,9 @@ class HeaderGenerator(RDLListener):
             return
 
         union_name = self.get_struct_name(node)
-        if union_name in self.defined_namespace:
+        if not self.define(union_name):
             # Already defined. Skip
             return
-        self.defined_namespace.add(union_name)
 
         # Sort fields into their respective categories
         overlapping_fields = self.ds.overlapping_fields.get(node.get_path(), [])
@@ -206,23 +367,25 @@ class HeaderGenerator(RDLListener):
         self.write(f"}} {union_name};\n")
 
 
+    def enter_AddressableComponent(self, node: AddressableNode) -> None:
+        if self.ds.shard_headers and self.is_block(node):
+            struct_name = self.get_struct_name(node)
+            shard = self.shards.get(struct_name)
+            if shard is None:
+                shard = HeaderShard(struct_name)
+                self.shards[struct_name] = shard
+            self.shard_stack.append(shard)
+
     def exit_AddressableComponent(self, node: AddressableNode) -> None:
-        if isinstance(node, (RegNode, MemNode)):
+        if not isinstance(node, (RegNode, MemNode)):
             # Registers and Mem handled elsewhere
-            return
+            self.write_block(node)
 
-        self.write_block(node)
+        if self.ds.shard_headers and self.is_block(node):
+            self.shard_stack.pop()
 
     def exit_Mem(self, node: MemNode) -> None:
-
-        for _ in node.registers():
-            has_vregs = True
-            break
-        else:
-            has_vregs = False
-
-
-        if has_vregs:
+        if self.has_vregs(node):
             # Contains virtual registers.
             # Write out as if it is a regular block
             self.write_block(node)
@@ -230,10 +393,9 @@ class HeaderGenerator(RDLListener):
 
         # otherwise, write out an array of words of memwidth
         struct_name = self.get_struct_name(node)
-        if struct_name in self.defined_namespace:
+        if not self.define(struct_name):
             # Already defined. Skip
             return
-        self.defined_namespace.add(struct_name)
 
         self.write(f"\n// {self.get_friendly_name(node)}\n")
 
@@ -252,31 +414,29 @@ class HeaderGenerator(RDLListener):
 
     def write_block(self, node: AddressableNode) -> None:
         struct_name = self.get_struct_name(node)
-        if struct_name in self.defined_namespace:
+        if not self.define(struct_name):
             # Already defined. Skip
             return
-        self.defined_namespace.add(struct_name)
 
         self.write(f"\n// {self.get_friendly_name(node)}\n")
 
         self.write("typedef struct __attribute__ ((__packed__)) {\n")
         self.push_indent()
 
-        current_offset = 0
+        index = self.get_block_index(node)
+        children = [child for child in node.children() if isinstance(child, AddressableNode)]
         skipme = set()
-        for child in node.children():
-            if not isinstance(child, AddressableNode):
-                continue
+        for i in range(len(index)):
+            child = children[index.positions[i]]
 
             # Skip any child regs that were already emitted due to overlap union
             if child.inst_name in skipme:
                 continue
 
             # Insert byte padding before next child
-            padding = child.raw_address_offset - current_offset
+            padding = index.gap_before(i)
             if padding:
-                self.write_byte_padding(current_offset, padding)
-                current_offset += padding
+                self.write_byte_padding(index.offsets[i] - padding, padding)
 
             if isinstance(child, RegNode):
                 # Check if register is overlapping first
@@ -298,15 +458,13 @@ class HeaderGenerator(RDLListener):
             else:
                 self.write_group_struct_member(child)
 
-            current_offset += child.total_size
-
         # Write end padding as needed
         if node.is_array:
-            padding = node.array_stride - current_offset
+            padding = node.array_stride - index.end
         else:
-            padding = node.size - current_offset
+            padding = node.size - index.end
         if padding:
-            self.write_byte_padding(current_offset, padding)
+            self.write_byte_padding(index.end, padding)
 
         self.pop_indent()
         self.write(f"}} {struct_name};\n")
@@ -324,6 +482,7 @@ class HeaderGenerator(RDLListener):
 
         if self.ds.generate_bitfields:
             struct_name = self.get_struct_name(node)
+            self.use(struct_name)
             self.write(f"{struct_name} {kwf(node.inst_name)}{array_suffix};\n")
         else:
             regwidth = node.get_property('regwidth')
@@ -342,4 +501,5 @@ class HeaderGenerator(RDLListener):
         else:
             array_suffix = ""
         struct_name = self.get_struct_name(node)
+        self.use(struct_name)
         self.write(f"{struct_name} {kwf(node.inst_name)}{array_suffix};\n")
@@ -0,0 +1,176 @@
+from typing import Any, Dict, Iterator, List, Optional
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+from systemrdl.walker import RDLListener
+
+
+class StageStats:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+        # Peak traced memory during the stage, if memory tracing is enabled
+        self.peak_memory: Optional[int]
+        self.peak_memory = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+        } # type: Dict[str, Any]
+        if self.peak_memory is not None:
+            d["peak_memory"] = self.peak_memory
+        return d
+
+
+class Instrumentation:
+    """
+    Collects statistics about an export: per-stage wall and CPU time, nodes
+    visited by every walker listener, files and bytes generated, and template
+    render counts.
+
+    Optionally also profiles the export with cProfile, and traces memory
+    allocations with tracemalloc. Both slow the export down noticeably, so
+    they are off by default.
+    """
+    # Number of entries kept from the profile and allocation reports
+    REPORT_LIMIT = 25
+
+    def __init__(self, profile: bool = False, trace_memory: bool = False) -> None:
+        self.profile = profile
+        self.trace_memory = trace_memory
+
+        # Stages, in the order they ran
+        self.stages: Dict[str, StageStats]
+        self.stages = {}
+
+        # Listener class name : nodes entered
+        self.nodes_visited: Dict[str, int]
+        self.nodes_visited = {}
+
+        # Everything else worth counting, by name
+        self.counters: Dict[str, int]
+        self.counters = {}
+
+        self.profiler: Optional[cProfile.Profile]
+        self.profiler = None
+        self.profile_report: List[Dict[str, Any]]
+        self.profile_report = []
+        self.allocation_report: List[Dict[str, Any]]
+        self.allocation_report = []
+
+        self.started_tracemalloc = False
+
+    def start(self) -> None:
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profile_report = self.get_profile_report(self.profiler)
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            self.allocation_report = [
+                {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:self.REPORT_LIMIT]
+            ]
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+                self.started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = StageStats(name)
+            self.stages[name] = stats
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.wall_time += time.perf_counter() - wall_start
+            stats.cpu_time += time.process_time() - cpu_start
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                stats.peak_memory = max(peak, stats.peak_memory or 0)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def track_listener(self, listener: RDLListener) -> None:
+        """
+        Counts the nodes the listener is called for, under its class name
+        """
+        name = type(listener).__name__
+        enter_component = listener.enter_Component
+        nodes_visited = self.nodes_visited
+        nodes_visited.setdefault(name, 0)
+
+        def counting_enter_component(node): # type: ignore
+            nodes_visited[name] += 1
+            return enter_component(node)
+
+        listener.enter_Component = counting_enter_component # type: ignore
+
+    def get_profile_report(self, profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.sort_stats("cumulative")
+        report = []
+        for func in stats.fcn_list[:self.REPORT_LIMIT]: # type: ignore
+            _, ncalls, tottime, cumtime, _ = stats.stats[func] # type: ignore
+            filename, line, funcname = func
+            report.append({
+                "function": f"{filename}:{line}({funcname})",
+                "calls": ncalls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            })
+        return report
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+            "total_wall_time": sum(s.wall_time for s in self.stages.values()),
+            "total_cpu_time": sum(s.cpu_time for s in self.stages.values()),
+            "nodes_visited": self.nodes_visited,
+            "counters": self.counters,
+        } # type: Dict[str, Any]
+        if self.profile:
+            d["profile"] = self.profile_report
+        if self.trace_memory:
+            d["allocations"] = self.allocation_report
+        return d
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def summary(self) -> str:
+        lines = ["Export statistics:"]
+        for name, stats in self.stages.items():
+            line = f"  {name:<12} {stats.wall_time * 1000:9.1f} ms wall {stats.cpu_time * 1000:9.1f} ms cpu"
+            if stats.peak_memory is not None:
+                line += f" {stats.peak_memory / 2**20:8.1f} MiB peak"
+            lines.append(line)
+        for name, n in self.nodes_visited.items():
+            lines.append(f"  {name} visited {n} nodes")
+        for name, n in self.counters.items():
+            lines.append(f"  {name}: {n}")
+        return "\n".join(lines)
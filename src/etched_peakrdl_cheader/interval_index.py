@@ -0,0 +1,140 @@
+from typing import List, Tuple, Iterator
+from array import array
+import bisect
+
+from systemrdl.node import AddressableNode
+
+
+class IntervalIndex:
+    """
+    Address intervals occupied by the addressable children of a block.
+
+    Intervals are kept sorted by offset, in compact parallel arrays, so that
+    address queries are answered with a binary search. Offsets are relative
+    to the block, and intervals cover a child's whole array footprint.
+    Children at the same offset keep their relative order in the block.
+
+    Intervals that contain an address are found in a segment tree of their
+    end addresses, which skips every subtree that ends before the address. A
+    query returning k intervals takes O((k + 1) log n), regardless of how
+    many earlier intervals span it.
+    """
+    def __init__(self, intervals: List[Tuple[int, int, int, str]]) -> None:
+        # intervals: (offset, size, child position, name)
+        intervals = sorted(intervals, key=lambda x: (x[0], x[2]))
+
+        self.offsets = array("Q", (offset for offset, _, _, _ in intervals))
+        self.ends = array("Q", (offset + size for offset, size, _, _ in intervals))
+
+        # Position of each interval's child among the block's addressable children
+        self.positions = array("L", (pos for _, _, pos, _ in intervals))
+        self.names = [name for _, _, _, name in intervals]
+
+        # Highest end address of all intervals up to and including each one
+        self.max_ends = array("Q")
+        max_end = 0
+        for end in self.ends:
+            max_end = max(max_end, end)
+            self.max_ends.append(max_end)
+
+        # Segment tree of the highest end address below each node. Node k has
+        # children 2k and 2k + 1, interval i is leaf leaf_base + i
+        self.leaf_base = 1
+        while self.leaf_base < len(self.ends):
+            self.leaf_base *= 2
+        self.tree_ends = array("Q", [0]) * (2 * self.leaf_base)
+        self.tree_ends[self.leaf_base:self.leaf_base + len(self.ends)] = self.ends
+        for k in range(self.leaf_base - 1, 0, -1):
+            self.tree_ends[k] = max(self.tree_ends[2 * k], self.tree_ends[2 * k + 1])
+
+    @classmethod
+    def from_node(cls, node: AddressableNode) -> 'IntervalIndex':
+        intervals = []
+        pos = 0
+        for child in node.children():
+            if not isinstance(child, AddressableNode):
+                continue
+            intervals.append((child.raw_address_offset, child.total_size, pos, child.inst_name))
+            pos += 1
+        return cls(intervals)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def end(self) -> int:
+        """
+        End of the highest interval
+        """
+        return self.max_ends[-1] if self.max_ends else 0
+
+    def find(self, addr: int) -> List[int]:
+        """
+        Returns the indexes of all intervals that contain addr
+        """
+        return self.ends_above(bisect.bisect_right(self.offsets, addr), addr)
+
+    def ends_above(self, count: int, addr: int) -> List[int]:
+        """
+        Returns the indexes of the intervals among the first count that end
+        beyond addr, in order
+        """
+        if not count or self.max_ends[count - 1] <= addr:
+            return []
+        found = []
+        # (node, first interval, number of leaves)
+        stack = [(1, 0, self.leaf_base)]
+        while stack:
+            node, first, size = stack.pop()
+            if first >= count or self.tree_ends[node] <= addr:
+                continue
+            if size == 1:
+                found.append(first)
+            else:
+                size //= 2
+                stack.append((2 * node + 1, first + size, size))
+                stack.append((2 * node, first, size))
+        return found
+
+    def at(self, addr: int) -> List[str]:
+        """
+        Returns the names of the children that occupy addr
+        """
+        return [self.names[i] for i in self.find(addr)]
+
+    def is_free(self, offset: int, size: int) -> bool:
+        """
+        Returns True if no interval overlaps [offset, offset + size)
+        """
+        i = bisect.bisect_left(self.offsets, offset + size) - 1
+        return i < 0 or self.max_ends[i] <= offset
+
+    def gap_before(self, i: int) -> int:
+        """
+        Size of the unoccupied space between interval i and the intervals
+        before it
+        """
+        prev_end = self.max_ends[i - 1] if i else 0
+        return max(self.offsets[i] - prev_end, 0)
+
+    def gaps(self, size: int) -> List[Tuple[int, int]]:
+        """
+        Returns the unoccupied (offset, size) ranges of a block of the given size
+        """
+        gaps = []
+        for i in range(len(self)):
+            gap = self.gap_before(i)
+            if gap:
+                gaps.append((self.offsets[i] - gap, gap))
+        if size > self.end:
+            gaps.append((self.end, size - self.end))
+        return gaps
+
+    def overlaps(self) -> Iterator[Tuple[int, int]]:
+        """
+        Yields all pairs of overlapping intervals (i, j), with i < j. The
+        pairs of each j are yielded from the closest i
+        """
+        for j in range(1, len(self)):
+            for i in reversed(self.ends_above(j, self.offsets[j])):
+                yield i, j
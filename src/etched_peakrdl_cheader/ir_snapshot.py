@@ -0,0 +1,145 @@
+from typing import Any, Dict, List, Optional, Set
+from array import array
+import hashlib
+import json
+import os
+import struct
+import sys
+
+from .design_ir import DesignIR
+from .output_files import file_hash
+from .__about__ import __version__
+
+
+MAGIC = b"RDLIRSNP"
+VERSION = 2
+
+# magic, version, metadata size
+HEADER = struct.Struct("<8sII")
+# Array record, after the attribute name: typecode, item count
+ARRAY_RECORD = struct.Struct("<1sQ")
+
+
+def encode_ir(ir: DesignIR) -> bytes:
+    """
+    Encodes the IR as a sequence of little-endian array records followed by
+    the string table. Plain data only, so that loading a snapshot never runs
+    any code from it.
+    """
+    chunks = []
+    for name, a in vars(ir).items():
+        if not isinstance(a, array):
+            continue
+        if sys.byteorder != "little":
+            a = array(a.typecode, a)
+            a.byteswap()
+        encoded_name = name.encode("ascii")
+        chunks.append(bytes([len(encoded_name)]) + encoded_name)
+        chunks.append(ARRAY_RECORD.pack(a.typecode.encode("ascii"), len(a)))
+        chunks.append(a.tobytes())
+    # Names cannot contain NUL
+    chunks.append("\0".join(ir.strings).encode("utf-8"))
+    return b"".join(chunks)
+
+
+def decode_ir(data: bytes, meta: Dict[str, Any]) -> DesignIR:
+    ir = DesignIR()
+    expected = {name: a.typecode for name, a in vars(ir).items() if isinstance(a, array)}
+
+    pos = 0
+    found = set() # type: Set[str]
+    while len(found) < len(expected):
+        name_size = data[pos]
+        name = data[pos + 1:pos + 1 + name_size].decode("ascii")
+        pos += 1 + name_size
+        typecode, count = ARRAY_RECORD.unpack_from(data, pos)
+        pos += ARRAY_RECORD.size
+        typecode = typecode.decode("ascii")
+        if expected.get(name) != typecode or name in found:
+            raise ValueError(f"Snapshot does not match this version of the IR: {name}")
+        a = getattr(ir, name)
+        size = count * a.itemsize
+        a.frombytes(data[pos:pos + size])
+        if sys.byteorder != "little":
+            a.byteswap()
+        pos += size
+        found.add(name)
+
+    ir.strings = data[pos:].decode("utf-8").split("\0")
+    ir.string_ids = {s: i for i, s in enumerate(ir.strings)}
+    ir.base_address = meta["base_address"]
+    ir.sources = list(meta["sources"])
+    return ir
+
+
+def save_snapshot(path: str, ir: DesignIR, inputs: List[str]) -> None:
+    """
+    Saves the IR to a snapshot file.
+
+    The snapshot records the hashes of the RDL files the design was compiled
+    from, and of any other inputs the IR depends on (directives), so that it
+    can be checked for staleness when it is loaded.
+    """
+    payload = encode_ir(ir)
+    meta = {
+        "generator_version": __version__,
+        "top": ir.strings[ir.names[0]] if len(ir) else "",
+        "base_address": ir.base_address,
+        "sources": ir.sources,
+        "input_hashes": {
+            p: file_hash(p)
+            for p in sorted(set(ir.sources) | set(os.path.abspath(p) for p in inputs if p))
+        },
+        "payload_size": len(payload),
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+    }
+    encoded_meta = json.dumps(meta, sort_keys=True).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded_meta)))
+        f.write(encoded_meta)
+        f.write(payload)
+
+
+def load_snapshot(path: str, check_inputs: bool = True) -> DesignIR:
+    """
+    Loads an IR snapshot.
+
+    Raises ValueError if the snapshot is corrupt, was written by another
+    version of the exporter, or, if check_inputs is set, if any of the files
+    it was built from changed since.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not an IR snapshot")
+    magic, version, meta_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an IR snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported IR snapshot version {version} in {path}")
+    meta = json.loads(data[HEADER.size:HEADER.size + meta_size].decode("utf-8"))
+    if meta["generator_version"] != __version__:
+        raise ValueError(
+            f"{path} was written by version {meta['generator_version']} of the exporter,"
+            f" not {__version__}"
+        )
+
+    payload = data[HEADER.size + meta_size:]
+    if (
+        len(payload) != meta["payload_size"]
+        or hashlib.sha256(payload).hexdigest() != meta["payload_sha256"]
+    ):
+        raise ValueError(f"{path} is corrupt")
+
+    if check_inputs:
+        changed = get_changed_inputs(meta["input_hashes"])
+        if changed:
+            raise ValueError(
+                f"{path} is out of date. Changed since it was saved: {', '.join(changed)}"
+            )
+    return decode_ir(payload, meta)
+
+
+def get_changed_inputs(input_hashes: Dict[str, Optional[str]]) -> List[str]:
+    return [p for p, h in input_hashes.items() if file_hash(p) != h]
@@ -0,0 +1,134 @@
+from typing import List, Optional
+
+from systemrdl.walker import RDLListener, WalkerAction
+from systemrdl.node import (
+    Node,
+    AddressableNode,
+    VectorNode,
+    FieldNode,
+    RegNode,
+    RegfileNode,
+    AddrmapNode,
+    MemNode,
+    SignalNode,
+)
+
+
+# Type-specific callback suffixes, in the same order RDLWalker checks them
+_TYPE_CALLBACKS = (
+    (FieldNode, "Field"),
+    (RegNode, "Reg"),
+    (RegfileNode, "Regfile"),
+    (AddrmapNode, "Addrmap"),
+    (MemNode, "Mem"),
+    (SignalNode, "Signal"),
+)
+
+# Marks a listener that requested StopNow. Never matches a real depth.
+_STOPPED = -1
+
+
+def _type_suffix(node: Node) -> Optional[str]:
+    for cls, suffix in _TYPE_CALLBACKS:
+        if isinstance(node, cls):
+            return suffix
+    return None
+
+
+def _dispatch_enter(listener: RDLListener, node: Node) -> WalkerAction:
+    # Most generic to most specific, same as RDLWalker.do_enter
+    action = listener.enter_Component(node) or WalkerAction.Continue
+    if action == WalkerAction.StopNow:
+        return action
+
+    new_action = WalkerAction.Continue
+    if isinstance(node, AddressableNode):
+        new_action = listener.enter_AddressableComponent(node) or WalkerAction.Continue
+    elif isinstance(node, VectorNode):
+        new_action = listener.enter_VectorComponent(node) or WalkerAction.Continue
+    action = max(new_action, action)
+    if action == WalkerAction.StopNow:
+        return action
+
+    suffix = _type_suffix(node)
+    if suffix is not None:
+        new_action = getattr(listener, "enter_" + suffix)(node) or WalkerAction.Continue
+        action = max(new_action, action)
+    return action
+
+
+def _dispatch_exit(listener: RDLListener, node: Node) -> WalkerAction:
+    # Most specific to most generic, same as RDLWalker.do_exit
+    action = WalkerAction.Continue
+    suffix = _type_suffix(node)
+    if suffix is not None:
+        action = getattr(listener, "exit_" + suffix)(node) or WalkerAction.Continue
+    if action == WalkerAction.StopNow:
+        return action
+
+    new_action = WalkerAction.Continue
+    if isinstance(node, AddressableNode):
+        new_action = listener.exit_AddressableComponent(node) or WalkerAction.Continue
+    elif isinstance(node, VectorNode):
+        new_action = listener.exit_VectorComponent(node) or WalkerAction.Continue
+    action = max(new_action, action)
+    if action == WalkerAction.StopNow:
+        return action
+
+    new_action = listener.exit_Component(node) or WalkerAction.Continue
+    return max(new_action, action)
+
+
+class MultiListener(RDLListener):
+    """
+    Drives several listeners from a single RDLWalker traversal.
+
+    Each listener keeps its own walker-action semantics: a listener that
+    returns SkipDescendants stops receiving callbacks for that node's
+    descendants (its exit callbacks for the node itself are still called),
+    while the other listeners continue to be driven. The walk itself is only
+    pruned once every listener has asked to skip.
+    """
+    def __init__(self, *listeners: RDLListener) -> None:
+        self.listeners = list(listeners)
+
+        # Depth at which each listener requested SkipDescendants, or None if
+        # the listener is currently active
+        self.skip_depth: List[Optional[int]]
+        self.skip_depth = [None] * len(self.listeners)
+
+        self.depth = 0
+
+    def enter_Component(self, node: Node) -> Optional[WalkerAction]:
+        for i, listener in enumerate(self.listeners):
+            if self.skip_depth[i] is not None:
+                continue
+            action = _dispatch_enter(listener, node)
+            if action == WalkerAction.StopNow:
+                self.skip_depth[i] = _STOPPED
+            elif action == WalkerAction.SkipDescendants:
+                self.skip_depth[i] = self.depth
+        self.depth += 1
+
+        if all(d is not None for d in self.skip_depth):
+            # Nobody is interested in this node's descendants
+            return WalkerAction.SkipDescendants
+        return WalkerAction.Continue
+
+    def exit_Component(self, node: Node) -> Optional[WalkerAction]:
+        self.depth -= 1
+        for i, listener in enumerate(self.listeners):
+            skip_depth = self.skip_depth[i]
+            if skip_depth is not None:
+                if skip_depth != self.depth:
+                    # Inside a skipped subtree, or stopped
+                    continue
+                # Leaving the node that requested the skip
+                self.skip_depth[i] = None
+            action = _dispatch_exit(listener, node)
+            if action == WalkerAction.StopNow:
+                self.skip_depth[i] = _STOPPED
+
+        if all(d == _STOPPED for d in self.skip_depth):
+            return WalkerAction.StopNow
+        return WalkerAction.Continue
@@ -0,0 +1,59 @@
+from typing import Callable, Dict, Tuple
+
+from systemrdl.node import Node
+
+
+class NamingCache:
+    """
+    Memoizes generated names (node prefixes, struct names, ...) so that each
+    name is only built once per export.
+
+    Entries are keyed by the identity of the root and node component
+    instances, so cached names must not depend on array indices.
+    Names that depend on a node's rebuild/unique state are stored in
+    directive-dependent tables which are dropped whenever those flags change.
+    """
+    def __init__(self) -> None:
+        # table name -> {(root inst id, node inst id) : name}
+        self.tables: Dict[str, Dict[Tuple[int, int], str]]
+        self.tables = {}
+
+        self.directive_dependent_tables = {"lib_prefix"}
+
+        self.hits: Dict[str, int]
+        self.hits = {}
+        self.misses: Dict[str, int]
+        self.misses = {}
+
+    def lookup(self, table: str, root_node: Node, node: Node, compute: Callable[[], str]) -> str:
+        entries = self.tables.setdefault(table, {})
+        key = (id(root_node.inst), id(node.inst))
+        name = entries.get(key)
+        if name is None:
+            self.misses[table] = self.misses.get(table, 0) + 1
+            name = compute()
+            entries[key] = name
+        else:
+            self.hits[table] = self.hits.get(table, 0) + 1
+        return name
+
+    def invalidate_directive_dependent(self) -> None:
+        """
+        Drop all names that were derived from a node's rebuild/unique state.
+        Must be called whenever directives change either flag.
+        """
+        for table in self.directive_dependent_tables:
+            self.tables.pop(table, None)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = sum(self.hits.values())
+        lookups = hits + sum(self.misses.values())
+        if not lookups:
+            return 0.0
+        return hits / lookups
+
+    def summary(self) -> str:
+        hits = sum(self.hits.values())
+        lookups = hits + sum(self.misses.values())
+        return f"{hits}/{lookups} name lookups served from cache ({self.hit_rate:.1%})"
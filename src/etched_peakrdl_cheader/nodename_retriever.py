@@ -3,7 +3,7 @@ from typing import Optional, Set
 from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
 from systemrdl.node import AddrmapNode, AddressableNode, RegNode, RegfileNode, FieldNode, Node, MemNode
 
-from .design_state import DesignState
+from .design_state import DesignState, AddrmapRecord
 from . import utils
 
 class NodenameRetriever(RDLListener):
@@ -22,9 +22,11 @@ class NodenameRetriever(RDLListener):
         return self.uniquenames
 
     def enter_Addrmap(self, node: AddrmapNode) -> Optional[WalkerAction]:
-        if(self.get_node_prefix(node) in self.names):
-            self.uniquenames.add(self.get_node_prefix(node))
-        self.names.add(self.get_node_prefix(node))
+        prefix = self.get_node_prefix(node)
+        self.ds.addrmap_records.append(AddrmapRecord(node, prefix))
+        if(prefix in self.names):
+            self.uniquenames.add(prefix)
+        self.names.add(prefix)
     
     def enter_Reg(self, node: RegNode) -> Optional[WalkerAction]:
         return WalkerAction.SkipDescendants
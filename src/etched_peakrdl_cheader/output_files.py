@@ -0,0 +1,150 @@
+from typing import Dict, List, Optional, Union
+import hashlib
+import json
+import os
+
+from .code_emitter import CodeEmitter
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return content_hash(f.read())
+    except FileNotFoundError:
+        return None
+
+
+class OutputFiles:
+    """
+    Collects all generated files in memory and writes them to the output
+    directory in one go.
+
+    In incremental mode, a manifest of what was written is kept in the output
+    directory. It records, for every generated file, the hash of the rendered
+    content and the hash of the file on disk after post-processing
+    (clang-format). A file is only rewritten if its rendered content differs
+    from the previous run or the file on disk no longer matches what was left
+    there, so a no-op regeneration touches no files at all. Other exports
+    leave nothing in the output directory besides the generated files.
+    """
+    MANIFEST_NAME = ".etched_peakrdl_cheader_manifest.json"
+    MANIFEST_VERSION = 1
+
+    def __init__(self, out_dir: str, incremental: bool = False) -> None:
+        self.out_dir = out_dir
+        self.incremental = incremental
+
+        # Generated files, by path relative to out_dir, in creation order
+        self.files: Dict[str, Union[CodeEmitter, bytes]]
+        self.files = {}
+
+        # name : {"rendered": hash, "written": hash}
+        self.manifest: Dict[str, Dict[str, str]]
+        self.manifest = {}
+        self.prev_manifest: Dict[str, Dict[str, str]]
+        self.prev_manifest = self.load_manifest()
+
+        # Files that were written by commit()
+        self.written: List[str]
+        self.written = []
+
+        # Size of all generated files, and of the ones written by commit()
+        self.rendered_bytes = 0
+        self.written_bytes = 0
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.out_dir, self.MANIFEST_NAME)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.out_dir, name)
+
+    def load_manifest(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if data.get("version") != self.MANIFEST_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def open(self, name: str) -> CodeEmitter:
+        """
+        Returns an in-memory buffer for the generated file 'name'
+        """
+        if name in self.files:
+            raise ValueError(f"Output file generated more than once: {name}")
+        buf = CodeEmitter()
+        self.files[name] = buf
+        return buf
+
+    def add_binary(self, name: str, data: bytes) -> None:
+        """
+        Adds the generated binary file 'name'
+        """
+        if name in self.files:
+            raise ValueError(f"Output file generated more than once: {name}")
+        self.files[name] = data
+
+    def is_unchanged(self, name: str, rendered_hash: str) -> bool:
+        prev = self.prev_manifest.get(name)
+        if prev is None or prev["rendered"] != rendered_hash:
+            return False
+        # Make sure nobody modified or removed the file since
+        return file_hash(self.path(name)) == prev["written"]
+
+    def commit(self) -> List[str]:
+        """
+        Writes out generated files, and returns the paths of the files that
+        were actually written
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        for name, buf in self.files.items():
+            if isinstance(buf, bytes):
+                data = buf
+            else:
+                data = buf.getvalue().encode("utf-8")
+            self.rendered_bytes += len(data)
+            rendered_hash = content_hash(data)
+            if self.incremental and self.is_unchanged(name, rendered_hash):
+                self.manifest[name] = self.prev_manifest[name]
+                continue
+            with open(self.path(name), "wb") as f:
+                f.write(data)
+            self.written_bytes += len(data)
+            self.manifest[name] = {"rendered": rendered_hash, "written": rendered_hash}
+            self.written.append(self.path(name))
+
+        if self.incremental:
+            # Remove files that a previous run generated but this one did not
+            for name in self.prev_manifest:
+                if name not in self.files and os.path.exists(self.path(name)):
+                    os.remove(self.path(name))
+        return self.written
+
+    def save_manifest(self) -> None:
+        """
+        Records the final state of the written files. Must be called after any
+        post-processing of the written files is done. Only incremental
+        exports keep a manifest
+        """
+        if not self.incremental:
+            return
+        written = set(self.written)
+        for name, entry in self.manifest.items():
+            path = self.path(name)
+            if path in written:
+                entry["written"] = file_hash(path) or ""
+
+        if self.manifest == self.prev_manifest and os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": self.MANIFEST_VERSION, "files": self.manifest},
+                f, indent=1, sort_keys=True
+            )
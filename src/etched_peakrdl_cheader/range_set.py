@@ -0,0 +1,96 @@
+from typing import Iterable, Iterator, Tuple
+from array import array
+import bisect
+
+
+class RangeSet:
+    """
+    Set of non-negative integers, such as the ignored elements of an array.
+
+    Members are kept as sorted, disjoint [start, end) ranges in compact
+    parallel arrays, so the size of the set is independent of how many
+    indexes its ranges span. Membership is a binary search, and adjacent or
+    overlapping ranges are merged as they are added.
+    """
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = ()) -> None:
+        self.starts = array("Q")
+        self.ends = array("Q")
+        for start, end in ranges:
+            self.add_range(start, end)
+
+    @classmethod
+    def from_indexes(cls, idxes: Iterable[int]) -> 'RangeSet':
+        rs = cls()
+        for i in sorted(set(idxes)):
+            if rs.ends and rs.ends[-1] == i:
+                rs.ends[-1] = i + 1
+            else:
+                rs.starts.append(i)
+                rs.ends.append(i + 1)
+        return rs
+
+    def add_range(self, start: int, end: int) -> None:
+        if start >= end:
+            return
+        # Ranges that overlap or touch [start, end) are merged into it
+        lo = bisect.bisect_left(self.ends, start)
+        hi = bisect.bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = array("Q", [start])
+        self.ends[lo:hi] = array("Q", [end])
+
+    def add(self, i: int) -> None:
+        self.add_range(i, i + 1)
+
+    def update(self, other: 'RangeSet') -> None:
+        for start, end in other.ranges():
+            self.add_range(start, end)
+
+    def ranges(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.starts, self.ends)
+
+    def complement(self, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields the ranges of [start, end) that are not in the set
+        """
+        k = bisect.bisect_right(self.ends, start)
+        pos = start
+        while k < len(self.starts) and self.starts[k] < end:
+            if self.starts[k] > pos:
+                yield pos, self.starts[k]
+            pos = max(pos, self.ends[k])
+            k += 1
+        if pos < end:
+            yield pos, end
+
+    def iter_complement(self, start: int, end: int) -> Iterator[int]:
+        """
+        Yields the integers of [start, end) that are not in the set, in order
+        """
+        for gap_start, gap_end in self.complement(start, end):
+            yield from range(gap_start, gap_end)
+
+    def __contains__(self, i: int) -> bool:
+        k = bisect.bisect_right(self.starts, i) - 1
+        return k >= 0 and i < self.ends[k]
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self.ranges():
+            yield from range(start, end)
+
+    def __len__(self) -> int:
+        return sum(end - start for start, end in self.ranges())
+
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, RangeSet):
+            return NotImplemented
+        return self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self) -> str:
+        ranges = ", ".join(f"{start}:{end}" for start, end in self.ranges())
+        return f"RangeSet([{ranges}])"
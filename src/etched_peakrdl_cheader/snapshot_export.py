@@ -0,0 +1,61 @@
+"""
+Generates output from an IR snapshot saved with --save-snapshot, without
+compiling the RDL.
+
+Usage:
+    python -m etched_peakrdl_cheader.snapshot_export SNAPSHOT -o OUTPUT [options]
+"""
+import argparse
+import sys
+
+from .exporter import CHeaderExporter
+from .export_options import ExportOptions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n", maxsplit=1)[0])
+    parser.add_argument("snapshot", help="IR snapshot file")
+    parser.add_argument("-o", "--output", required=True, help="Output directory")
+    parser.add_argument("--address-table", action="store_true",
+                        help="Also generate the reverse address lookup table")
+    parser.add_argument("--array-loops", action="store_true",
+                        help="Test the elements of arrays in a loop instead of one call each")
+    parser.add_argument("--table-tests", action="store_true",
+                        help="Generate table-driven read/write tests")
+    parser.add_argument("--global-test-idx", action="store_true",
+                        help="Give every test a globally unique test index")
+    parser.add_argument("--gen-jobs", type=int, default=1,
+                        help="Number of processes to render test libraries with")
+    parser.add_argument("--clang-format-style", default="", help="clang-format style file")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only rewrite files whose content changed")
+    parser.add_argument("--no-input-check", action="store_true",
+                        help="Do not check that the RDL and directives files are unchanged")
+    parser.add_argument("--stats", default="", help="Write export statistics to this JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    options = parser.parse_args()
+
+    export_options = ExportOptions()
+    export_options.clang_format_path = options.clang_format_style
+    export_options.incremental = options.incremental
+    export_options.gen_jobs = options.gen_jobs
+    export_options.address_table = options.address_table
+    export_options.array_loops = options.array_loops
+    export_options.table_tests = options.table_tests
+    export_options.global_test_idx = options.global_test_idx
+    export_options.stats_path = options.stats
+    export_options.verbose = options.verbose
+
+    try:
+        CHeaderExporter().export_snapshot(
+            options.snapshot,
+            options.output,
+            export_options,
+            check_inputs=not options.no_input_check,
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from typing import Dict, Optional
+import compileall
+import hashlib
+import os
+import re
+import sys
+
+import jinja2 as jj
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+# Records which template sources a precompiled template directory was built from
+STAMP_NAME = "templates.sha256"
+
+# Plain variable substitution, without filters or whitespace control
+SUBST_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Jinja's default syntax and output settings, in the order get_format_template
+# compares them. Templates can only be converted under these settings
+DEFAULT_SETTINGS = ("{{", "}}", "{%", "{#", None, None, None, False, "\n")
+
+# Environments shared by every export in this process, by precompiled
+# template directory
+_envs = {} # type: Dict[str, jj.Environment]
+
+
+def get_templates_fingerprint() -> str:
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(TEMPLATE_DIR)):
+        h.update(name.encode("utf-8") + b"\0")
+        with open(os.path.join(TEMPLATE_DIR, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def is_precompiled_current(precompiled_dir: str) -> bool:
+    try:
+        with open(os.path.join(precompiled_dir, STAMP_NAME), "r", encoding="utf-8") as f:
+            return f.read().strip() == get_templates_fingerprint()
+    except FileNotFoundError:
+        return False
+
+
+def create_jj_env(precompiled_dir: str = "") -> jj.Environment:
+    loader = jj.FileSystemLoader(TEMPLATE_DIR) # type: jj.BaseLoader
+    if precompiled_dir:
+        if is_precompiled_current(precompiled_dir):
+            # Fall back to the sources for anything that was not precompiled
+            loader = jj.ChoiceLoader([jj.ModuleLoader(precompiled_dir), loader])
+        else:
+            print(
+                f"Precompiled templates in {precompiled_dir} do not match the "
+                "template sources. Compiling templates from source instead"
+            )
+
+    # Templates ship with the package and do not change while it runs, so
+    # there is no need to check them for modifications on every lookup
+    return jj.Environment(
+        loader=loader,
+        undefined=jj.StrictUndefined,
+        auto_reload=False,
+    )
+
+
+def get_jj_env(precompiled_dir: str = "") -> jj.Environment:
+    """
+    Returns the process-wide jinja environment. Templates are compiled on
+    first use and stay cached in it for the lifetime of the process.
+    """
+    env = _envs.get(precompiled_dir)
+    if env is None:
+        env = create_jj_env(precompiled_dir)
+        _envs[precompiled_dir] = env
+    return env
+
+
+def get_format_template(jj_env: jj.Environment, name: str) -> Optional[str]:
+    """
+    Converts a template that only substitutes plain variables into an
+    equivalent str.format() pattern, which renders the same text at a fraction
+    of the cost. Returns None if the template needs jinja to be rendered.
+    """
+    settings = (
+        jj_env.variable_start_string, jj_env.variable_end_string,
+        jj_env.block_start_string, jj_env.comment_start_string,
+        jj_env.line_statement_prefix, jj_env.line_comment_prefix,
+        jj_env.finalize, jj_env.autoescape,
+        jj_env.newline_sequence,
+    )
+    if settings != DEFAULT_SETTINGS:
+        return None
+
+    with open(os.path.join(TEMPLATE_DIR, name), "r", encoding="utf-8", newline="") as f:
+        source = f.read()
+    if "\r" in source:
+        return None
+    # Jinja drops a single trailing newline
+    if source.endswith("\n") and not jj_env.keep_trailing_newline:
+        source = source[:-1]
+
+    parts = SUBST_RE.split(source)
+    literals = parts[0::2]
+    if any(("{{" in s) or ("{%" in s) or ("{#" in s) for s in literals):
+        return None
+
+    pattern = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            pattern.append("{" + part + "}")
+        else:
+            pattern.append(part.replace("{", "{{").replace("}", "}}"))
+    return "".join(pattern)
+
+
+def compile_templates(target_dir: str) -> None:
+    """
+    Compiles all templates to python modules, and their bytecode, in
+    target_dir so that they can be loaded without parsing the template sources
+    """
+    env = create_jj_env()
+    env.compile_templates(target_dir, zip=None, ignore_errors=False)
+    compileall.compile_dir(target_dir, quiet=1)
+    with open(os.path.join(target_dir, STAMP_NAME), "w", encoding="utf-8") as f:
+        f.write(get_templates_fingerprint() + "\n")
+
+
+if __name__ == "__main__":
+    compile_templates(sys.argv[1])
@@ -12,3 +12,6 @@ extern "C" {
 {%- if ds.std.static_assert_needs_assert_h %}
 #include <assert.h>
 {%- endif %}
+{%- for include in includes %}
+#include "{{include}}"
+{%- endfor %}
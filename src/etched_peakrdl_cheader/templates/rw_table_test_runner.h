@@ -0,0 +1,141 @@
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include "fw/app/csr_access_test/csr_test_ignorer.h"
+#include "fw/testing/bit_field_test.h"
+#include "fw/testing/testing.h"
+#include "fw/utils/csr_descriptor_helper.h"
+
+// Runs the read/write tests of table-driven test libraries. Each library
+// describes its registers and their fields with constant tables, which are
+// interpreted here.
+namespace rw_table_test {
+
+// How a field is tested
+enum FieldKind : uint8_t {
+  kWriteRead = 0,
+  kReadOnly = 1,
+  kWriteOnly = 2,
+  kSinglePulse = 3,
+};
+
+// Field of a register type
+struct Field {
+  // Index of the write-read test, ORed into the test index of the library
+  uint32_t test_idx;
+  uint16_t bw;
+  uint8_t bp;
+  uint8_t kind;
+};
+
+// Register element to test, with its fields as a range of the field table
+struct Reg {
+  // Byte offset from the block
+  uint64_t offset;
+  // Added to the test index of the block. Places the register's tests in
+  // the instance it belongs to when test indexes are global
+  uint64_t test_idx;
+  uint32_t first_field;
+  uint16_t n_fields;
+  // Register width in bits, 32 or 256
+  uint16_t width;
+};
+
+struct Csr32 {
+  using Ptr = volatile uint32_t*;
+  using Mask = uint32_t;
+  static Mask EmptyMask() { return 0; }
+  static bool WriteRead(Ptr addr, uint32_t bp, uint32_t bw) {
+    return fw::testing::BitFieldWriteReadTest32(addr, bp, bw);
+  }
+  static void AddBits(Mask* mask, uint32_t bp, uint32_t bw) {
+    fw::testing::AddBitsToMask32(mask, bp, bw);
+  }
+  static void ReadMasked(Ptr addr, Mask mask) { fw::testing::ReadCsrMasked32(addr, mask); }
+  static void WriteMasked(Ptr addr, Mask mask) { fw::testing::WriteCsrMasked32(addr, mask); }
+  static void WriteReadMasked(Ptr addr, Mask mask) {
+    fw::testing::WriteReadCsrMasked32(addr, mask);
+  }
+};
+
+struct Csr256 {
+  using Ptr = volatile __uint128_t*;
+  using Mask = fw::utils::Csr256BitValue;
+  static Mask EmptyMask() { return Mask{0, 0}; }
+  static bool WriteRead(Ptr addr, uint32_t bp, uint32_t bw) {
+    return fw::testing::BitFieldWriteReadTest256(addr, bp, bw);
+  }
+  static void AddBits(Mask* mask, uint32_t bp, uint32_t bw) {
+    fw::testing::AddBitsToMask256(mask, bp, bw);
+  }
+  static void ReadMasked(Ptr addr, Mask mask) { fw::testing::ReadCsrMasked256(addr, mask); }
+  static void WriteMasked(Ptr addr, Mask mask) { fw::testing::WriteCsrMasked256(addr, mask); }
+  static void WriteReadMasked(Ptr addr, Mask mask) {
+    fw::testing::WriteReadCsrMasked256(addr, mask);
+  }
+};
+
+template <typename Csr>
+bool RunReg(typename Csr::Ptr addr, const Field* fields, uint32_t n_fields, uint64_t test_idx) {
+  fw::app::csr_access_test::CsrTestIgnorer* ignorer =
+      fw::app::csr_access_test::CsrTestIgnorer::GetCsrTestIgnorer();
+  // Fields that are not write-read tested are checked together, by kind
+  typename Csr::Mask masks[4] = {
+      Csr::EmptyMask(), Csr::EmptyMask(), Csr::EmptyMask(), Csr::EmptyMask()};
+  bool has_mask[4] = {false, false, false, false};
+
+  for (uint32_t i = 0; i < n_fields; i++) {
+    const Field& field = fields[i];
+    if (field.kind != kWriteRead) {
+      Csr::AddBits(&masks[field.kind], field.bp, field.bw);
+      has_mask[field.kind] = true;
+      continue;
+    }
+    uint64_t curr_test_idx = test_idx | (uint64_t)field.test_idx;
+    if (!ignorer->ShouldSkipTestIndex(curr_test_idx) &&
+        !Csr::WriteRead(addr, field.bp, field.bw)) {
+      fw::testing::TestFail((uint64_t)0xDEAD000000000000 | curr_test_idx);
+      return false;
+    }
+  }
+
+  if (has_mask[kReadOnly]) {
+    Csr::ReadMasked(addr, masks[kReadOnly]);
+  }
+  if (has_mask[kWriteOnly]) {
+    Csr::WriteMasked(addr, masks[kWriteOnly]);
+  }
+  if (has_mask[kSinglePulse]) {
+    Csr::WriteReadMasked(addr, masks[kSinglePulse]);
+  }
+  return true;
+}
+
+// Tests n_regs registers of the block, in table order. Stops at the first
+// failure
+inline bool RunRegs(volatile void* block, const Reg* regs, uint32_t n_regs,
+                    const Field* fields, uint64_t test_idx) {
+  volatile uint8_t* base = static_cast<volatile uint8_t*>(block);
+  for (uint32_t i = 0; i < n_regs; i++) {
+    const Reg& reg = regs[i];
+    volatile uint8_t* addr = base + reg.offset;
+    const Field* reg_fields = fields + reg.first_field;
+    bool passed;
+    if (reg.width == 256) {
+      passed = RunReg<Csr256>(
+          reinterpret_cast<volatile __uint128_t*>(addr), reg_fields, reg.n_fields,
+          test_idx + reg.test_idx);
+    } else {
+      passed = RunReg<Csr32>(
+          reinterpret_cast<volatile uint32_t*>(addr), reg_fields, reg.n_fields,
+          test_idx + reg.test_idx);
+    }
+    if (!passed) {
+      return false;
+    }
+  }
+  return true;
+}
+
+}  // namespace rw_table_test
@@ -0,0 +1,4 @@
+#include <assert.h>
+#include <stddef.h>
+
+#include "{{header_filename}}"
@@ -2,14 +2,17 @@
 #include <stddef.h>
 
 #include "{{header_filename}}"
-
+{% if not ds.static_offset_tests %}
 static void test_offsets(void);
+{%- endif %}
 {%- if ds.generate_bitfields %}
 static void test_bitfields(void);
 {%- endif %}
 
 int main(void){
+{%- if not ds.static_offset_tests %}
     test_offsets();
+{%- endif %}
 {%- if ds.generate_bitfields %}
     test_bitfields();
 {%- endif %}
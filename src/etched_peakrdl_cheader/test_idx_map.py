@@ -0,0 +1,266 @@
+"""
+Decodes test indexes, and the failure codes of the read/write tests, to the
+field they test.
+
+Usage:
+    python -m etched_peakrdl_cheader.test_idx_map TEST_IDX_MAP.bin CODE...
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from array import array
+import struct
+import sys
+
+from .binary_table import BinaryTable
+from .csr_access_renderer import (
+    AddrmapRefItem,
+    BlockItem,
+    ChildItem,
+    MemItem,
+    RegfileItem,
+    RegItem,
+    LOCAL_IDX_BITS,
+)
+
+
+# Tests report failures as this marker ORed with the failing test index
+FAILURE_MARKER = 0xDEAD << 48
+
+
+class TestIdxMatch:
+    """
+    Result of a test index lookup
+    """
+    def __init__(self, block: str, path: str) -> None:
+        # Path of the addrmap instance whose test library holds the test
+        self.block = block
+        # Path of the field, with the array elements it was tested in
+        self.path = path
+
+    @property
+    def register(self) -> str:
+        return self.path.rsplit(".", 1)[0]
+
+    @property
+    def field(self) -> str:
+        return self.path.rsplit(".", 1)[1]
+
+    def __repr__(self) -> str:
+        return self.path
+
+
+class TestIdxMap(BinaryTable):
+    """
+    Map of the global test indexes of a design.
+
+    A test index is the id of the instance being tested, shifted left by
+    LOCAL_IDX_BITS, ORed with the index of the test in its test library.
+    Instances are addrmaps, regfiles and the elements of arrays, numbered in
+    pre-order. Parents add the id offset of every child instance to the test
+    index they pass it, so ids only depend on the structure of the test
+    libraries.
+
+    The map holds one entry per instance, in parallel arrays indexed by
+    instance id, and the tests of every library as a range of field paths
+    relative to the library's addrmap. Decoding an index is a direct lookup
+    in both.
+    """
+    NAME = "Test index map"
+    MAGIC = b"RDLTIDX\0"
+    VERSION = 1
+
+    # magic, version, reserved, instances, libraries, tests, string table size
+    HEADER = struct.Struct("<8sHHIIII")
+
+    ADDRMAP = 0x1
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Per instance. Parent instance, -1 for the top addrmap
+        self.parents = array("i")
+        # Offset of the path segment in the string table. The segment of the
+        # top addrmap is its full path
+        self.segments = array("I")
+        # Library of the instance's addrmap
+        self.libs = array("I")
+        self.flags = array("B")
+
+        # Per library. Tests, as a range of tests
+        self.first_tests = array("I")
+        self.n_tests = array("I")
+
+        # Per test. Offset in the string table of the path of the tested
+        # field, relative to the library's addrmap. Test i of a library has
+        # local index i + 1
+        self.tests = array("I")
+        # Number of instances below the addrmap that the test runs in
+        self.test_depths = array("B")
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    @classmethod
+    def from_work_list(
+        cls, work_list: List[Tuple[str, BlockItem]], idx_maps: List[List[Tuple[str, str]]]
+    ) -> 'TestIdxMap':
+        """
+        Builds the map of planned test libraries whose instance ids have been
+        assigned, from the test index map entries rendered for each of them
+        """
+        idx_map = cls()
+        libs = {} # type: Dict[str, int]
+        for lib, ((_, block), entries) in enumerate(zip(work_list, idx_maps)):
+            libs[block.namespace] = lib
+            depths = {} # type: Dict[str, int]
+            cls.get_test_depths(block.children, 0, depths)
+            idx_map.first_tests.append(len(idx_map.tests))
+            idx_map.n_tests.append(len(entries))
+            for _, rel_path in entries:
+                idx_map.tests.append(idx_map.intern(rel_path))
+                idx_map.test_depths.append(depths[rel_path])
+
+        blocks = {block.namespace: block for _, block in work_list}
+        top_path, top = work_list[0]
+        idx_map.add_instance(-1, top_path, 0, cls.ADDRMAP)
+        idx_map.add_children(0, top.children, 0, blocks, libs)
+        return idx_map
+
+    @classmethod
+    def get_test_depths(cls, children: Sequence[ChildItem], depth: int, depths: Dict[str, int]) -> None:
+        for child in children:
+            if isinstance(child, MemItem):
+                cls.get_test_depths(child.children, depth, depths)
+                continue
+            child_depth = depth + 1 if child.idx_stride else depth
+            if isinstance(child, RegfileItem):
+                cls.get_test_depths(child.children, child_depth, depths)
+            elif isinstance(child, RegItem):
+                for field in child.fields:
+                    if field.rel_path:
+                        depths[field.rel_path] = child_depth
+
+    def add_instance(self, parent: int, segment: str, lib: int, flags: int) -> None:
+        self.parents.append(parent)
+        self.segments.append(self.intern(segment))
+        self.libs.append(lib)
+        self.flags.append(flags)
+
+    def add_children(
+        self,
+        inst: int,
+        children: List[ChildItem],
+        lib: int,
+        blocks: Dict[str, BlockItem],
+        libs: Dict[str, int],
+    ) -> None:
+        for child in children:
+            if isinstance(child, MemItem) or not child.idx_stride:
+                continue
+            for i in range(child.dim):
+                child_inst = len(self)
+                if child_inst != inst + child.idx_offset + i * child.idx_stride:
+                    raise ValueError(f"Instance ids of {child.inst_name} are not in pre-order")
+                segment = f"{child.inst_name}[{i}]" if child.is_array else child.inst_name
+                if isinstance(child, AddrmapRefItem):
+                    child_lib = libs[child.namespace]
+                    self.add_instance(inst, segment, child_lib, self.ADDRMAP)
+                    self.add_children(
+                        child_inst, blocks[child.namespace].children, child_lib, blocks, libs
+                    )
+                else:
+                    self.add_instance(inst, segment, lib, 0)
+                    if isinstance(child, RegfileItem):
+                        self.add_children(child_inst, child.children, lib, blocks, libs)
+
+    #---------------------------------------------------------------------------
+    # Queries
+    #---------------------------------------------------------------------------
+    def lookup(self, code: int) -> Optional[TestIdxMatch]:
+        """
+        Returns the field tested by a test index, or by the failure code of a
+        test. Returns None if the index is not one of the design's tests
+        """
+        if code & ~((1 << 48) - 1) == FAILURE_MARKER:
+            code &= (1 << 48) - 1
+        inst = code >> LOCAL_IDX_BITS
+        local = code & ((1 << LOCAL_IDX_BITS) - 1)
+        if inst >= len(self):
+            return None
+        lib = self.libs[inst]
+        if not 1 <= local <= self.n_tests[lib]:
+            return None
+        test = self.first_tests[lib] + local - 1
+        rel_path = self.get_string(self.tests[test])
+
+        # Instances below the addrmap are the regfiles and array elements the
+        # field was tested in, which are the first segments of its path
+        # relative to the addrmap
+        elements = []
+        while not self.flags[inst] & self.ADDRMAP:
+            elements.append(self.get_string(self.segments[inst]))
+            inst = self.parents[inst]
+        elements.reverse()
+        # The test must run in the innermost instance of its field
+        if len(elements) != self.test_depths[test]:
+            return None
+        rel_segments = rel_path.split(".")
+        for element, segment in zip(elements, rel_segments):
+            if element.split("[")[0] != segment.split("[")[0]:
+                return None
+        block = self.get_path(inst)
+        path = ".".join([block] + elements + rel_segments[len(elements):])
+        return TestIdxMatch(block, path)
+
+    def get_path(self, inst: int) -> str:
+        segments = []
+        while inst >= 0:
+            segments.append(self.get_string(self.segments[inst]))
+            inst = self.parents[inst]
+        segments.reverse()
+        return ".".join(segments)
+
+    #---------------------------------------------------------------------------
+    # Serialization
+    #---------------------------------------------------------------------------
+    def get_arrays(self) -> List[array]:
+        return [
+            self.parents, self.segments, self.libs, self.flags,
+            self.first_tests, self.n_tests,
+            self.tests, self.test_depths,
+        ]
+
+    def pack_header(self) -> bytes:
+        return self.HEADER.pack(
+            self.MAGIC, self.VERSION, 0, len(self), len(self.first_tests),
+            len(self.tests), len(self.strings)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TestIdxMap':
+        if len(data) < cls.HEADER.size:
+            raise ValueError(f"{cls.NAME} is truncated")
+        (
+            magic, version, _, n_instances, n_libs, n_tests, strings_size
+        ) = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("Not a test index map")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported test index map version {version}")
+
+        idx_map = cls()
+        lengths = [n_instances] * 4 + [n_libs] * 2 + [n_tests] * 2
+        idx_map.read_arrays(data, cls.HEADER.size, lengths, strings_size)
+        return idx_map
+
+
+def main(argv: List[str]) -> None:
+    if len(argv) < 2:
+        sys.exit(f"Usage: {argv[0]} TEST_IDX_MAP.bin CODE...")
+    idx_map = TestIdxMap.load(argv[1])
+    for arg in argv[2:]:
+        code = int(arg, 0)
+        match = idx_map.lookup(code)
+        print(f"{code:#x}: {match if match is not None else 'unknown test index'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
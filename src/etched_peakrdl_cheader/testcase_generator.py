@@ -1,11 +1,15 @@
-from typing import List, TextIO, Set, Match
+from typing import Dict, List, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import os
-import re
+import subprocess
 
 from systemrdl.walker import RDLListener, RDLWalker
 from systemrdl.node import AddrmapNode, RegNode, AddressableNode
 
 from .design_state import DesignState
+from .c_standards import CStandard
+from .code_emitter import CodeEmitter
 from . import utils
 from .identifier_filter import kw_filter as kwf
 
@@ -14,142 +18,353 @@ class TestcaseGenerator:
     def __init__(self, ds: DesignState) -> None:
         self.ds = ds
 
-    def run(self, header_path: str, top_nodes: List[AddrmapNode]) -> None:
-        testcase_path = header_path + "_accesstest.c"
-        with open(testcase_path, "w", encoding="utf-8") as f:
-            context = {
-                "ds": self.ds,
-                "header_filename": f"{os.path.basename(header_path)}.h",
-            }
-
-            # Stream header via jinja
-            template = self.ds.jj_env.get_template("test_header.c")
-            template.stream(context).dump(f)
-            f.write("\n\n")
+    def run(self, header_path: str, top_nodes: List[AddrmapNode]) -> List[str]:
+        """
+        Writes the testcase for the header, and returns the paths of the C
+        files it consists of.
 
+        The first file holds main(). Static offset checks are split into
+        additional translation units if ds.testcase_chunk_size is set
+        """
+        testcase_path = header_path + "_accesstest.c"
+        f = CodeEmitter()
+        context = {
+            "ds": self.ds,
+            "header_filename": f"{os.path.basename(header_path)}.h",
+        }
+
+        # Stream header via jinja
+        template = self.ds.jj_env.get_template("test_header.c")
+        f.writelines(template.stream(context))
+        f.write("\n\n")
+
+        chunks = [] # type: List[CodeEmitter]
+        if not self.ds.static_offset_tests:
             OffsetTestsGenerator(self.ds).run(f, top_nodes)
+        elif self.ds.testcase_chunk_size:
+            chunks = OffsetTestsGenerator(self.ds).run_static(top_nodes)
+        else:
+            f.writelines(OffsetTestsGenerator(self.ds).run_static(top_nodes)[0].chunks)
 
-            if self.ds.generate_bitfields:
-                f.write("\n")
-                BitfieldTestsGenerator(self.ds).run(f, top_nodes)
-
+        if self.ds.generate_bitfields:
+            f.write("\n")
+            BitfieldTestsGenerator(self.ds).run(f, top_nodes)
+
+        # Write out the whole testcase file at once
+        with open(testcase_path, "w", encoding="utf-8") as fp:
+            f.flush_to(fp)
+        paths = [testcase_path]
+
+        chunk_template = self.ds.jj_env.get_template("test_chunk.c")
+        for i, chunk in enumerate(chunks):
+            path = f"{header_path}_accesstest_offsets{i}.c"
+            with open(path, "w", encoding="utf-8") as fp:
+                fp.writelines(chunk_template.stream(context))
+                fp.write("\n\n")
+                chunk.flush_to(fp)
+            paths.append(path)
+        return paths
+
+
+class CompileResult:
+    def __init__(self, path: str, returncode: int, output: str) -> None:
+        self.path = path
+        self.returncode = returncode
+        self.output = output
+
+
+def compile_testcase(
+    paths: List[str],
+    std: CStandard,
+    compiler: str = "gcc",
+    jobs: Optional[int] = None,
+    syntax_only: bool = False,
+) -> List[CompileResult]:
+    """
+    Compiles each of the testcase's C files to an object file next to it,
+    concurrently. If syntax_only is set, files are only checked, which is
+    all that static offset tests need.
+    """
+    def compile_file(path: str) -> CompileResult:
+        cmd = [compiler, f"-std={std.value}", "-c", path]
+        if syntax_only:
+            cmd.append("-fsyntax-only")
+        else:
+            cmd += ["-o", os.path.splitext(path)[0] + ".o"]
+        ret = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+        return CompileResult(path, ret.returncode, ret.stdout.decode("utf-8", errors="replace"))
+
+    if not paths:
+        return []
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        return list(pool.map(compile_file, paths))
+
+
+class ChildLayout:
+    """
+    What the offset tests need to know about an addressable child of a block.
+    Shared by every element of the block.
+    """
+    def __init__(self, node: AddressableNode, member: str) -> None:
+        self.node = node
+        self.is_reg = isinstance(node, RegNode)
+        # Member name of the child within the block's struct, without array
+        # suffixes. Registers of an overlapping pair are nested in the pair's
+        # struct if anonymous unions are not supported
+        self.member = member
+        self.offset = node.raw_address_offset
+        self.dims = node.array_dimensions if node.is_array else []
+        self.stride = node.array_stride if node.is_array else node.size
+        self.regwidth = node.get_property("regwidth") if self.is_reg else 0
+
+
+class OffsetTestsGenerator:
+    """
+    Generates assertions that check the offset of every register in the
+    header's structs.
+
+    Registers are enumerated from the non-unrolled register model. Array
+    elements are expanded arithmetically, from the array's stride, rather
+    than by unrolling the model, which would create a node for every element
+    of every array. How arrays are checked depends on ds.offset_test_mode:
+        full:   Every element is checked
+        loop:   Arrays are checked with C loops over their elements
+        sample: Only the first and last index of every array dimension
+                is checked
+
+    If ds.static_offset_tests is set, offsets are checked with static_assert
+    instead, so that the testcase only needs to compile. See run_static()
+    """
+    MODES = ("full", "loop", "sample")
 
-class OffsetTestsGenerator(RDLListener):
     def __init__(self, ds: DesignState) -> None:
         self.ds = ds
 
-        self.indent_level = 0
-
         self.root_node: AddrmapNode
         self.root_node = None
 
         self.root_struct_name: str
         self.root_struct_name = ""
 
-        self.f: TextIO
+        self.f: CodeEmitter
         self.f = None  # type: ignore
 
-        self.overlap_pair_stack: List[List[str]]
-        self.overlap_pair_stack = []
+        self.mode = ds.offset_test_mode
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown offset test mode: {self.mode}")
+
+        self.static = ds.static_offset_tests
+        if self.static:
+            if not ds.std.static_assert:
+                raise ValueError(
+                    f"Static offset tests need static_assert, which {ds.std.value} does not have"
+                )
+            if self.mode == "loop":
+                # Loop indexes are not constant expressions
+                raise ValueError("Loop offset tests cannot be checked with static_assert")
+
+        # Static checks, split into chunks of at most chunk_size checks
+        self.chunks: List[CodeEmitter]
+        self.chunks = []
+        self.chunk_size = ds.testcase_chunk_size
+        self.n_chunk_checks = 0
 
-    def run(self, f: TextIO, top_nodes: List[AddrmapNode]) -> None:
+        # Child layouts of every block, by id of the block's component instance
+        self.layouts: Dict[int, List[ChildLayout]]
+        self.layouts = {}
+
+        # Number of loop index variables in scope
+        self.n_loop_vars = 0
+
+    def run(self, f: CodeEmitter, top_nodes: List[AddrmapNode]) -> None:
         self.f = f
 
         f.write("static void test_offsets(void){\n")
         self.push_indent()
         for node in top_nodes:
-            node.zero_lineage_index()
             self.root_node = node
             self.root_struct_name = utils.get_struct_name(self.ds, node, node)
-            RDLWalker(unroll=True).walk(node, self)
+            self.check_block(node, "", 0, "")
         self.pop_indent()
         f.write("}\n")
 
+    def run_static(self, top_nodes: List[AddrmapNode]) -> List[CodeEmitter]:
+        """
+        Generates the offset checks as file scope static_asserts.
+
+        Returns the checks split into chunks of at most ds.testcase_chunk_size
+        checks each, or all of them in a single chunk if it is 0
+        """
+        self.new_chunk()
+        for node in top_nodes:
+            self.root_node = node
+            self.root_struct_name = utils.get_struct_name(self.ds, node, node)
+            self.check_block(node, "", 0, "")
+        return self.chunks
+
+    def new_chunk(self) -> None:
+        self.f = CodeEmitter()
+        self.chunks.append(self.f)
+        self.n_chunk_checks = 0
+
     def push_indent(self) -> None:
-        self.indent_level += 1
+        self.f.push_indent()
 
     def pop_indent(self) -> None:
-        self.indent_level -= 1
+        self.f.pop_indent()
 
     def write(self, s: str) -> None:
-        if self.indent_level:
-            self.f.write("    " * self.indent_level)
-        self.f.write(s)
-
-    def enter_AddressableComponent(self, node: AddressableNode) -> None:
-        if isinstance(node, RegNode):
-            return
-        self.overlap_pair_stack.append([])
+        self.f.emit(s)
 
-    def exit_AddressableComponent(self, node: AddressableNode) -> None:
-        if isinstance(node, RegNode):
-            return
-        self.overlap_pair_stack.pop()
+    def get_layout(self, node: AddressableNode) -> List[ChildLayout]:
+        layout = self.layouts.get(id(node.inst))
+        if layout is not None:
+            return layout
 
-    def enter_Reg(self, node: RegNode) -> None:
         # Keep track of overlapping register pairs
-        overlap_neighbor = self.ds.overlapping_reg_pairs.get(
-            node.get_path(array_suffix="[]"), None
-        )
-        if overlap_neighbor:
-            overlap_pair = [node.inst_name, overlap_neighbor]
-            self.overlap_pair_stack[-1] = overlap_pair
-        else:
-            overlap_pair = self.overlap_pair_stack[-1]
-
-        # If anonymous unions are not supported, then register pairs will be
-        # wrapped in a nested hierarchy
-        if not self.ds.std.anon_unions and node.inst_name in overlap_pair:
-            member = node.parent.get_rel_path(self.root_node)
-            if member:
-                member += "."
-            member += f"{'_'.join(overlap_pair)}.{node.get_path_segment()}"
-        else:
-            member = node.get_rel_path(self.root_node)
+        layout = []
+        overlap_pair = [] # type: List[str]
+        for child in node.children():
+            if not isinstance(child, AddressableNode):
+                continue
+            member = kwf(child.inst_name)
+            if isinstance(child, RegNode):
+                overlap_neighbor = self.ds.overlapping_reg_pairs.get(child.get_path(), None)
+                if overlap_neighbor:
+                    overlap_pair = [child.inst_name, overlap_neighbor]
+
+                # If anonymous unions are not supported, then register pairs will be
+                # wrapped in a nested hierarchy
+                if not self.ds.std.anon_unions and child.inst_name in overlap_pair:
+                    member = f"{kwf('_'.join(overlap_pair))}.{member}"
+            layout.append(ChildLayout(child, member))
+        self.layouts[id(node.inst)] = layout
+        return layout
+
+    def check_block(self, node: AddressableNode, member: str, addr: int, addr_terms: str) -> None:
+        """
+        Checks the registers within one element of a block.
+
+        member is the path of the element within the root struct. The element
+        is at address addr plus addr_terms, a sum of loop index terms in loop
+        mode, relative to the root.
+        """
+        if member:
+            member += "."
+        for child in self.get_layout(node):
+            if not child.dims:
+                self.check_element(child, member + child.member, addr + child.offset, addr_terms)
+            elif self.mode == "loop":
+                self.check_array_loop(child, member, addr, addr_terms)
+            else:
+                self.check_array(child, member, addr, addr_terms)
 
-        # Sanitize keywords
-        def kwrepl(m: Match) -> str:
-            return kwf(m.group(0))
+    def check_array(self, child: ChildLayout, member: str, addr: int, addr_terms: str) -> None:
+        if self.mode == "sample":
+            idx_ranges = [sorted({0, dim - 1}) for dim in child.dims]
+        else:
+            idx_ranges = [range(dim) for dim in child.dims]
+
+        # Stride of each dimension
+        strides = []
+        stride = child.stride
+        for dim in reversed(child.dims):
+            strides.append(stride)
+            stride *= dim
+        strides.reverse()
+
+        # Elements are generated lazily, in the order the model unrolls them
+        for idxes in itertools.product(*idx_ranges):
+            element_addr = addr + child.offset
+            suffix = ""
+            for idx, stride in zip(idxes, strides):
+                element_addr += idx * stride
+                suffix += f"[{idx}]"
+            self.check_element(child, member + child.member + suffix, element_addr, addr_terms)
+
+    def check_array_loop(
+        self, child: ChildLayout, member: str, addr: int, addr_terms: str
+    ) -> None:
+        loop_vars = [f"i{self.n_loop_vars + i}" for i in range(len(child.dims))]
+        self.n_loop_vars += len(loop_vars)
+
+        # Declared at the start of a block, for C89
+        self.write("{\n")
+        self.push_indent()
+        self.write(f"size_t {', '.join(loop_vars)};\n")
+        stride = child.stride
+        suffix = ""
+        terms = []
+        for var, dim in zip(reversed(loop_vars), reversed(child.dims)):
+            terms.append(f" + {var} * {stride:#x}UL")
+            stride *= dim
+        for var, dim in zip(loop_vars, child.dims):
+            self.write(f"for ({var} = 0; {var} < {dim}; {var}++) {{\n")
+            self.push_indent()
+            suffix += f"[{var}]"
+        addr_terms += "".join(reversed(terms))
+
+        self.check_element(child, member + child.member + suffix, addr + child.offset, addr_terms)
+
+        for _ in loop_vars:
+            self.pop_indent()
+            self.write("}\n")
+        self.pop_indent()
+        self.write("}\n")
+        self.n_loop_vars -= len(loop_vars)
 
-        member = re.sub(r"\w+", kwrepl, member)
+    def check_element(self, child: ChildLayout, member: str, addr: int, addr_terms: str) -> None:
+        if not child.is_reg:
+            self.check_block(child.node, member, addr, addr_terms)
+            return
 
         if self.ds.generate_bitfields:
             # Reg is defined as a bitfield union. Access entire word member
             member += ".w"
 
-        regwidth = node.get_property("regwidth")
-        node_addr = node.absolute_address - self.root_node.absolute_address
-        if regwidth > 64:
+        if child.regwidth > 64:
             # Reg is split into an array of subwords
-            n_subwords = regwidth // self.ds.wide_reg_subword_size
+            n_subwords = child.regwidth // self.ds.wide_reg_subword_size
             stride = self.ds.wide_reg_subword_size // 8
             for i in range(n_subwords):
-                addr = f"{node_addr + i * stride:#x}UL"
-                self.write(
-                    f"assert(offsetof({self.root_struct_name}, {member}[{i}]) == {addr});\n"
-                )
+                self.write_assert(f"{member}[{i}]", addr + i * stride, addr_terms)
+        else:
+            self.write_assert(member, addr, addr_terms)
+
+    def write_assert(self, member: str, addr: int, addr_terms: str) -> None:
+        if addr_terms:
+            addr_expr = f"({addr:#x}UL{addr_terms})"
         else:
-            self.write(
-                f"assert(offsetof({self.root_struct_name}, {member}) == {node_addr:#x}UL);\n"
-            )
+            addr_expr = f"{addr:#x}UL"
+
+        if not self.static:
+            self.write(f"assert(offsetof({self.root_struct_name}, {member}) == {addr_expr});\n")
+            return
+
+        if self.chunk_size and self.n_chunk_checks == self.chunk_size:
+            self.new_chunk()
+        self.n_chunk_checks += 1
+        self.write(
+            f"static_assert(offsetof({self.root_struct_name}, {member}) == {addr_expr},"
+            f" \"Offset error\");\n"
+        )
 
 
 class BitfieldTestsGenerator(RDLListener):
     def __init__(self, ds: DesignState) -> None:
         self.ds = ds
 
-        self.indent_level = 0
-
         self.defined_namespace: Set[str]
         self.defined_namespace = set()
 
         self.root_node: AddrmapNode
         self.root_node = None
 
-        self.f: TextIO
+        self.f: CodeEmitter
         self.f = None  # type: ignore
 
-    def run(self, f: TextIO, top_nodes: List[AddrmapNode]) -> None:
+    def run(self, f: CodeEmitter, top_nodes: List[AddrmapNode]) -> None:
         self.f = f
 
         f.write("static void test_bitfields(void){\n")
@@ -161,15 +376,13 @@ class BitfieldTestsGenerator(RDLListener):
         f.write("}\n")
 
     def push_indent(self) -> None:
-        self.indent_level += 1
+        self.f.push_indent()
 
     def pop_indent(self) -> None:
-        self.indent_level -= 1
+        self.f.pop_indent()
 
     def write(self, s: str) -> None:
-        if self.indent_level:
-            self.f.write("    " * self.indent_level)
-        self.f.write(s)
+        self.f.emit(s)
 
     def enter_Reg(self, node: RegNode) -> None:
         union_name = utils.get_struct_name(self.ds, self.root_node, node)
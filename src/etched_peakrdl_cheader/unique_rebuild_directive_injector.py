@@ -1,9 +1,9 @@
-from typing import Optional, Set
+from typing import Optional, Set, List
 
 from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
 from systemrdl.node import AddrmapNode, AddressableNode, RegNode, RegfileNode, FieldNode, Node, MemNode
 
-from .design_state import DesignState
+from .design_state import DesignState, AddrmapRecord
 from . import utils
 
 class UniqueRebuildDirectiveInjector(RDLListener):
@@ -20,23 +20,35 @@ class UniqueRebuildDirectiveInjector(RDLListener):
         self.names = names
         RDLWalker().walk(root_node, self)
 
+    def run_records(self, records: List[AddrmapRecord], names: Set[str]) -> None:
+        # Same as run(), but reuses the addrmaps and prefixes already collected
+        # by the analysis walk instead of walking the tree again
+        self.names = names
+        for record in records:
+            self.inject(record.node, record.prefix)
+
     def get_node_prefix(self, node: AddressableNode) -> str:
         return utils.get_node_prefix(self.ds, self.root_node, node)
 
     def enter_Addrmap(self, node: AddrmapNode) -> Optional[WalkerAction]:
-        if(self.get_node_prefix(node) in self.names):
+        self.inject(node, self.get_node_prefix(node))
+        return WalkerAction.Continue
+
+    def inject(self, node: AddrmapNode, prefix: str) -> None:
+        if(prefix in self.names):
             node.set_unique(False)
+            self.ds.naming.invalidate_directive_dependent()
         else:
-            return WalkerAction.Continue
+            return
         childstk = list(node.children())
         while childstk:
             child = childstk.pop(0)
             if(child.ignore):
                 node.set_rebuild(True)
-                return WalkerAction.Continue
+                self.ds.naming.invalidate_directive_dependent()
+                return
             if type(child) is RegfileNode:
                 childstk = list(child.children()) + childstk
-        return WalkerAction.Continue
 
     def enter_Reg(self, node: RegNode) -> Optional[WalkerAction]:
         return WalkerAction.SkipDescendants
@@ -3,6 +3,13 @@ from .design_state import DesignState
 from .identifier_filter import kw_filter as kwf
 
 def get_node_prefix(ds: DesignState, root_node: AddrmapNode, node: AddressableNode) -> str:
+    return ds.naming.lookup(
+        "node_prefix", root_node, node,
+        lambda: _build_node_prefix(ds, root_node, node)
+    )
+
+
+def _build_node_prefix(ds: DesignState, root_node: AddrmapNode, node: AddressableNode) -> str:
     if ds.reuse_typedefs:
         prefix = node.get_global_type_name("__")
         if prefix is None:
@@ -25,6 +32,13 @@ def get_node_prefix(ds: DesignState, root_node: AddrmapNode, node: AddressableNo
 
 
 def get_struct_name(ds: DesignState, root_node: AddrmapNode, node: AddressableNode) -> str:
+    return ds.naming.lookup(
+        "struct_name", root_node, node,
+        lambda: _build_struct_name(ds, root_node, node)
+    )
+
+
+def _build_struct_name(ds: DesignState, root_node: AddrmapNode, node: AddressableNode) -> str:
     if node.is_array and node.array_stride > node.size:
         # Stride is larger than size of actual element.
         # Struct will be padded up, and therefore needs a unique name
@@ -35,19 +49,57 @@ def get_struct_name(ds: DesignState, root_node: AddrmapNode, node: AddressableNo
     return get_node_prefix(ds, root_node, node) + pad_suffix + "_t"
 
 
+def get_lib_prefix(ds: DesignState, root_node: AddrmapNode, node: AddrmapNode) -> str:
+    """
+    Returns the prefix of an addrmap's test library
+    """
+    # Addrmaps that are custom rebuilt based on directives differ from the base
+    # version, and are prefixed so that they do not collide with it.
+    # Note: Changed from using rebuild as flag for rebuild to !unique,
+    # ensuring no repeats unless in array
+    return ds.naming.lookup(
+        "lib_prefix", node, node, lambda: _build_lib_prefix(ds, root_node, node)
+    )
+
+
+def _build_lib_prefix(ds: DesignState, root_node: AddrmapNode, node: AddrmapNode) -> str:
+    if node.rebuild:
+        root = node
+        while root.rebuild:
+            root = root.parent
+        return (
+            get_node_prefix(ds, root_node, root)
+            + "_"
+            + node.get_rel_path(
+                root, hier_separator="_", array_suffix="", empty_array_suffix=""
+            )
+        )
+    else:
+        return get_node_prefix(ds, node, node)
+
+
 def get_friendly_name(ds: DesignState, root_node: AddrmapNode, node: Node) -> str:
     """
     Returns a useful string that helps identify the typedef in
     a comment
     """
+    return ds.naming.lookup(
+        "friendly_name", root_node, node,
+        lambda: _build_friendly_name(ds, root_node, node)
+    )
+
+
+def _build_friendly_name(ds: DesignState, root_node: AddrmapNode, node: Node) -> str:
+    # Array indices are left out so that the name is the same for every
+    # element of an unrolled array, which allows it to be cached per instance
     if ds.reuse_typedefs:
         friendly_name = node.get_global_type_name("::")
 
         if friendly_name is None:
             # Unable to determine a reusable type name. Fall back to hierarchical path
-            friendly_name = node.get_rel_path(root_node.parent)
+            friendly_name = node.get_rel_path(root_node.parent, array_suffix="[]")
     else:
-        friendly_name = node.get_rel_path(root_node.parent)
+        friendly_name = node.get_rel_path(root_node.parent, array_suffix="[]")
 
     return type(node.inst).__name__ + " - " + friendly_name
 
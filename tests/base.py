@@ -1,12 +1,16 @@
 from unittest import TestCase
+from concurrent.futures import Future
 import os
-import subprocess
 from itertools import product
 
-from systemrdl import RDLCompiler
-from etched_peakrdl_cheader.exporter import CHeaderExporter
 from etched_peakrdl_cheader.c_standards import CStandard
 
+from matrix_runner import MatrixRunner, EXPORT_PARAMS
+
+
+# Shared by all test cases in this process
+runner = MatrixRunner()
+
 
 def get_permutations(spec):
     param_list = []
@@ -50,55 +54,64 @@ class BaseHeaderTestcase(TestCase):
                     continue
                 f.write(f"{k}: {repr(v)}\n")
 
-    def do_export(self):
-        os.makedirs(self.output_dir, exist_ok=True)
+    @classmethod
+    def get_params(cls) -> dict:
+        params = {k: getattr(cls, k) for k in EXPORT_PARAMS}
+        params["rdl_file"] = os.path.join(os.path.dirname(__file__), cls.rdl_file)
+        return params
 
-        rdl_path = os.path.join(os.path.dirname(__file__), self.rdl_file)
-
-        rdlc = RDLCompiler()
-        rdlc.compile_file(rdl_path)
-        top_node = rdlc.elaborate()
-
-        x = CHeaderExporter()
-        x.export(
-            top_node,
-            path=os.path.join(self.output_dir, "out.h"),
-            std=self.std,
-            generate_bitfields=self.generate_bitfields,
-            bitfield_order_ltoh=self.bitfield_order_ltoh,
-            reuse_typedefs=self.reuse_typedefs,
-            wide_reg_subword_size=self.wide_reg_subword_size,
-            explode_top=self.explode_top,
-            instantiate=self.instantiate,
-            inst_offset=0,
-            testcase=True,
-        )
+    @classmethod
+    def submit(cls, run: bool) -> Future:
+        return runner.submit(cls.__name__, cls.get_params(), cls.get_run_dir(), run)
 
+    def do_export(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        runner.export(type(self).__name__, self.get_params(), self.output_dir)
         self._write_params()
 
+    def check_build(self, run: bool):
+        result = self.submit(run).result()
+        print(result.output)
+        self.assertEqual(result.returncode, 0)
+
     def do_compile(self):
-        args = [
-            "gcc",
-            "--std", self.std.value,
-            os.path.join(self.output_dir, "out.h.test.c"),
-            "-o", os.path.join(self.output_dir, "test.exe"),
-        ]
-        ret = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        print(" ".join(args))
-        print(ret.stdout.decode('utf-8'))
-        self.assertEqual(ret.returncode, 0)
+        self.check_build(run=False)
 
     def do_run(self):
-        args = [os.path.join(self.output_dir, "test.exe")]
-        ret = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        print(" ".join(args))
-        print(ret.stdout.decode('utf-8'))
-        self.assertEqual(ret.returncode, 0)
+        self.check_build(run=True)
 
     def do_test(self):
         self.do_export()
-        self.do_compile()
-        self.do_run()
+        self.check_build(run=True)
+
+
+def prefetch(namespace: dict) -> None:
+    """
+    Exports every test case in namespace, and schedules their compile and run
+    up front so that they run concurrently. Call from setUpModule()
+    """
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        # Cases are already spread over worker processes
+        return
+    for cls in namespace.values():
+        if not (isinstance(cls, type) and issubclass(cls, BaseHeaderTestcase)):
+            continue
+        # parameterized_class strips the tests from the classes it expands
+        if any(name.startswith("test") for name in dir(cls)):
+            os.makedirs(cls.get_run_dir(), exist_ok=True)
+            cls.submit(run=True)
+
+
+def write_timing_report() -> None:
+    """
+    Writes the export/compile/run time of every case run so far in this
+    process. Call from tearDownModule()
+    """
+    name = "timing.txt"
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        name = f"timing_{worker}.txt"
+    runner.write_report(os.path.join(os.path.dirname(__file__), "test.out", name))
 
 
 ALL_CSTDS = set(CStandard)
@@ -0,0 +1,262 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import os
+import subprocess
+import threading
+import time
+
+from systemrdl import RDLCompiler
+from systemrdl.node import AddrmapNode, AddressableNode, RegNode
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.design_scanner import DesignScanner
+from etched_peakrdl_cheader.header_generator import HeaderGenerator
+from etched_peakrdl_cheader.testcase_generator import TestcaseGenerator
+
+
+# Parameters of a test case that affect the exported files
+EXPORT_PARAMS = (
+    "rdl_file",
+    "std",
+    "generate_bitfields",
+    "bitfield_order_ltoh",
+    "reuse_typedefs",
+    "wide_reg_subword_size",
+    "explode_top",
+    "instantiate",
+)
+
+
+class Export:
+    def __init__(
+        self, name: str, out_dir: str, files: List[str], digest: str, elapsed: float
+    ) -> None:
+        # Case that exported it
+        self.name = name
+        self.out_dir = out_dir
+        # C files of the testcase, relative to out_dir
+        self.files = files
+        # Hash of the exported files and of the C standard they are compiled with
+        self.digest = digest
+        self.elapsed = elapsed
+
+
+class BuildResult:
+    def __init__(self) -> None:
+        self.returncode = 0
+        self.output = ""
+        self.compile_time = 0.0
+        self.run_time = 0.0
+
+
+class CaseTiming:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.export_time = 0.0
+        # Whether another case with the same parameters exported it
+        self.export_cached = False
+        # Name of the case whose identical output was built instead, if any
+        self.shared_with = ""
+        self.result: Optional[BuildResult]
+        self.result = None
+
+
+class MatrixRunner:
+    """
+    Runs the header test matrix.
+
+    Every RDL file is compiled once per process, and every parameter set is
+    exported once. Exports that produce identical files are only compiled
+    and run once, and compile/run jobs run concurrently on a pool of worker
+    threads, so that the export of the next case overlaps with gcc.
+    """
+    def __init__(self, jobs: Optional[int] = None) -> None:
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool: Optional[ThreadPoolExecutor]
+        self.pool = None
+
+        # Elaborated top node of every RDL file
+        self.top_nodes: Dict[str, AddrmapNode]
+        self.top_nodes = {}
+
+        # Exports by parameter set
+        self.exports: Dict[Tuple, Export]
+        self.exports = {}
+
+        # Compile jobs, and jobs that run the compiled testcase, by digest of
+        # their export, along with the case that submitted them first. Every
+        # export is compiled by a single job, so that no two jobs write its
+        # executable
+        self.builds: Dict[str, Tuple[Future, str]]
+        self.builds = {}
+        self.runs: Dict[str, Tuple[Future, str]]
+        self.runs = {}
+
+        self.timings: Dict[str, CaseTiming]
+        self.timings = {}
+
+        # Exports share elaborated trees, so are not run concurrently
+        self.export_lock = threading.Lock()
+
+    def get_top_node(self, rdl_path: str) -> AddrmapNode:
+        top_node = self.top_nodes.get(rdl_path)
+        if top_node is None:
+            rdlc = RDLCompiler()
+            rdlc.compile_file(rdl_path)
+            top_node = rdlc.elaborate().top
+            self.top_nodes[rdl_path] = top_node
+        return top_node
+
+    def get_timing(self, name: str) -> CaseTiming:
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = CaseTiming(name)
+            self.timings[name] = timing
+        return timing
+
+    def export(self, name: str, params: Dict[str, Any], out_dir: str) -> Export:
+        key = tuple(params[k] for k in EXPORT_PARAMS)
+        timing = self.get_timing(name)
+        with self.export_lock:
+            export = self.exports.get(key)
+            if export is not None:
+                if export.name != name:
+                    timing.export_cached = True
+                return export
+
+            start = time.perf_counter()
+            files = export_testcase(self.get_top_node(params["rdl_file"]), params, out_dir)
+            h = hashlib.sha256(params["std"].value.encode("utf-8"))
+            for filename in sorted(os.listdir(out_dir)):
+                if filename.endswith((".h", ".c")):
+                    h.update(filename.encode("utf-8") + b"\0")
+                    with open(os.path.join(out_dir, filename), "rb") as f:
+                        h.update(f.read())
+            export = Export(name, out_dir, files, h.hexdigest(), time.perf_counter() - start)
+            self.exports[key] = export
+            timing.export_time = export.elapsed
+            return export
+
+    def submit(self, name: str, params: Dict[str, Any], out_dir: str, run: bool) -> Future:
+        """
+        Exports the case, and schedules its compile, and run if requested.
+        Cases with identical output share a single job
+        """
+        export = self.export(name, params, out_dir)
+        timing = self.get_timing(name)
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.jobs)
+        build = self.builds.get(export.digest)
+        if build is None:
+            build = (self.pool.submit(compile_testcase, export, params["std"].value), name)
+            self.builds[export.digest] = build
+        if run:
+            # Waits for the compile job, which was queued before it
+            compiled = build[0]
+            build = self.runs.get(export.digest)
+            if build is None:
+                build = (self.pool.submit(run_testcase, export, compiled), name)
+                self.runs[export.digest] = build
+        if build[1] != name:
+            timing.shared_with = build[1]
+
+        def record(future: Future) -> None:
+            timing.result = future.result()
+        build[0].add_done_callback(record)
+        return build[0]
+
+    def write_report(self, path: str) -> None:
+        lines = [
+            f"{'case':<48} {'export':>8} {'compile':>8} {'run':>8}  notes"
+        ]
+        totals = [0.0, 0.0, 0.0]
+        for name in sorted(self.timings):
+            timing = self.timings[name]
+            notes = []
+            if timing.export_cached:
+                notes.append("export cached")
+            if timing.shared_with:
+                notes.append(f"same output as {timing.shared_with}")
+            compile_time = run_time = 0.0
+            if timing.result is not None and not timing.shared_with:
+                compile_time = timing.result.compile_time
+                run_time = timing.result.run_time
+            for i, t in enumerate((timing.export_time, compile_time, run_time)):
+                totals[i] += t
+            lines.append(
+                f"{name:<48} {timing.export_time:>8.3f} {compile_time:>8.3f} {run_time:>8.3f}"
+                f"  {', '.join(notes)}".rstrip()
+            )
+        lines.append(f"{'total':<48} {totals[0]:>8.3f} {totals[1]:>8.3f} {totals[2]:>8.3f}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def export_testcase(top_node: AddrmapNode, params: Dict[str, Any], out_dir: str) -> List[str]:
+    """
+    Exports the header and its testcase to out_dir/out.h and
+    out_accesstest.c. Returns the testcase's C files, relative to out_dir
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ds = DesignState(top_node)
+    for k in EXPORT_PARAMS[1:]:
+        setattr(ds, k, params[k])
+    ds.inst_offset = 0
+    ds.testcase = True
+    DesignScanner(ds).run()
+
+    if ds.explode_top:
+        # Registers only have a type of their own with bitfields
+        top_nodes = [
+            c for c in top_node.children()
+            if isinstance(c, AddressableNode) and not isinstance(c, RegNode)
+        ]
+    else:
+        top_nodes = [top_node]
+
+    path = os.path.join(out_dir, "out")
+    HeaderGenerator(ds).run(path, top_nodes)
+    files = TestcaseGenerator(ds).run(path, top_nodes)
+    return [os.path.relpath(p, out_dir) for p in files]
+
+
+def get_exe_path(export: Export) -> str:
+    return os.path.abspath(os.path.join(export.out_dir, "test.exe"))
+
+
+def compile_testcase(export: Export, std: str) -> BuildResult:
+    result = BuildResult()
+    args = ["gcc", "--std", std] + export.files + ["-o", get_exe_path(export)]
+
+    start = time.perf_counter()
+    ret = subprocess.run(
+        args, cwd=export.out_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False
+    )
+    result.compile_time = time.perf_counter() - start
+    result.returncode = ret.returncode
+    result.output = " ".join(args) + "\n" + ret.stdout.decode("utf-8", errors="replace")
+    return result
+
+
+def run_testcase(export: Export, compiled: Future) -> BuildResult:
+    """
+    Runs the testcase once its compile job is done. The result includes
+    the compile's
+    """
+    compile_result = compiled.result()
+    if compile_result.returncode:
+        return compile_result
+    result = BuildResult()
+    result.compile_time = compile_result.compile_time
+    result.output = compile_result.output
+    exe_path = get_exe_path(export)
+
+    start = time.perf_counter()
+    ret = subprocess.run(
+        [exe_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False
+    )
+    result.run_time = time.perf_counter() - start
+    result.returncode = ret.returncode
+    result.output += exe_path + "\n" + ret.stdout.decode("utf-8", errors="replace")
+    return result
@@ -0,0 +1,114 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from systemrdl.node import AddrmapNode, RegNode
+from etched_peakrdl_cheader.address_table import AddressTable
+from etched_peakrdl_cheader.design_ir import DesignIR
+from etched_peakrdl_cheader.design_state import DesignState
+
+
+ARRAYS_RDL = """
+reg r_t {
+    field {} lo[8];
+    field {} mid[15:12];
+    field {} hi[31:24];
+};
+regfile rf_t {
+    r_t a;
+    r_t b[3];
+};
+addrmap sub_t {
+    r_t x;
+    rf_t rf[2][3] @ 0x40 += 0x20;
+};
+addrmap arrays {
+    r_t ctrl;
+    sub_t sub[4] @ 0x1000 += 0x400;
+    r_t tail @ 0x3000;
+};
+"""
+
+
+def compile_rdl(path: str) -> AddrmapNode:
+    rdlc = RDLCompiler()
+    rdlc.compile_file(path)
+    return rdlc.elaborate().top
+
+
+def build_table(top_node: AddrmapNode) -> AddressTable:
+    return AddressTable.from_ir(DesignIR.build(DesignState(top_node), top_node))
+
+
+def get_reg_ranges(top_node: AddrmapNode) -> dict:
+    """
+    Maps the address range of every unrolled register to its path, keeping
+    the first of co-located registers
+    """
+    ranges = {}
+    for node in top_node.descendants(unroll=True):
+        if isinstance(node, RegNode):
+            ranges.setdefault((node.absolute_address, node.size), node.get_path())
+    return ranges
+
+
+class TestAddressTable(TestCase):
+    def check_design(self, top_node: AddrmapNode) -> None:
+        table = build_table(top_node)
+        table = AddressTable.from_bytes(table.to_bytes())
+
+        reg_at = {}
+        for (addr, size), path in get_reg_ranges(top_node).items():
+            for a in range(addr, addr + size):
+                reg_at.setdefault(a, path)
+
+        base = top_node.absolute_address
+        for addr in range(base - 4, base + top_node.size + 4):
+            match = table.lookup(addr)
+            if addr in reg_at:
+                self.assertIsNotNone(match, hex(addr))
+                self.assertEqual(match.kind, "reg", hex(addr))
+                self.assertEqual(match.path, reg_at[addr], hex(addr))
+            elif not base <= addr < base + top_node.size:
+                self.assertIsNone(match, hex(addr))
+            else:
+                self.assertIsNotNone(match, hex(addr))
+                self.assertNotEqual(match.kind, "reg", hex(addr))
+
+    def test_testcases(self) -> None:
+        testcase_dir = os.path.join(os.path.dirname(__file__), "testcases")
+        for name in sorted(os.listdir(testcase_dir)):
+            if not name.endswith(".rdl"):
+                continue
+            with self.subTest(name):
+                self.check_design(compile_rdl(os.path.join(testcase_dir, name)))
+
+    def test_arrays(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "arrays.rdl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(ARRAYS_RDL)
+            top_node = compile_rdl(path)
+        self.check_design(top_node)
+
+        table = build_table(top_node)
+        # One entry per non-unrolled node, however many instances there are
+        self.assertEqual(len(table), 8)
+
+        match = table.lookup(top_node.absolute_address + 0x1c00 + 0x40 + 5 * 0x20 + 0x8 + 1)
+        self.assertEqual(match.path, "arrays.sub[3].rf[1][2].b[1]")
+        self.assertEqual(match.offset, 1)
+        self.assertEqual(match.fields, ["mid"])
+        match = table.lookup(top_node.absolute_address + 0x3003)
+        self.assertEqual(match.path, "arrays.tail")
+        self.assertEqual(match.fields, ["hi"])
+        match = table.lookup(top_node.absolute_address + 0x1010)
+        self.assertEqual((match.path, match.kind, match.offset), ("arrays.sub[0]", "addrmap", 0x10))
+
+    def test_bad_binary(self) -> None:
+        with self.assertRaises(ValueError):
+            AddressTable.from_bytes(b"not a table at all, really not")
+        data = AddressTable().to_bytes()
+        with self.assertRaises(ValueError):
+            AddressTable.from_bytes(data[:10])
@@ -4,6 +4,13 @@ import base
 
 from parameterized import parameterized_class
 
+
+def setUpModule() -> None:
+    base.prefetch(globals())
+
+def tearDownModule() -> None:
+    base.write_timing_report()
+
 exceptions = [
     "testcases/wide_regs.rdl",
 ]
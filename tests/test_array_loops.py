@@ -0,0 +1,73 @@
+import re
+from unittest import TestCase
+
+from etched_peakrdl_cheader.csr_access_renderer import (
+    AddrmapRefItem,
+    BlockItem,
+    BlockTemplates,
+    FieldItem,
+    RegItem,
+    get_skip_bitmap,
+    render_block,
+)
+from etched_peakrdl_cheader.range_set import RangeSet
+from etched_peakrdl_cheader.template_env import get_jj_env
+
+
+def make_block(array_loops: bool) -> BlockItem:
+    reg = RegItem(
+        "r", True, 130, RangeSet([(1, 3), (64, 65)]),
+        test_name="RRwTest",
+        friendly_name="top.r",
+        prefix="TOP__R",
+        struct_name="top__r_t",
+        size=4,
+        fields=[FieldItem(
+            "a", ignore=False, is_sw_readable=True, is_sw_writable=True, singlepulse=False,
+            rel_path="r.a",
+        )],
+    )
+    subs = AddrmapRefItem("sub", True, 4, RangeSet(), namespace="SubRwTestLib")
+    gone = AddrmapRefItem("gone", True, 2, RangeSet([(0, 2)]), namespace="GoneRwTestLib")
+    return BlockItem(
+        "top_rw_test_lib",
+        namespace="TopRwTestLib",
+        node_prefix="top",
+        struct_name="top_t",
+        has_reg_or_regfile=True,
+        child_file_prefixes=["sub_rw_test_lib", "gone_rw_test_lib"],
+        children=[reg, subs, gone],
+        array_loops=array_loops,
+    )
+
+
+class TestArrayLoops(TestCase):
+    def render(self, array_loops: bool) -> str:
+        templates = BlockTemplates(get_jj_env())
+        return render_block(make_block(array_loops), templates)["cc"]
+
+    def test_skip_bitmap(self) -> None:
+        reg = make_block(True).children[0]
+        self.assertEqual(get_skip_bitmap(reg), [0x6, 0x1, 0x0])
+
+    def test_loops(self) -> None:
+        unrolled = self.render(False)
+        tested = [int(i) for i in re.findall(r"&top_addr\.r\[(\d+)\]", unrolled)]
+        self.assertEqual(tested, [i for i in range(130) if i not in (1, 2, 64)])
+        self.assertEqual(unrolled.count("SubRwTestLib::RwTest("), 4)
+
+        looped = self.render(True)
+        self.assertIn("static constexpr uint64_t r_skip[] = {0x6ULL, 0x1ULL, 0x0ULL};", looped)
+        self.assertIn("for (uint32_t i = 0; passed && i < 130; i++) {", looped)
+        self.assertIn("if ((r_skip[i / 64] >> (i % 64)) & 1) continue;", looped)
+        self.assertIn("&top_addr.r[i]), test_idx);", looped)
+        self.assertIn("passed = SubRwTestLib::RwTest(top_addr.sub[i], test_idx);", looped)
+        self.assertNotIn("sub_skip", looped)
+        # Arrays with all elements ignored are not tested at all
+        self.assertNotIn("gone", looped.split("bool RwTest(")[1])
+        self.assertNotIn("gone", unrolled.split("bool RwTest(")[1])
+
+        # Register test functions are the same in both modes
+        self.assertEqual(
+            looped.split("bool RwTest(")[0], unrolled.split("bool RwTest(")[0]
+        )
@@ -0,0 +1,22 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from etched_peakrdl_cheader.artifact_cache import ArtifactCache
+
+
+class TestArtifactCache(TestCase):
+    def test_lru_eviction(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ArtifactCache(cache_dir, max_entries=2)
+            for i, key in enumerate(["a", "b", "c"]):
+                cache.put(key, {"cc": key})
+                os.utime(cache.entry_path(key), (i, i))
+
+            # Using 'a' makes 'b' the least recently used entry
+            self.assertEqual(cache.get("a"), {"cc": "a"})
+            cache.prune()
+
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(cache.get("c"), {"cc": "c"})
+            self.assertEqual((cache.hits, cache.misses, cache.evictions), (2, 1, 1))
@@ -0,0 +1,39 @@
+import io
+from unittest import TestCase
+
+import jinja2 as jj
+
+from etched_peakrdl_cheader.code_emitter import CodeEmitter
+
+
+class TestCodeEmitter(TestCase):
+    def test_indented_output(self) -> None:
+        out = CodeEmitter()
+        out.write("struct {\n")
+        out.push_indent()
+        out.emit("int a;\n")
+        out.emit("struct {\n")
+        out.push_indent()
+        out.emit("int b;\n")
+        out.pop_indent()
+        out.emit("} c;\n")
+        out.pop_indent()
+        out.emit("} d;\n")
+        self.assertEqual(
+            out.getvalue(),
+            "struct {\n    int a;\n    struct {\n        int b;\n    } c;\n} d;\n"
+        )
+
+        # Content can be extended after it was retrieved
+        out.write("// end\n")
+        self.assertTrue(out.getvalue().endswith("} d;\n// end\n"))
+
+    def test_template_stream_and_flush(self) -> None:
+        template = jj.Environment().from_string("{% for i in items %}{{i}},{% endfor %}")
+        out = CodeEmitter()
+        template.stream(items=[1, 2, 3]).dump(out)
+        out.write("\n")
+
+        f = io.StringIO()
+        out.flush_to(f)
+        self.assertEqual(f.getvalue(), "1,2,3,\n")
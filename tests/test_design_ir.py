@@ -0,0 +1,83 @@
+import os
+import pickle
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from systemrdl.node import AddressableNode, RegNode
+from etched_peakrdl_cheader.design_ir import (
+    DesignIR,
+    KIND_NAMES,
+    NODE_IGNORE,
+    FIELD_SW_READABLE,
+    FIELD_SW_WRITABLE,
+    FIELD_HW_READABLE,
+    FIELD_HW_WRITABLE,
+)
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader import utils
+
+
+TESTCASE_DIR = os.path.join(os.path.dirname(__file__), "testcases")
+
+
+class TestDesignIR(TestCase):
+    def check_design(self, path: str) -> None:
+        rdlc = RDLCompiler()
+        rdlc.compile_file(path)
+        top_node = rdlc.elaborate().top
+        ds = DesignState(top_node)
+        ir = DesignIR.build(ds, top_node)
+        ir = pickle.loads(pickle.dumps(ir))
+
+        # Breadth-first, like the IR
+        nodes = [top_node]
+        for node in nodes:
+            nodes += [c for c in node.children() if isinstance(c, AddressableNode)]
+        self.assertEqual(len(ir), len(nodes))
+        self.assertEqual(ir.base_address, top_node.absolute_address)
+
+        for i, node in enumerate(nodes):
+            self.assertEqual(ir.get_name(i), node.inst_name)
+            self.assertEqual(KIND_NAMES[ir.kinds[i]], type(node).__name__[:-4].lower())
+            self.assertEqual(ir.get_path(i), node.get_path())
+            self.assertEqual(ir.sizes[i], node.size)
+            self.assertEqual(bool(ir.flags[i] & NODE_IGNORE), node.ignore)
+            self.assertEqual(ir.is_array(i), node.is_array)
+            if node.is_array:
+                self.assertEqual(ir.get_array_dimensions(i), node.array_dimensions)
+                self.assertEqual(ir.strides[i], node.array_stride)
+            if i:
+                self.assertEqual(nodes[ir.parents[i]], node.parent)
+                self.assertEqual(ir.offsets[i], node.raw_address_offset)
+                self.assertEqual(ir.get_rel_path(i, 0), node.get_rel_path(top_node))
+
+            children = [nodes[c] for c in ir.children(i)]
+            self.assertEqual(
+                children, [c for c in node.children() if isinstance(c, AddressableNode)]
+            )
+
+            if isinstance(node, RegNode):
+                self.assertEqual(ir.regwidths[i], node.get_property("regwidth"))
+                self.assertEqual(ir.strings[ir.friendly_names[i]],
+                                 utils.get_friendly_name(ds, top_node, node))
+                fields = list(node.fields())
+                self.assertEqual(len(ir.fields(i)), len(fields))
+                for f, field in zip(ir.fields(i), fields):
+                    self.assertEqual(ir.field_parents[f], i)
+                    self.assertEqual(ir.strings[ir.field_names[f]], field.inst_name)
+                    self.assertEqual(ir.field_lsbs[f], field.low)
+                    self.assertEqual(ir.field_widths[f], field.width)
+                    flags = ir.field_flags[f]
+                    self.assertEqual(bool(flags & FIELD_SW_READABLE), field.is_sw_readable)
+                    self.assertEqual(bool(flags & FIELD_SW_WRITABLE), field.is_sw_writable)
+                    self.assertEqual(bool(flags & FIELD_HW_READABLE), field.is_hw_readable)
+                    self.assertEqual(bool(flags & FIELD_HW_WRITABLE), field.is_hw_writable)
+                    self.assertEqual(ir.get_field_rel_path(f, 0), field.get_rel_path(top_node))
+            else:
+                self.assertEqual(len(ir.fields(i)), 0)
+
+    def test_testcases(self) -> None:
+        for name in sorted(os.listdir(TESTCASE_DIR)):
+            if name.endswith(".rdl"):
+                with self.subTest(name):
+                    self.check_design(os.path.join(TESTCASE_DIR, name))
@@ -0,0 +1,48 @@
+import random
+from types import SimpleNamespace
+from unittest import TestCase
+
+from etched_peakrdl_cheader.design_scanner import get_overlapping_fields
+
+
+def make_field(name: str, low: int, high: int) -> SimpleNamespace:
+    return SimpleNamespace(inst_name=name, low=low, high=high)
+
+
+class TestOverlappingFields(TestCase):
+    def test_overlap_groups(self) -> None:
+        fields = [
+            make_field("a", 0, 3),
+            make_field("b", 8, 11),
+            make_field("c", 2, 5),
+            make_field("d", 12, 15),
+            make_field("e", 14, 14),
+            make_field("f", 20, 31),
+        ]
+        self.assertEqual(get_overlapping_fields(fields), ["a", "c", "d", "e"])
+
+    def test_prior_field_above(self) -> None:
+        # 'hi' lies entirely above 'mid' and does not overlap anything
+        fields = [
+            make_field("hi", 16, 23),
+            make_field("lo", 0, 7),
+            make_field("mid", 4, 11),
+        ]
+        self.assertEqual(get_overlapping_fields(fields), ["lo", "mid"])
+
+    def test_matches_pairwise_check(self) -> None:
+        rng = random.Random(0)
+        for _ in range(200):
+            fields = []
+            for i in range(rng.randint(0, 40)):
+                low = rng.randint(0, 255)
+                high = min(255, low + rng.randint(0, 16))
+                fields.append(make_field(f"f{i}", low, high))
+            expected = [
+                f.inst_name for f in fields
+                if any(
+                    g is not f and g.low <= f.high and f.low <= g.high
+                    for g in fields
+                )
+            ]
+            self.assertEqual(get_overlapping_fields(fields), expected)
@@ -0,0 +1,122 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from etched_peakrdl_cheader.design_ir import DesignIR
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.directive_injector import DirectiveInjector
+
+
+DIRECTIVES_RDL = """
+reg r_t {
+    field {} a[8];
+    field {} b[15:8];
+};
+regfile rf_t {
+    r_t x;
+    r_t y;
+};
+addrmap ip_t {
+    r_t ctrl;
+    r_t stat;
+    rf_t rf[4];
+};
+addrmap top {
+    ip_t ip0;
+    ip_t ip1;
+    ip_t ip2;
+    ip_t dbg;
+};
+"""
+
+DIRECTIVES_YAML = """
+top:
+  ip0:
+    ctrl:
+      a:
+    rf:
+      arrayignores: ["0", "2:4"]
+  "ip*":
+    stat:
+  /ip[12]/:
+    rf:
+      x:
+---
+more:
+  dbg:
+    rf[1:3]:
+    ctrl:
+      nope:
+  missing:
+"""
+
+
+class TestDirectiveInjector(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        rdl_path = os.path.join(self.tmp_dir, "top.rdl")
+        with open(rdl_path, "w", encoding="utf-8") as f:
+            f.write(DIRECTIVES_RDL)
+        rdlc = RDLCompiler()
+        rdlc.compile_file(rdl_path)
+        self.top_node = rdlc.elaborate().top
+
+    def tearDown(self) -> None:
+        for name in os.listdir(self.tmp_dir):
+            os.remove(os.path.join(self.tmp_dir, name))
+        os.rmdir(self.tmp_dir)
+
+    def inject(self, text: str) -> DirectiveInjector:
+        path = os.path.join(self.tmp_dir, "directives.yaml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.ds = DesignState(self.top_node)
+        injector = DirectiveInjector(self.ds)
+        injector.run(path, self.top_node)
+        return injector
+
+    def get_ignored(self) -> list:
+        return [
+            node.get_rel_path(self.top_node)
+            for node in self.top_node.descendants()
+            if node.ignore
+        ]
+
+    def get_ignore_idxes(self, path: str) -> list:
+        node = self.top_node.find_by_path(path)
+        return list(self.ds.array_ignores.get(id(node.inst), []))
+
+    def test_directives(self) -> None:
+        injector = self.inject(DIRECTIVES_YAML)
+        self.assertEqual(injector.n_directives, 7)
+        self.assertEqual(self.get_ignored(), [
+            "ip0.ctrl.a",
+            "ip0.stat",
+            "ip1.stat",
+            "ip1.rf[].x",
+            "ip2.stat",
+            "ip2.rf[].x",
+        ])
+        self.assertEqual(self.get_ignore_idxes("ip0.rf"), [0, 2, 3])
+        self.assertEqual(self.get_ignore_idxes("dbg.rf"), [1, 2])
+        self.assertEqual(self.get_ignore_idxes("ip1.rf"), [])
+        self.assertEqual(injector.unmatched, ["top.dbg.ctrl.nope", "top.missing"])
+
+        # The IR keeps ignored elements as ranges
+        ir = DesignIR.build(self.ds, self.top_node)
+        paths = [ir.get_path(i) for i in range(len(ir.parents))]
+        ignored = ir.get_ignore_idxes(paths.index("top.ip0.rf[]"))
+        self.assertEqual(list(ignored.ranges()), [(0, 1), (2, 4)])
+        self.assertEqual(list(ignored.iter_complement(0, 4)), [1])
+
+    def test_errors(self) -> None:
+        # Errors are reported, and nothing is applied
+        for text in (
+            "top:\n  ip0:\n    ctrl:\n      a:\n        oops:\n",
+            "top:\n  ip0:\n    rf[1]:\n      x:\n",
+            "top:\n  ip0:\n    rf:\n      arrayignores: [\"x\"]\n",
+        ):
+            with self.subTest(text):
+                self.inject(text)
+                self.assertEqual(self.get_ignored(), [])
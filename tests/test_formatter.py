@@ -0,0 +1,69 @@
+import os
+import stat
+import sys
+import tempfile
+from unittest import TestCase, mock
+
+from etched_peakrdl_cheader.formatter import ClangFormatError, ClangFormatter
+
+
+# Logs the files of every invocation on one line. Fails on files named bad*
+FAKE_CLANG_FORMAT = """#!{python}
+import os, sys
+files = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+with open(os.environ["FAKE_CLANG_FORMAT_LOG"], "a") as f:
+    f.write(" ".join(files) + "\\n")
+if any(os.path.basename(path).startswith("bad") for path in files):
+    print("error: cannot format")
+    sys.exit(3)
+"""
+
+
+class TestClangFormatter(TestCase):
+    def setUp(self) -> None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+        bin_dir = os.path.join(self.tmp_dir, "bin")
+        os.mkdir(bin_dir)
+        script = os.path.join(bin_dir, "clang-format")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(FAKE_CLANG_FORMAT.format(python=sys.executable))
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+
+        self.log_path = os.path.join(self.tmp_dir, "log.txt")
+        env = mock.patch.dict(os.environ, {
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "FAKE_CLANG_FORMAT_LOG": self.log_path,
+        })
+        env.start()
+        self.addCleanup(env.stop)
+
+    def get_batches(self) -> list:
+        with open(self.log_path, encoding="utf-8") as f:
+            return [line.split() for line in f.read().splitlines()]
+
+    def test_batches(self) -> None:
+        files = [os.path.join(self.tmp_dir, f"f{i}.cc") for i in range(10)]
+        results = ClangFormatter(jobs=3, batch_size=4).run(files)
+
+        self.assertEqual([len(r.files) for r in results], [4, 4, 2])
+        self.assertTrue(all(r.returncode == 0 for r in results))
+        # Every file is formatted by exactly one invocation
+        batches = self.get_batches()
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(sorted(path for batch in batches for path in batch), sorted(files))
+
+        self.assertEqual(ClangFormatter().run([]), [])
+
+    def test_error(self) -> None:
+        files = [os.path.join(self.tmp_dir, name) for name in ["a.cc", "b.cc", "bad.cc", "c.cc"]]
+        with self.assertRaises(ClangFormatError) as cm:
+            ClangFormatter(jobs=2, batch_size=2).run(files)
+        msg = str(cm.exception)
+        self.assertIn(f"exited with code 3 for: {files[2]} {files[3]}", msg)
+        self.assertIn("error: cannot format", msg)
+        self.assertNotIn(files[0], msg)
+        # Other batches still ran
+        self.assertEqual(len(self.get_batches()), 2)
@@ -0,0 +1,98 @@
+import os
+import re
+import subprocess
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from etched_peakrdl_cheader.design_scanner import DesignScanner
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.header_generator import HeaderGenerator
+
+
+SHARED_RDL = """
+reg r_t { field {} a[8]; };
+mem m_t { mementries = 4; memwidth = 32; };
+regfile inner_t { r_t y; r_t z[2]; };
+addrmap blk_t { r_t x; inner_t in1; inner_t in2[2]; external m_t m @ 0x100; };
+addrmap shared {
+    r_t top_r;
+    blk_t b0;
+    blk_t b1[2];
+    inner_t loose;
+};
+"""
+
+INCLUDE_RE = re.compile(r'#include "(\S+)"')
+TYPEDEF_RE = re.compile(r"^} (\w+);$", re.MULTILINE)
+
+
+class TestHeaderShards(TestCase):
+    def generate(self, out_dir: str, shard_headers: bool) -> str:
+        rdl_path = os.path.join(out_dir, "shared.rdl")
+        with open(rdl_path, "w", encoding="utf-8") as f:
+            f.write(SHARED_RDL)
+        rdlc = RDLCompiler()
+        rdlc.compile_file(rdl_path)
+        top_node = rdlc.elaborate().top
+
+        ds = DesignState(top_node)
+        ds.generate_bitfields = True
+        ds.shard_headers = shard_headers
+        DesignScanner(ds).run()
+        path = os.path.join(out_dir, "out")
+        HeaderGenerator(ds).run(path, [top_node])
+        return path
+
+    def read(self, path: str) -> str:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def check_compiles(self, header_path: str) -> None:
+        c_path = header_path + ".c"
+        with open(c_path, "w", encoding="utf-8") as f:
+            f.write(f'#include "{os.path.basename(header_path)}"\n')
+        ret = subprocess.run(
+            ["gcc", "-std=gnu17", "-Wall", "-Werror", "-fsyntax-only", c_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=False,
+        )
+        self.assertEqual(ret.returncode, 0, ret.stdout.decode("utf-8"))
+
+    def test_shards(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = self.generate(tmp_dir, False)
+            typedefs = set(TYPEDEF_RE.findall(self.read(path + ".h")))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = self.generate(tmp_dir, True)
+            umbrella = self.read(path + ".h")
+            self.assertEqual(INCLUDE_RE.findall(umbrella), ["out_shared_t.h"])
+            self.assertEqual(TYPEDEF_RE.findall(umbrella), [])
+
+            shards = {}
+            for name in sorted(os.listdir(tmp_dir)):
+                if name.startswith("out_") and name.endswith(".h"):
+                    shards[name] = self.read(os.path.join(tmp_dir, name))
+            self.assertEqual(
+                sorted(shards),
+                ["out_blk_t_t.h", "out_common.h", "out_inner_t_t.h", "out_shared_t.h"],
+            )
+
+            # Every type is defined exactly once, across all shards
+            shard_typedefs = []
+            for text in shards.values():
+                shard_typedefs += TYPEDEF_RE.findall(text)
+            self.assertEqual(sorted(shard_typedefs), sorted(typedefs))
+
+            # The register type is used by several block types
+            self.assertIn("} r_t_t;", shards["out_common.h"])
+            self.assertEqual(INCLUDE_RE.findall(shards["out_common.h"]), [])
+            self.assertEqual(
+                INCLUDE_RE.findall(shards["out_blk_t_t.h"]), ["out_common.h", "out_inner_t_t.h"]
+            )
+
+            for name in shards:
+                self.check_compiles(os.path.join(tmp_dir, name))
+            self.check_compiles(path + ".h")
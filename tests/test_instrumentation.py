@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from systemrdl.node import FieldNode
+from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
+from etched_peakrdl_cheader.instrumentation import Instrumentation
+
+
+class RegSkipper(RDLListener):
+    def enter_Reg(self, node):
+        return WalkerAction.SkipDescendants
+
+
+class TestInstrumentation(TestCase):
+    def test_stats(self) -> None:
+        rdlc = RDLCompiler()
+        rdlc.compile_file(os.path.join(os.path.dirname(__file__), "testcases/basic.rdl"))
+        top_node = rdlc.elaborate().top
+        n_nodes = sum(1 for _ in top_node.descendants()) + 1
+        n_fields = sum(1 for node in top_node.descendants() if isinstance(node, FieldNode))
+
+        instr = Instrumentation(trace_memory=True)
+        instr.start()
+        with instr.stage("walk"):
+            listener = RegSkipper()
+            instr.track_listener(listener)
+            RDLWalker().walk(top_node, listener)
+            RDLWalker().walk(top_node, listener)
+        with instr.stage("count"):
+            instr.count("things", 2)
+            instr.count("things")
+        instr.stop()
+
+        # Fields are not visited
+        self.assertGreater(n_fields, 0)
+        self.assertEqual(instr.nodes_visited, {"RegSkipper": 2 * (n_nodes - n_fields)})
+        self.assertEqual(instr.counters, {"things": 3})
+        self.assertEqual(list(instr.stages), ["walk", "count"])
+        self.assertIsNotNone(instr.stages["walk"].peak_memory)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "stats.json")
+            instr.write_json(path)
+            with open(path, "r") as f:
+                stats = json.load(f)
+        self.assertEqual(set(stats["stages"]), {"walk", "count"})
+        self.assertIn("allocations", stats)
+        self.assertNotIn("profile", stats)
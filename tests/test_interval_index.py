@@ -0,0 +1,71 @@
+import random
+from unittest import TestCase
+
+from etched_peakrdl_cheader.interval_index import IntervalIndex
+
+
+class TestIntervalIndex(TestCase):
+    def test_queries(self) -> None:
+        # (offset, size, position, name)
+        index = IntervalIndex([
+            (0x10, 4, 1, "b"),
+            (0x0, 4, 0, "a"),
+            (0x10, 4, 2, "b_alias"),
+            (0x20, 0x10, 3, "rf"),
+        ])
+        self.assertEqual(index.names, ["a", "b", "b_alias", "rf"])
+        self.assertEqual(list(index.positions), [0, 1, 2, 3])
+        self.assertEqual(index.end, 0x30)
+
+        self.assertEqual(index.at(0x2), ["a"])
+        self.assertEqual(index.at(0x13), ["b", "b_alias"])
+        self.assertEqual(index.at(0x8), [])
+        self.assertEqual(index.at(0x2f), ["rf"])
+        self.assertEqual(index.at(0x30), [])
+
+        self.assertTrue(index.is_free(0x4, 0xc))
+        self.assertFalse(index.is_free(0x4, 0xd))
+        self.assertFalse(index.is_free(0x1c, 0x8))
+
+        self.assertEqual([index.gap_before(i) for i in range(4)], [0, 0xc, 0, 0xc])
+        self.assertEqual(index.gaps(0x40), [(0x4, 0xc), (0x14, 0xc), (0x30, 0x10)])
+        self.assertEqual(list(index.overlaps()), [(1, 2)])
+
+    def test_matches_brute_force(self) -> None:
+        rng = random.Random(0)
+        for _ in range(100):
+            intervals = []
+            for pos in range(rng.randint(0, 30)):
+                intervals.append((rng.randint(0, 200), rng.randint(1, 16), pos, f"c{pos}"))
+            index = IntervalIndex(intervals)
+            by_name = {name: (offset, offset + size) for offset, size, _, name in intervals}
+
+            for addr in range(0, 220):
+                expected = sorted(
+                    name for name, (start, end) in by_name.items() if start <= addr < end
+                )
+                self.assertEqual(sorted(index.at(addr)), expected)
+
+            expected_pairs = set()
+            for i in range(len(index)):
+                for j in range(i + 1, len(index)):
+                    if index.offsets[j] < index.ends[i]:
+                        expected_pairs.add((i, j))
+            self.assertEqual(set(index.overlaps()), expected_pairs)
+
+    def test_spanning_interval(self) -> None:
+        # Children after an interval that spans the whole block are found
+        # without visiting the ones that do not contain the address
+        intervals = [(0, 0x10000, 0, "big")]
+        intervals += [(0x100 + 4 * i, 4, i + 1, f"r{i}") for i in range(1000)]
+        index = IntervalIndex(intervals)
+        self.assertEqual(index.at(0x100 + 4 * 500), ["big", "r500"])
+        self.assertEqual(index.at(0x8000), ["big"])
+        self.assertEqual(index.at(0x10000), [])
+        self.assertEqual(index.ends_above(1001, 0x100 + 4 * 998), [0, 999, 1000])
+
+        pairs = list(index.overlaps())
+        self.assertEqual(pairs, [(0, j) for j in range(1, 1001)])
+        # Pairs of the same interval start from the closest one
+        index = IntervalIndex([(0, 0x10, 0, "a"), (0, 0x8, 1, "b"), (0x4, 4, 2, "c")])
+        self.assertEqual(list(index.overlaps()), [(0, 1), (1, 2), (0, 2)])
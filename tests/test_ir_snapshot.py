@@ -0,0 +1,98 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from etched_peakrdl_cheader.design_ir import DesignIR
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.export_options import ExportOptions
+from etched_peakrdl_cheader.exporter import CHeaderExporter
+from etched_peakrdl_cheader.ir_snapshot import save_snapshot, load_snapshot
+
+
+TESTCASE_DIR = os.path.join(os.path.dirname(__file__), "testcases")
+
+
+def read_tree(root: str) -> dict:
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+class TestIRSnapshot(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.rdl_path = os.path.join(self.tmp_dir, "widths_and_mem.rdl")
+        shutil.copy(os.path.join(TESTCASE_DIR, "widths_and_mem.rdl"), self.rdl_path)
+        self.directives_path = os.path.join(self.tmp_dir, "directives.yaml")
+        with open(self.directives_path, "w", encoding="utf-8") as f:
+            f.write("")
+
+        rdlc = RDLCompiler()
+        rdlc.compile_file(self.rdl_path)
+        top_node = rdlc.elaborate().top
+        self.ir = DesignIR.build(DesignState(top_node), top_node)
+        self.snapshot_path = os.path.join(self.tmp_dir, "ir.snap")
+        save_snapshot(self.snapshot_path, self.ir, [self.directives_path])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp_dir)
+
+    def test_roundtrip(self) -> None:
+        ir = load_snapshot(self.snapshot_path)
+        self.assertEqual(ir.sources, [os.path.abspath(self.rdl_path)])
+        self.assertEqual(vars(ir), vars(self.ir))
+
+    def test_changed_inputs(self) -> None:
+        for path in (self.rdl_path, self.directives_path):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n")
+            with self.assertRaisesRegex(ValueError, "out of date"):
+                load_snapshot(self.snapshot_path)
+            # Can still be loaded on purpose
+            load_snapshot(self.snapshot_path, check_inputs=False)
+
+    def test_corrupt(self) -> None:
+        with open(self.snapshot_path, "rb") as f:
+            data = bytearray(f.read())
+        data[-1] ^= 0xff
+        with open(self.snapshot_path, "wb") as f:
+            f.write(data)
+        with self.assertRaisesRegex(ValueError, "corrupt"):
+            load_snapshot(self.snapshot_path)
+
+        with open(self.snapshot_path, "wb") as f:
+            f.write(b"something else entirely")
+        with self.assertRaisesRegex(ValueError, "not an IR snapshot"):
+            load_snapshot(self.snapshot_path)
+
+    def test_export_snapshot(self) -> None:
+        # Output generated from a snapshot is the same as that of the export
+        # that saved it
+        options = ExportOptions()
+        options.address_table = True
+        for name in ["basic.rdl", "global_type_names.rdl", "overlapping.rdl"]:
+            with self.subTest(name):
+                rdlc = RDLCompiler()
+                rdlc.compile_file(os.path.join(TESTCASE_DIR, name))
+                top_node = rdlc.elaborate().top
+                snapshot_path = os.path.join(self.tmp_dir, name + ".snap")
+                out_dir = os.path.join(self.tmp_dir, name, "export")
+                snapshot_out_dir = os.path.join(self.tmp_dir, name, "snapshot")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    CHeaderExporter().export(
+                        top_node, self.directives_path, out_dir, options,
+                        snapshot_path=snapshot_path,
+                    )
+                    CHeaderExporter().export_snapshot(snapshot_path, snapshot_out_dir, options)
+
+                files = read_tree(out_dir)
+                self.assertIn("BUILD", files)
+                self.assertEqual(read_tree(snapshot_out_dir), files)
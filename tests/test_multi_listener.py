@@ -0,0 +1,41 @@
+import os
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from systemrdl.walker import RDLListener, RDLWalker, WalkerAction
+from etched_peakrdl_cheader.multi_listener import MultiListener
+
+
+class RecordingListener(RDLListener):
+    def __init__(self, skip_regs: bool) -> None:
+        self.skip_regs = skip_regs
+        self.events = []
+
+    def enter_Component(self, node):
+        self.events.append(("enter", node.get_path()))
+
+    def exit_Component(self, node):
+        self.events.append(("exit", node.get_path()))
+
+    def enter_Reg(self, node):
+        if self.skip_regs:
+            return WalkerAction.SkipDescendants
+        return None
+
+
+class TestMultiListener(TestCase):
+    def test_matches_separate_walks(self) -> None:
+        rdlc = RDLCompiler()
+        rdlc.compile_file(os.path.join(os.path.dirname(__file__), "testcases/global_type_names.rdl"))
+        top_node = rdlc.elaborate().top
+
+        expected = []
+        for skip_regs in (True, False):
+            listener = RecordingListener(skip_regs)
+            RDLWalker().walk(top_node, listener)
+            expected.append(listener.events)
+
+        listeners = [RecordingListener(True), RecordingListener(False)]
+        RDLWalker().walk(top_node, MultiListener(*listeners))
+
+        self.assertEqual([l.events for l in listeners], expected)
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from etched_peakrdl_cheader.naming import NamingCache
+
+
+class TestNamingCache(TestCase):
+    def test_lookup_and_invalidate(self) -> None:
+        cache = NamingCache()
+        root = SimpleNamespace(inst=object())
+        node = SimpleNamespace(inst=object())
+        calls = []
+
+        def build() -> str:
+            calls.append(None)
+            return f"name{len(calls)}"
+
+        self.assertEqual(cache.lookup("lib_prefix", root, node, build), "name1")
+        self.assertEqual(cache.lookup("lib_prefix", root, node, build), "name1")
+        self.assertEqual(cache.lookup("node_prefix", root, node, build), "name2")
+        self.assertEqual(cache.hit_rate, 1 / 3)
+
+        # Only directive-dependent names are rebuilt
+        cache.invalidate_directive_dependent()
+        self.assertEqual(cache.lookup("lib_prefix", root, node, build), "name3")
+        self.assertEqual(cache.lookup("node_prefix", root, node, build), "name2")
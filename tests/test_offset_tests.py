@@ -0,0 +1,137 @@
+import os
+import re
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from systemrdl.node import AddrmapNode, RegNode
+from etched_peakrdl_cheader.c_standards import CStandard
+from etched_peakrdl_cheader.code_emitter import CodeEmitter
+from etched_peakrdl_cheader.design_scanner import DesignScanner
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.header_generator import HeaderGenerator
+from etched_peakrdl_cheader.testcase_generator import OffsetTestsGenerator, compile_testcase
+from etched_peakrdl_cheader import testcase_generator
+
+
+ARRAYS_RDL = """
+reg r_t {
+    field {} lo[8];
+    field {} hi[31:24];
+};
+regfile rf_t {
+    r_t a;
+    r_t b[3];
+};
+addrmap sub_t {
+    r_t x;
+    rf_t rf[6] @ 0x40 += 0x20;
+};
+addrmap arrays {
+    r_t ctrl;
+    sub_t sub[4] @ 0x1000 += 0x400;
+    r_t tail @ 0x3000;
+};
+"""
+
+ASSERT_RE = re.compile(
+    r'(?:static_)?assert\(offsetof\(arrays_t, (\S+)\) == (0x[0-9a-f]+)UL(?:, "Offset error")?\);'
+)
+
+
+class TestOffsetTests(TestCase):
+    def setUp(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "arrays.rdl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(ARRAYS_RDL)
+            rdlc = RDLCompiler()
+            rdlc.compile_file(path)
+            self.top_node = rdlc.elaborate().top
+
+    def generate(self, mode: str) -> str:
+        ds = DesignState(self.top_node)
+        ds.offset_test_mode = mode
+        f = CodeEmitter()
+        OffsetTestsGenerator(ds).run(f, [self.top_node])
+        return f.getvalue()
+
+    def get_unrolled_offsets(self, top_node: AddrmapNode) -> list:
+        offsets = []
+        for node in top_node.descendants(unroll=True):
+            if isinstance(node, RegNode):
+                offsets.append((
+                    node.get_rel_path(top_node),
+                    node.absolute_address - top_node.absolute_address,
+                ))
+        return offsets
+
+    def test_full(self) -> None:
+        offsets = [
+            (member, int(addr, 16)) for member, addr in ASSERT_RE.findall(self.generate("full"))
+        ]
+        self.assertEqual(offsets, self.get_unrolled_offsets(self.top_node))
+
+    def test_loop(self) -> None:
+        text = self.generate("loop")
+        self.assertIn("for (i0 = 0; i0 < 4; i0++) {", text)
+        self.assertIn(
+            "assert(offsetof(arrays_t, sub[i0].rf[i1].b[i2])"
+            " == (0x1044UL + i0 * 0x400UL + i1 * 0x20UL + i2 * 0x4UL));",
+            text,
+        )
+        self.assertEqual(text.count("assert("), 5)
+
+    def test_sample(self) -> None:
+        members = [member for member, _ in ASSERT_RE.findall(self.generate("sample"))]
+        self.assertIn("sub[0].rf[0].b[0]", members)
+        self.assertIn("sub[3].rf[5].b[2]", members)
+        self.assertNotIn("sub[1].x", members)
+        self.assertNotIn("sub[0].rf[0].b[1]", members)
+
+    def test_unknown_mode(self) -> None:
+        with self.assertRaisesRegex(ValueError, "Unknown offset test mode"):
+            self.generate("some")
+
+    def test_static(self) -> None:
+        ds = DesignState(self.top_node)
+        ds.static_offset_tests = True
+        ds.testcase_chunk_size = 10
+        chunks = OffsetTestsGenerator(ds).run_static([self.top_node])
+        offsets = []
+        for chunk in chunks:
+            chunk_offsets = ASSERT_RE.findall(chunk.getvalue())
+            self.assertLessEqual(len(chunk_offsets), 10)
+            offsets += [(member, int(addr, 16)) for member, addr in chunk_offsets]
+        self.assertEqual(offsets, self.get_unrolled_offsets(self.top_node))
+        self.assertEqual(len(chunks), (len(offsets) + 9) // 10)
+
+        ds.std = CStandard.gnu99
+        with self.assertRaisesRegex(ValueError, "static_assert"):
+            OffsetTestsGenerator(ds)
+        ds.std = CStandard.gnu11
+        ds.offset_test_mode = "loop"
+        with self.assertRaisesRegex(ValueError, "static_assert"):
+            OffsetTestsGenerator(ds)
+
+    def test_static_compile(self) -> None:
+        ds = DesignState(self.top_node)
+        ds.static_offset_tests = True
+        ds.testcase_chunk_size = 40
+        DesignScanner(ds).run()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            header_path = os.path.join(tmp_dir, "arrays")
+            HeaderGenerator(ds).run(header_path, [self.top_node])
+            paths = testcase_generator.TestcaseGenerator(ds).run(header_path, [self.top_node])
+            self.assertEqual(len(paths), 4)
+            for result in compile_testcase(paths, ds.std, syntax_only=True):
+                self.assertEqual(result.returncode, 0, result.output)
+
+            # A wrong offset fails to compile
+            with open(paths[1], "r", encoding="utf-8") as f:
+                text = f.read()
+            with open(paths[1], "w", encoding="utf-8") as f:
+                f.write(text.replace("== 0x", "== 0x1", 1))
+            results = compile_testcase(paths, ds.std, syntax_only=True)
+            self.assertEqual([result.returncode != 0 for result in results],
+                             [False, True, False, False])
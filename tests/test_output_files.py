@@ -0,0 +1,47 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from etched_peakrdl_cheader.output_files import OutputFiles
+
+
+def generate(out_dir: str, contents: dict) -> OutputFiles:
+    outputs = OutputFiles(out_dir, incremental=True)
+    for name, text in contents.items():
+        outputs.open(name).write(text)
+    outputs.commit()
+    outputs.save_manifest()
+    return outputs
+
+
+class TestIncrementalOutput(TestCase):
+    def test_only_changed_files_written(self) -> None:
+        with tempfile.TemporaryDirectory() as out_dir:
+            outputs = generate(out_dir, {"a.cc": "a", "a.h": "b", "old.h": "c"})
+            self.assertEqual(len(outputs.written), 3)
+
+            # No-op regeneration touches nothing
+            manifest_mtime = os.stat(outputs.manifest_path).st_mtime_ns
+            outputs = generate(out_dir, {"a.cc": "a", "a.h": "b", "old.h": "c"})
+            self.assertEqual(outputs.written, [])
+            self.assertEqual(os.stat(outputs.manifest_path).st_mtime_ns, manifest_mtime)
+
+            # Edited content, hand-modified and stale files
+            with open(os.path.join(out_dir, "a.h"), "w") as f:
+                f.write("modified")
+            outputs = generate(out_dir, {"a.cc": "changed", "a.h": "b"})
+            self.assertEqual(
+                outputs.written,
+                [os.path.join(out_dir, "a.cc"), os.path.join(out_dir, "a.h")]
+            )
+            with open(os.path.join(out_dir, "a.h")) as f:
+                self.assertEqual(f.read(), "b")
+            self.assertFalse(os.path.exists(os.path.join(out_dir, "old.h")))
+
+    def test_no_manifest_when_not_incremental(self) -> None:
+        with tempfile.TemporaryDirectory() as out_dir:
+            outputs = OutputFiles(out_dir)
+            outputs.open("a.cc").write("a")
+            outputs.commit()
+            outputs.save_manifest()
+            self.assertEqual(os.listdir(out_dir), ["a.cc"])
@@ -0,0 +1,58 @@
+import pickle
+import random
+from unittest import TestCase
+
+from etched_peakrdl_cheader.range_set import RangeSet
+
+
+class TestRangeSet(TestCase):
+    def test_merge(self) -> None:
+        rs = RangeSet([(10, 20), (0, 2), (30, 40)])
+        self.assertEqual(list(rs.ranges()), [(0, 2), (10, 20), (30, 40)])
+
+        # Adjacent and overlapping ranges are merged
+        rs.add(2)
+        rs.add_range(15, 32)
+        rs.add_range(5, 5)
+        self.assertEqual(list(rs.ranges()), [(0, 3), (10, 40)])
+        self.assertEqual(len(rs), 33)
+        self.assertEqual(rs, RangeSet.from_indexes(list(range(3)) + list(range(10, 40))))
+
+        self.assertIn(0, rs)
+        self.assertIn(39, rs)
+        self.assertNotIn(3, rs)
+        self.assertNotIn(40, rs)
+
+    def test_complement(self) -> None:
+        rs = RangeSet([(2, 4), (6, 7)])
+        self.assertEqual(list(rs.complement(0, 10)), [(0, 2), (4, 6), (7, 10)])
+        self.assertEqual(list(rs.complement(3, 6)), [(4, 6)])
+        self.assertEqual(list(rs.iter_complement(0, 8)), [0, 1, 4, 5, 7])
+        self.assertEqual(list(RangeSet().iter_complement(0, 3)), [0, 1, 2])
+
+    def test_large(self) -> None:
+        # Ranges are not expanded, however many indexes they span
+        rs = RangeSet([(0, 1 << 40)])
+        rs.add_range(1 << 41, (1 << 41) + 5)
+        self.assertEqual(len(rs.starts), 2)
+        self.assertIn((1 << 40) - 1, rs)
+        self.assertEqual(list(rs.complement(0, (1 << 40) + 2)), [(1 << 40, (1 << 40) + 2)])
+        self.assertEqual(pickle.loads(pickle.dumps(rs)), rs)
+
+    def test_random(self) -> None:
+        rng = random.Random(0)
+        for _ in range(50):
+            idxes = set()
+            rs = RangeSet()
+            for _ in range(rng.randrange(10)):
+                start = rng.randrange(100)
+                end = start + rng.randrange(10)
+                idxes.update(range(start, end))
+                rs.add_range(start, end)
+            self.assertEqual(list(rs), sorted(idxes))
+            self.assertEqual(rs, RangeSet.from_indexes(idxes))
+            self.assertEqual(
+                list(rs.iter_complement(0, 120)), [i for i in range(120) if i not in idxes]
+            )
+            for i in range(120):
+                self.assertEqual(i in rs, i in idxes)
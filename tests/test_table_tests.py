@@ -0,0 +1,166 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from etched_peakrdl_cheader.csr_access_generator import CsrAccessGenerator
+from etched_peakrdl_cheader.csr_access_renderer import (
+    AddrmapRefItem,
+    BlockItem,
+    BlockTemplates,
+    FieldItem,
+    MemItem,
+    RegfileItem,
+    RegItem,
+    render_block,
+)
+from etched_peakrdl_cheader.design_ir import DesignIR
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.output_files import OutputFiles
+from etched_peakrdl_cheader.range_set import RangeSet
+from etched_peakrdl_cheader.template_env import get_jj_env
+
+
+TABLES_RDL = """
+reg r_t {
+    field {} a[8];
+    field { sw = r; } b[15:8];
+    field { singlepulse; } c[16:16] = 0;
+};
+reg wide_t {
+    regwidth = 256;
+    field {} d[255:0];
+};
+regfile rf_t {
+    r_t x;
+    wide_t y;
+};
+addrmap sub_t {
+    r_t s;
+};
+addrmap tables {
+    r_t ctrl;
+    rf_t rf[3];
+    sub_t sub;
+    r_t tail;
+};
+"""
+
+
+def make_reg(name: str, fields: list, size: int = 4, dim: int = 0) -> RegItem:
+    return RegItem(
+        name, dim > 0, max(dim, 1), RangeSet(),
+        test_name=name.title() + "RwTest",
+        friendly_name=name,
+        prefix="R_T",
+        struct_name="r_t_t",
+        size=size,
+        fields=fields,
+    )
+
+
+def make_field(
+    name: str, ignore: bool = False, is_sw_writable: bool = True, rel_path: str = ""
+) -> FieldItem:
+    return FieldItem(
+        name,
+        ignore=ignore,
+        is_sw_readable=True,
+        is_sw_writable=is_sw_writable,
+        singlepulse=False,
+        rel_path=rel_path,
+    )
+
+
+def make_block(table_tests: bool) -> BlockItem:
+    rw = make_field("a", rel_path="a")
+    ro = make_field("b", is_sw_writable=False)
+    ignored = make_field("c", ignore=True)
+    ctrl = make_reg("ctrl", [rw, ro, ignored])
+    vreg = make_reg("v", [rw])
+    rf = RegfileItem(
+        "rf", True, 3, RangeSet([(1, 2)]),
+        test_name="RfRwTest",
+        node_prefix="rf_t",
+        struct_name="rf_t_t",
+        children=[make_reg("x", [rw]), make_reg("y", [rw], size=32)],
+    )
+    sub = AddrmapRefItem("sub", False, 1, RangeSet(), namespace="SubRwTestLib")
+    tail = make_reg("tail", [ignored])
+    return BlockItem(
+        "top_rw_test_lib",
+        namespace="TopRwTestLib",
+        node_prefix="top",
+        struct_name="top_t",
+        has_reg_or_regfile=True,
+        child_file_prefixes=["sub_rw_test_lib"],
+        children=[ctrl, MemItem([vreg]), rf, sub, tail],
+        table_tests=table_tests,
+    )
+
+
+class TestTableTests(TestCase):
+    def render(self, table_tests: bool) -> dict:
+        return render_block(make_block(table_tests), BlockTemplates(get_jj_env()))
+
+    def test_tables(self) -> None:
+        artifacts = self.render(True)
+        cc = artifacts["cc"]
+        self.assertIn('#include "rw_table_test_runner.h"', cc)
+        self.assertIn(
+            "  {0x1, R_T__A_bw, R_T__A_bp, rw_table_test::kWriteRead},\n"
+            "  {0x0, R_T__B_bw, R_T__B_bp, rw_table_test::kReadOnly},\n"
+            "  {0x2, R_T__A_bw, R_T__A_bp, rw_table_test::kWriteRead},\n"
+            "  {0x3, R_T__A_bw, R_T__A_bp, rw_table_test::kWriteRead},\n"
+            "  {0x4, R_T__A_bw, R_T__A_bp, rw_table_test::kWriteRead},\n"
+            "};\n",
+            cc,
+        )
+        # Ignored regfile elements and registers without tests have no rows
+        self.assertIn(
+            "const rw_table_test::Reg kRegs[] = {\n"
+            "  {offsetof(top_t, ctrl), 0x0, 0, 2, 32},\n"
+            "  {offsetof(top_t, rf[0].x), 0x0, 3, 1, 32},\n"
+            "  {offsetof(top_t, rf[0].y), 0x0, 4, 1, 256},\n"
+            "  {offsetof(top_t, rf[2].x), 0x0, 3, 1, 32},\n"
+            "  {offsetof(top_t, rf[2].y), 0x0, 4, 1, 256},\n"
+            "};\n",
+            cc,
+        )
+        # Child addrmaps are still tested in order
+        self.assertIn(
+            "    passed = rw_table_test::RunRegs(&top_addr, kRegs + 0, 5, kFields, test_idx);\n"
+            "  }\n"
+            "  if (passed) {\n"
+            "    SubRwTestLib::RwTest(top_addr.sub, test_idx);\n"
+            "  }\n"
+            "  return passed;\n",
+            cc,
+        )
+        self.assertNotIn("CtrlRwTest", cc + artifacts["h"])
+        self.assertIn('":rw_table_test_runner"', artifacts["build"])
+
+        # Test indexes are the same as those of the test functions
+        self.assertEqual(artifacts["idx_map"], self.render(False)["idx_map"])
+
+    def test_generator(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rdl_path = os.path.join(tmp_dir, "tables.rdl")
+            with open(rdl_path, "w", encoding="utf-8") as f:
+                f.write(TABLES_RDL)
+            rdlc = RDLCompiler()
+            rdlc.compile_file(rdl_path)
+            top_node = rdlc.elaborate().top
+
+            ds = DesignState(top_node)
+            outputs = OutputFiles(tmp_dir, False)
+            CsrAccessGenerator(ds, table_tests=True).run(outputs, DesignIR.build(ds, top_node))
+
+        files = {name: buf.getvalue() for name, buf in outputs.files.items()}
+        self.assertIn("namespace rw_table_test {", files["rw_table_test_runner.h"])
+        self.assertEqual(files["BUILD"].count('name = "rw_table_test_runner"'), 1)
+        self.assertIn(
+            "{offsetof(tables_t, rf[2].y), 0x0, 6, 1, 256},", files["tables_rw_test_lib.cc"]
+        )
+        self.assertIn("kRegs + 0, 7, kFields", files["tables_rw_test_lib.cc"])
+        self.assertIn("kRegs + 7, 1, kFields", files["tables_rw_test_lib.cc"])
@@ -0,0 +1,60 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import jinja2 as jj
+
+from etched_peakrdl_cheader.template_env import (
+    STAMP_NAME,
+    SUBST_RE,
+    compile_templates,
+    TEMPLATE_DIR,
+    create_jj_env,
+    get_format_template,
+    get_jj_env,
+)
+
+
+class TestTemplateEnv(TestCase):
+    def test_env_is_shared(self) -> None:
+        self.assertIs(get_jj_env(), get_jj_env())
+
+    def test_precompiled_templates(self) -> None:
+        context = {
+            "reg_ptr": "addr",
+            "function_name": "BitFieldWriteReadTest32",
+            "field": "REG::F",
+            "field_bp": "REG__F_bp",
+            "field_bw": "REG__F_bw",
+            "test_idx": "0x1",
+        }
+        expected = create_jj_env().get_template("rw_readwrite_test.c").render(context)
+
+        with tempfile.TemporaryDirectory() as precompiled_dir:
+            compile_templates(precompiled_dir)
+            env = create_jj_env(precompiled_dir)
+            self.assertIsInstance(env.loader, jj.ChoiceLoader)
+            self.assertEqual(
+                env.get_template("rw_readwrite_test.c").render(context), expected
+            )
+
+            # Stale precompiled templates are not used
+            with open(os.path.join(precompiled_dir, STAMP_NAME), "w") as f:
+                f.write("stale\n")
+            env = create_jj_env(precompiled_dir)
+            self.assertIsInstance(env.loader, jj.FileSystemLoader)
+
+    def test_format_templates_match_jinja(self) -> None:
+        env = create_jj_env()
+        self.assertIsNotNone(get_format_template(env, "rw_readwrite_test.c"))
+        self.assertIsNone(get_format_template(env, "BUILD_TEMPLATE"))
+
+        for name in os.listdir(TEMPLATE_DIR):
+            pattern = get_format_template(env, name)
+            if pattern is None:
+                continue
+            template = env.get_template(name)
+            source = env.loader.get_source(env, name)[0]
+            context = {var: f"<{var}{{}}>" for var in SUBST_RE.findall(source)}
+            with self.subTest(template=name):
+                self.assertEqual(pattern.format_map(context), template.render(context))
@@ -0,0 +1,152 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from systemrdl import RDLCompiler
+from systemrdl.node import AddrmapNode, FieldNode
+from etched_peakrdl_cheader import test_idx_map
+from etched_peakrdl_cheader.csr_access_generator import CsrAccessGenerator
+from etched_peakrdl_cheader.csr_access_renderer import LOCAL_IDX_BITS
+from etched_peakrdl_cheader.design_ir import DesignIR
+from etched_peakrdl_cheader.design_state import DesignState
+from etched_peakrdl_cheader.output_files import OutputFiles
+
+
+INSTANCES_RDL = """
+reg r_t {
+    field {} a[8];
+    field { sw = r; } b[15:8];
+    field {} c[23:16];
+};
+regfile rf_t {
+    r_t x;
+    r_t y[3];
+};
+addrmap leaf_t {
+    r_t l;
+    r_t lt[2];
+};
+addrmap sub_t {
+    r_t s;
+    rf_t rf[2];
+    leaf_t leaf;
+};
+addrmap instances {
+    r_t ctrl;
+    rf_t one;
+    sub_t sub[3];
+    leaf_t side;
+    r_t tbl[4];
+};
+"""
+
+
+def compile_rdl(path: str) -> AddrmapNode:
+    rdlc = RDLCompiler()
+    rdlc.compile_file(path)
+    return rdlc.elaborate().top
+
+
+class TestTestIdxMap(TestCase):
+    def generate(self, **kwargs) -> dict:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rdl_path = os.path.join(tmp_dir, "instances.rdl")
+            with open(rdl_path, "w", encoding="utf-8") as f:
+                f.write(INSTANCES_RDL)
+            top_node = compile_rdl(rdl_path)
+
+            ds = DesignState(top_node)
+            outputs = OutputFiles(tmp_dir, False)
+            CsrAccessGenerator(ds, **kwargs).run(outputs, DesignIR.build(ds, top_node))
+
+        self.tested_fields = sorted(
+            node.get_path() for node in top_node.descendants(unroll=True)
+            if isinstance(node, FieldNode) and node.is_sw_writable and node.is_sw_readable
+        )
+        files = {}
+        for name, buf in outputs.files.items():
+            files[name] = buf if isinstance(buf, bytes) else buf.getvalue()
+        return files
+
+    def test_lookup(self) -> None:
+        files = self.generate(global_test_idx=True)
+        idx_map = test_idx_map.TestIdxMap.from_bytes(files["instances_test_idx_map.bin"])
+
+        # Every tested field of the unrolled design has exactly one test index
+        decoded = {}
+        for inst in range(len(idx_map)):
+            for local in range(1, idx_map.n_tests[idx_map.libs[inst]] + 1):
+                match = idx_map.lookup((inst << LOCAL_IDX_BITS) | local)
+                # Tests only run in the innermost instance of their field
+                if match is None:
+                    continue
+                self.assertNotIn(match.path, decoded)
+                decoded[match.path] = (inst << LOCAL_IDX_BITS) | local
+        self.assertEqual(sorted(decoded), self.tested_fields)
+
+        code = test_idx_map.FAILURE_MARKER | decoded["instances.sub[2].rf[1].y[0].c"]
+        match = idx_map.lookup(code)
+        self.assertEqual(match.block, "instances.sub[2]")
+        self.assertEqual(match.register, "instances.sub[2].rf[1].y[0]")
+        self.assertEqual(match.field, "c")
+        self.assertIsNone(idx_map.lookup(1 << 40))
+        self.assertIsNone(idx_map.lookup(len(idx_map) << LOCAL_IDX_BITS | 1))
+
+        # Instance ids are passed down by the test calls
+        sub_cc = files["sub_t_rw_test_lib.cc"]
+        top_cc = files["instances_rw_test_lib.cc"]
+        sub_offset = decoded["instances.sub[0].s.a"] >> LOCAL_IDX_BITS
+        sub_size = (decoded["instances.sub[1].s.a"] >> LOCAL_IDX_BITS) - sub_offset
+        self.assertIn(
+            f"SubTRwTestLib::RwTest(instances_addr.sub[1], "
+            f"test_idx + 0x{(sub_offset + sub_size) << LOCAL_IDX_BITS:x}ULL);",
+            top_cc,
+        )
+        self.assertIn("passed &= SRwTest(reinterpret_cast<volatile __uint128_t*>(&sub_t_addr.s), test_idx);",
+                      sub_cc)
+
+        looped = self.generate(global_test_idx=True, array_loops=True)
+        self.assertIn(
+            f"SubTRwTestLib::RwTest(instances_addr.sub[i], test_idx + "
+            f"0x{sub_offset << LOCAL_IDX_BITS:x}ULL + i * 0x{sub_size << LOCAL_IDX_BITS:x}ULL);",
+            looped["instances_rw_test_lib.cc"],
+        )
+        self.assertEqual(looped["instances_test_idx_map.bin"], files["instances_test_idx_map.bin"])
+
+    def test_tables(self) -> None:
+        files = self.generate(global_test_idx=True)
+        tables = self.generate(global_test_idx=True, table_tests=True)
+        idx_map = test_idx_map.TestIdxMap.from_bytes(tables["instances_test_idx_map.bin"])
+        self.assertEqual(tables["instances_test_idx_map.bin"], files["instances_test_idx_map.bin"])
+
+        # Register rows hold the id of the instance they are tested in
+        paths = [idx_map.get_path(inst) for inst in range(len(idx_map))]
+        y_inst = paths.index("instances.one.y[2]")
+        self.assertIn(
+            f"{{offsetof(instances_t, one.y[2]), 0x{y_inst << LOCAL_IDX_BITS:x}, ",
+            tables["instances_rw_test_lib.cc"],
+        )
+
+    def test_local_idxes(self) -> None:
+        # Without global test indexes, tests are only numbered within their
+        # library and no binary map is written
+        files = self.generate()
+        self.assertNotIn("instances_test_idx_map.bin", files)
+        self.assertNotIn("ULL", files["instances_rw_test_lib.cc"])
+        self.assertEqual(
+            files[".instances_text_idx_map.txt"],
+            self.generate(global_test_idx=True)[".instances_text_idx_map.txt"],
+        )
+
+    def test_serialization(self) -> None:
+        data = self.generate(global_test_idx=True)["instances_test_idx_map.bin"]
+        idx_map = test_idx_map.TestIdxMap.from_bytes(data)
+        self.assertEqual(idx_map.to_bytes(), data)
+        self.assertEqual(idx_map.get_path(0), "instances")
+
+        with self.assertRaisesRegex(ValueError, "Not a test index map"):
+            test_idx_map.TestIdxMap.from_bytes(b"X" + data[1:])
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            test_idx_map.TestIdxMap.from_bytes(data[:-1])
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            test_idx_map.TestIdxMap.from_bytes(data[:10])
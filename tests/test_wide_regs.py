@@ -2,6 +2,13 @@ import base
 
 from parameterized import parameterized_class
 
+
+def setUpModule() -> None:
+    base.prefetch(globals())
+
+def tearDownModule() -> None:
+    base.write_timing_report()
+
 @parameterized_class(base.get_permutations({
     "std": base.ALL_CSTDS,
     "reuse_typedefs": [True, False],